@@ -0,0 +1,391 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Benchmark - RF Data Recording Campaigns
+"""
+# Description:
+#   Run the campaigns of the shipped config files end-to-end on simulated USRPs (device_backend:
+#   simulated) and measure:
+#       - Wall time of each recorded variation
+#       - Elapsed time of each campaign stage (load config, HW info, TX waveforms, planning, ...)
+#       - Elapsed time of each stage of each recorded variation (waveform upload, capture, ...)
+#         based on the instrumentation trace of the campaign
+#       - Written RX data in bytes per second of variation time
+#       - Peak RSS of the campaign
+#   Each scenario runs in its own process, so the peak RSS is measured per scenario.
+#   The results are compared with the stored baselines, regressions beyond the tolerance are flagged
+#   and the script exits with an error.
+#
+# Usage:
+#   python benchmarks/benchmark_campaigns.py
+#   python benchmarks/benchmark_campaigns.py --scenarios 1Tx1Rx rx_gain_sweep --tolerance 0.5
+#   python benchmarks/benchmark_campaigns.py --update-baselines
+#   Note: Baselines depend on the host, update them before comparing changes on another host.
+#
+import os
+import sys
+import io
+import json
+import time
+import queue
+import argparse
+import resource
+import tempfile
+import contextlib
+import multiprocessing
+import yaml
+from collections import defaultdict
+
+dir_path = os.path.dirname(os.path.abspath(__file__))
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+from lib import instrumentation
+
+# Benchmark scenarios: shipped config file and parameter values replaced in all stations
+# (stations config, parameter) -> values
+# Multi-variation scenarios: the same TX waveforms are played by several variations
+SCENARIOS = {
+    "1Tx1Rx": ("config_rf_data_recording_api.yaml", {}),
+    "3Tx1Rx": ("config_rf_data_recording_api_3Tx_1Rx.yaml", {}),
+    "4Tx2Rx": ("config_rf_data_recording_api_4Tx_2Rx.json", {}),
+    "rx_only": ("config_rf_data_recording_api_rx_only.yaml", {}),
+    "tx_only": ("config_rf_data_recording_api_tx_only.yaml", {}),
+    "1Tx1Rx_waveform_gain_sweep": (
+        "config_rf_data_recording_api.yaml",
+        {
+            ("transmitters_config", "waveform_file_name"): [
+                "NR_FR1_DL_TDD_SISO_BW-20MHz_CC-1_SCS-30kHz_Mod-64QAM_OFDM_TM3.1",
+                "NR_FR1_DL_FDD_SISO_BW-20MHz_CC-1_SCS-30kHz_Mod-64QAM_OFDM_TM3.1",
+            ],
+            ("receivers_config", "gain"): [10, 20, 30],
+        },
+    ),
+    "3Tx1Rx_gain_sweep": (
+        "config_rf_data_recording_api_3Tx_1Rx.yaml",
+        {("receivers_config", "gain"): [10, 20, 30]},
+    ),
+    "rx_gain_sweep": (
+        "config_rf_data_recording_api_rx_only.yaml",
+        {("receivers_config", "gain"): [10, 20, 30]},
+    ),
+}
+
+# General config of all scenarios, it replaces the values of the shipped config files
+# Values are given as strings, zero values are not accepted by the config interface
+BENCHMARK_GENERAL_CONFIG = {
+    "device_backend": "simulated",
+    "nrecords": 2,
+    "enable_console_logging": "False",
+    # TX-only variations are stopped after the streaming duration instead of Ctrl+C
+    "tx_only_streaming_duration": "0.5",
+    # Simulated devices are not paced in real time, the host-side cost of the campaign is measured
+    "simulated_device_realtime_factor": "0.0",
+}
+
+# Stored baselines
+DEFAULT_BASELINES_FILE = os.path.join(dir_path, "campaign_baselines.json")
+
+# Allowed relative deviation from the baselines
+DEFAULT_TOLERANCE = 0.25
+
+# Times below this value in seconds are not compared, they are dominated by noise
+MIN_COMPARED_TIME = 0.1
+
+# Compared metrics: True if higher values are better
+COMPARED_METRICS = {
+    "variation_time_mean": False,
+    "variation_time_max": False,
+    "total_time": False,
+    "rx_data_bytes_per_second": True,
+    "peak_rss_mbytes": False,
+}
+
+
+## Create the campaign config of a scenario based on the shipped config file
+def create_scenario_config(scenario, campaign_path, general_config_update):
+    config_file_name, parameters_update = SCENARIOS[scenario]
+    config_file = os.path.join(src_path, "config", config_file_name)
+    extension = os.path.splitext(config_file)[1]
+    with open(config_file, "r") as file:
+        if extension == ".json":
+            rf_data_acq_config = json.load(file)
+        else:
+            rf_data_acq_config = yaml.safe_load(file)
+    general_config = rf_data_acq_config["general_config"]
+    general_config["rx_recorded_data_path"] = os.path.join(campaign_path, "recorded-data")
+    general_config["waveform_cache_path"] = os.path.join(campaign_path, "waveform-cache")
+    general_config["instrumentation_trace_file"] = get_trace_file(campaign_path)
+    general_config.update(general_config_update)
+    for (stations_config, parameter), values in parameters_update.items():
+        for station_config in rf_data_acq_config[stations_config]:
+            station_config["Parameters"][parameter]["Values"] = values
+
+    scenario_config_file = os.path.join(campaign_path, "config_" + scenario + extension)
+    with open(scenario_config_file, "w") as file:
+        if extension == ".json":
+            json.dump(rf_data_acq_config, file, indent=2)
+        else:
+            yaml.safe_dump(rf_data_acq_config, file, sort_keys=False)
+    return scenario_config_file
+
+
+## Instrumentation trace file of the campaign
+def get_trace_file(campaign_path):
+    return os.path.join(campaign_path, "instrumentation", "trace.jsonl")
+
+
+## Get the elapsed time of each stage of each variation from the instrumentation trace
+# Returns {variation index: {stage: time}}, stages of all stations are summed up, in stage order
+def get_variation_stage_times(trace_file):
+    variation_stage_times = defaultdict(lambda: defaultdict(float))
+    with open(trace_file, "r") as file:
+        for line in file:
+            event = json.loads(line)
+            # Campaign level spans have no variation, i.e. hardware discovery and teardown
+            if event["type"] != "span" or event["variation"] is None:
+                continue
+            variation_stage_times[str(event["variation"])][event["stage"]] += event["duration"]
+    return {
+        variation: {
+            stage: stage_times[stage] for stage in instrumentation.STAGES if stage in stage_times
+        }
+        for variation, stage_times in variation_stage_times.items()
+    }
+
+
+## Peak RSS of this process and its worker processes in MBytes
+def get_peak_rss_mbytes():
+    peak_rss = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrss is given in bytes on macOS and in kBytes on Linux
+    if sys.platform == "darwin":
+        return peak_rss / 1e6
+    return peak_rss * 1024 / 1e6
+
+
+## Get the benchmark results of a scenario from the campaign statistics
+def get_scenario_results(campaign_statistics, variation_stage_times, total_time, peak_rss_mbytes):
+    variation_times = list(campaign_statistics["variation_times"].values())
+    variations_time = sum(variation_times)
+    total_rx_data_nbytes = campaign_statistics["total_rx_data_nbytes"]
+    return {
+        "num_variations": campaign_statistics["num_variations"],
+        "num_recorded_variations": len(variation_times),
+        "variation_time_mean": variations_time / max(len(variation_times), 1),
+        "variation_time_max": max(variation_times, default=0.0),
+        "total_time": total_time,
+        "stage_times": campaign_statistics["stage_times"],
+        "variation_stage_times": variation_stage_times,
+        "rx_data_nbytes": total_rx_data_nbytes,
+        "rx_data_bytes_per_second": (
+            total_rx_data_nbytes / variations_time if variations_time > 0 else 0.0
+        ),
+        "peak_rss_mbytes": peak_rss_mbytes,
+    }
+
+
+## Run the campaign of a scenario, executed in its own process
+def run_scenario(scenario, general_config_update, result_queue):
+    # Paths of the config files are relative to the source folder
+    os.chdir(src_path)
+    import main_rf_data_recording_api
+
+    try:
+        with tempfile.TemporaryDirectory() as campaign_path:
+            config_file = create_scenario_config(scenario, campaign_path, general_config_update)
+            # Console output of the campaign is not shown
+            with contextlib.redirect_stdout(io.StringIO()):
+                start_time = time.time()
+                campaign_statistics = main_rf_data_recording_api.main(config_file)
+                total_time = time.time() - start_time
+            variation_stage_times = get_variation_stage_times(get_trace_file(campaign_path))
+        results = get_scenario_results(
+            campaign_statistics, variation_stage_times, total_time, get_peak_rss_mbytes()
+        )
+        result_queue.put((results, None))
+    except BaseException as error:
+        result_queue.put((None, repr(error)))
+
+
+## Run a scenario in a new process and get its results
+def benchmark_scenario(scenario, general_config_update):
+    mp_context = multiprocessing.get_context("spawn")
+    result_queue = mp_context.Queue()
+    process = mp_context.Process(
+        target=run_scenario, args=(scenario, general_config_update, result_queue)
+    )
+    process.start()
+    while True:
+        try:
+            results, error = result_queue.get(timeout=1.0)
+            break
+        except queue.Empty:
+            if not process.is_alive():
+                raise Exception(
+                    "ERROR: Benchmark process terminated", scenario, process.exitcode
+                )
+    process.join()
+    if error is not None:
+        raise Exception("ERROR: Benchmark scenario failed", scenario, error)
+    return results
+
+
+## Get the compared metrics of the results: name, value, True if higher values are better
+def get_compared_metrics(results):
+    compared_metrics = [
+        (metric, results[metric], higher_is_better)
+        for metric, higher_is_better in COMPARED_METRICS.items()
+    ]
+    compared_metrics += [
+        ("stage_times." + stage, stage_time, False)
+        for stage, stage_time in results["stage_times"].items()
+    ]
+    compared_metrics += [
+        ("variation_stage_times." + variation + "." + stage, stage_time, False)
+        for variation, stage_times in results["variation_stage_times"].items()
+        for stage, stage_time in stage_times.items()
+    ]
+    return compared_metrics
+
+
+## Compare the results of a scenario with its baseline
+# Returns a list of regressions: metric, baseline value, value
+def compare_with_baseline(results, baseline, tolerance):
+    baseline_metrics = {metric: value for metric, value, _ in get_compared_metrics(baseline)}
+    regressions = []
+    for metric, value, higher_is_better in get_compared_metrics(results):
+        baseline_value = baseline_metrics.get(metric)
+        if not baseline_value:
+            continue
+        if higher_is_better:
+            is_regression = value < baseline_value * (1 - tolerance)
+        else:
+            is_regression = value > baseline_value * (1 + tolerance)
+            # small times are dominated by noise
+            if "time" in metric and max(value, baseline_value) < MIN_COMPARED_TIME:
+                is_regression = False
+        if is_regression:
+            regressions.append((metric, baseline_value, value))
+    return regressions
+
+
+## Print the results of a scenario
+def print_results(scenario, results):
+    print("Scenario:", scenario)
+    print(
+        "    Variations:",
+        results["num_variations"],
+        ", recorded:",
+        results["num_recorded_variations"],
+    )
+    print(
+        "    Variation time: mean",
+        round(results["variation_time_mean"], 4),
+        "s, max",
+        round(results["variation_time_max"], 4),
+        "s",
+    )
+    print("    Total time:", round(results["total_time"], 4), "s")
+    print(
+        "    Stage times:",
+        ", ".join(
+            stage + ": " + str(round(stage_time, 4)) + " s"
+            for stage, stage_time in results["stage_times"].items()
+        ),
+    )
+    for variation, stage_times in results["variation_stage_times"].items():
+        print(
+            "    Variation",
+            variation,
+            "stage times:",
+            ", ".join(
+                stage + ": " + str(round(stage_time, 4)) + " s"
+                for stage, stage_time in stage_times.items()
+            ),
+        )
+    print(
+        "    RX data:",
+        round(results["rx_data_nbytes"] / 1e6, 3),
+        "MByte,",
+        round(results["rx_data_bytes_per_second"] / 1e6, 3),
+        "MByte/s",
+    )
+    print("    Peak RSS:", round(results["peak_rss_mbytes"], 1), "MByte")
+
+
+def main(scenarios, baselines_file, tolerance, update_baselines):
+    if os.path.isfile(baselines_file):
+        with open(baselines_file, "r") as file:
+            baselines = json.load(file)
+    else:
+        baselines = {}
+
+    all_regressions = {}
+    for scenario in scenarios:
+        if scenario not in SCENARIOS:
+            raise Exception("ERROR: Unknown benchmark scenario", scenario)
+        results = benchmark_scenario(scenario, BENCHMARK_GENERAL_CONFIG)
+        print_results(scenario, results)
+        if update_baselines:
+            baselines[scenario] = results
+        elif scenario in baselines:
+            regressions = compare_with_baseline(results, baselines[scenario], tolerance)
+            for metric, baseline_value, value in regressions:
+                print(
+                    "    REGRESSION:",
+                    metric,
+                    round(value, 4),
+                    ", baseline:",
+                    round(baseline_value, 4),
+                )
+            if regressions:
+                all_regressions[scenario] = regressions
+        else:
+            print("    No baseline for this scenario")
+        print("")
+
+    if update_baselines:
+        with open(baselines_file, "w") as file:
+            json.dump(baselines, file, indent=2)
+            file.write("\n")
+        print("Baselines updated:", baselines_file)
+    elif all_regressions:
+        print("Regressions beyond tolerance of", tolerance, "in scenarios:", list(all_regressions))
+    else:
+        print("No regressions beyond tolerance of", tolerance)
+    return all_regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NI RF Data Recording API - Campaign Benchmarks")
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        default=list(SCENARIOS),
+        help="benchmark scenarios, possible values: " + ", ".join(SCENARIOS),
+    )
+    parser.add_argument(
+        "--baselines", type=str, default=DEFAULT_BASELINES_FILE, help="baselines file"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="allowed relative deviation from the baselines",
+    )
+    parser.add_argument(
+        "--update-baselines",
+        action="store_true",
+        help="store the results as new baselines instead of comparing them",
+    )
+    args = parser.parse_args()
+
+    regressions = main(args.scenarios, args.baselines, args.tolerance, args.update_baselines)
+    if regressions:
+        sys.exit(1)
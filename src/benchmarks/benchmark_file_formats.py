@@ -0,0 +1,456 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Benchmark - File Format Hot Paths
+"""
+# Description:
+#   Micro-benchmarks of the host-side load, parse and write paths, no USRP is required:
+#       - TX waveform data: read_waveform_data_tdms, read_waveform_data_matlab(_ieee)
+#       - RFWS waveform config: RFWS index, NR and LTE parameter extractors
+#       - Waveform config mapping: map_metadata_to_sigmf_format
+#       - Variations: CreateVariationsMap of the shipped config files
+#       - RX data: write_rx_recorded_data_in_sigmf of synthetic cf32 records (1 MS to 100 MS)
+#   Each benchmark is run for several rounds, the median time gives ops/s and MB/s of the
+#   processed file or record. One extra round is traced by tracemalloc to get the allocations.
+#   The min time and the peak allocations are compared with the stored baselines, regressions
+#   beyond the tolerance are flagged and the script exits with an error.
+#
+# Usage:
+#   python benchmarks/benchmark_file_formats.py
+#   python benchmarks/benchmark_file_formats.py --benchmarks rfws write_sigmf --record-sizes 1e6
+#   python benchmarks/benchmark_file_formats.py --update-baselines
+#   Note: Baselines depend on the host, update them before comparing changes on another host.
+#
+import os
+import sys
+import io
+import copy
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import statistics
+import tracemalloc
+from types import SimpleNamespace
+import numpy as np
+import yaml
+
+dir_path = os.path.dirname(os.path.abspath(__file__))
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+from lib import read_waveform_data_interface
+from lib import read_waveform_config_interface
+from lib import rf_data_recording_config_interface
+from lib import write_rx_recorded_data_in_sigmf
+
+# Stored baselines
+DEFAULT_BASELINES_FILE = os.path.join(dir_path, "file_format_baselines.json")
+
+# Allowed relative deviation from the baselines
+# Times of micro-benchmarks depend on the load of the host, allocations are deterministic
+DEFAULT_TOLERANCE = 1.0
+DEFAULT_ALLOC_TOLERANCE = 0.1
+
+# Rounds of each benchmark: at least min rounds and min time, at most max rounds
+MIN_ROUNDS = 3
+MIN_TIME = 0.5
+MAX_ROUNDS = 1000
+
+# Sizes of the synthetic cf32 RX records in samples
+DEFAULT_RECORD_SIZES = [1e6, 10e6, 100e6]
+
+# Waveforms of the benchmarks: path relative to the source folder, file name
+NR_WAVEFORM = ("waveforms/nr", "NR_FR1_DL_TDD_SISO_BW-20MHz_CC-1_SCS-30kHz_Mod-64QAM_OFDM_TM3.1")
+LTE_WAVEFORM = ("waveforms/lte", "LTE_FDD_DL_10MHz_CC-1_E-UTRA_E-TM2")
+RADAR_WAVEFORM = ("waveforms/radar", "RadarWaveform_BW_2M")
+WIFI_WAVEFORM = ("waveforms/wifi", "IEEE_tx11ac_legacy_20MHz_80MSps_MCS7_27bytes_1frame")
+
+# Config files of the variations map benchmarks
+VARIATIONS_CONFIG_FILES = [
+    "config_rf_data_recording_api.yaml",
+    "config_rf_data_recording_api_4Tx_2Rx.json",
+]
+
+WIRELESS_LINK_PARAMETER_MAP_FILE = "wireless_link_parameter_map.yaml"
+
+
+## Run a benchmark and measure its time and allocations
+# function: benchmarked function, called with the arguments given by setup
+# setup: called before each round, not measured, returns the arguments of the function
+# nbytes: processed bytes of a call to get MB/s, i.e. size of the read file or written record
+def run_benchmark(function, setup=lambda: (), nbytes=0):
+    round_times = []
+    start_time = time.perf_counter()
+    while len(round_times) < MAX_ROUNDS and (
+        len(round_times) < MIN_ROUNDS or time.perf_counter() - start_time < MIN_TIME
+    ):
+        args = setup()
+        round_start_time = time.perf_counter()
+        function(*args)
+        round_times.append(time.perf_counter() - round_start_time)
+
+    # Allocations of a single call: peak of traced memory and memory still allocated after the call
+    args = setup()
+    tracemalloc.start()
+    function(*args)
+    alloc_retained, alloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median_time = statistics.median(round_times)
+    return {
+        "rounds": len(round_times),
+        "median_time": median_time,
+        "min_time": min(round_times),
+        "ops_per_second": 1 / median_time if median_time > 0 else 0.0,
+        "mbytes_per_second": nbytes / median_time / 1e6 if median_time > 0 else 0.0,
+        "alloc_peak_mbytes": alloc_peak / 1e6,
+        "alloc_retained_mbytes": alloc_retained / 1e6,
+    }
+
+
+## Get path of a waveform relative to the source folder
+def get_waveform_path(waveform):
+    return os.path.join(src_path, waveform[0])
+
+
+## Get size of a file in bytes
+def get_file_nbytes(waveform, extension):
+    return os.path.getsize(os.path.join(get_waveform_path(waveform), waveform[1] + extension))
+
+
+## TX waveform data
+def benchmark_waveform_data():
+    return {
+        "read_waveform_data_tdms[nr]": run_benchmark(
+            read_waveform_data_interface.read_waveform_data_tdms,
+            lambda: (get_waveform_path(NR_WAVEFORM), NR_WAVEFORM[1]),
+            get_file_nbytes(NR_WAVEFORM, ".tdms"),
+        ),
+        "read_waveform_data_tdms[lte]": run_benchmark(
+            read_waveform_data_interface.read_waveform_data_tdms,
+            lambda: (get_waveform_path(LTE_WAVEFORM), LTE_WAVEFORM[1]),
+            get_file_nbytes(LTE_WAVEFORM, ".tdms"),
+        ),
+        "read_waveform_data_matlab[radar]": run_benchmark(
+            read_waveform_data_interface.read_waveform_data_matlab,
+            lambda: (get_waveform_path(RADAR_WAVEFORM), RADAR_WAVEFORM[1]),
+            get_file_nbytes(RADAR_WAVEFORM, ".mat"),
+        ),
+        "read_waveform_data_matlab_ieee[wifi]": run_benchmark(
+            read_waveform_data_interface.read_waveform_data_matlab_ieee,
+            lambda: (get_waveform_path(WIFI_WAVEFORM), WIFI_WAVEFORM[1]),
+            get_file_nbytes(WIFI_WAVEFORM, "/sbb_str.mat"),
+        ),
+    }
+
+
+## RFWS waveform config extractors, the RFWS file is parsed in each call
+def benchmark_rfws():
+    nr_rfws_file_path = os.path.join(get_waveform_path(NR_WAVEFORM), NR_WAVEFORM[1] + ".rfws")
+    return {
+        "create_rfws_index[nr]": run_benchmark(
+            read_waveform_config_interface.create_rfws_index,
+            lambda: (nr_rfws_file_path,),
+            get_file_nbytes(NR_WAVEFORM, ".rfws"),
+        ),
+        "get_nr_waveform_parameters_from_rfws_format": run_benchmark(
+            read_waveform_config_interface.get_nr_waveform_parameters_from_rfws_format,
+            lambda: (get_waveform_path(NR_WAVEFORM), NR_WAVEFORM[1]),
+            get_file_nbytes(NR_WAVEFORM, ".rfws"),
+        ),
+        "get_lte_waveform_parameters_from_rfws_format": run_benchmark(
+            read_waveform_config_interface.get_lte_waveform_parameters_from_rfws_format,
+            lambda: (get_waveform_path(LTE_WAVEFORM), LTE_WAVEFORM[1]),
+            get_file_nbytes(LTE_WAVEFORM, ".rfws"),
+        ),
+    }
+
+
+## Mapping of the waveform config to the SigMF format, the parameter map is loaded once
+def benchmark_map_metadata():
+    waveform_configs_src = {
+        "5gnr_ni_rfmx_rfws": read_waveform_config_interface.read_tdms_waveform_config(
+            get_waveform_path(NR_WAVEFORM), NR_WAVEFORM[1]
+        ),
+        "lte_ni_rfmx_rfws": read_waveform_config_interface.read_tdms_waveform_config(
+            get_waveform_path(LTE_WAVEFORM), LTE_WAVEFORM[1]
+        ),
+        "radar_nist": read_waveform_config_interface.read_matlab_waveform_config(
+            get_waveform_path(RADAR_WAVEFORM), RADAR_WAVEFORM[1], "matlab"
+        ),
+        "802.11_ieee_gen_matlab": read_waveform_config_interface.read_matlab_waveform_config(
+            get_waveform_path(WIFI_WAVEFORM), WIFI_WAVEFORM[1], "matlab_ieee"
+        ),
+    }
+    return {
+        "map_metadata_to_sigmf_format[" + waveform_generator + "]": run_benchmark(
+            read_waveform_config_interface.map_metadata_to_sigmf_format,
+            lambda: (
+                dict(waveform_config_src),
+                WIRELESS_LINK_PARAMETER_MAP_FILE,
+                waveform_generator,
+            ),
+        )
+        for waveform_generator, waveform_config_src in waveform_configs_src.items()
+    }
+
+
+## Variations map of the shipped config files, the config is copied before each round
+def benchmark_variations_map():
+    results = {}
+    for config_file in VARIATIONS_CONFIG_FILES:
+        config_file_path = os.path.join(src_path, "config", config_file)
+        with open(config_file_path, "r") as file:
+            if config_file.endswith(".json"):
+                rf_data_acq_config = json.load(file)
+            else:
+                rf_data_acq_config = yaml.safe_load(file)
+        results["CreateVariationsMap[" + config_file + "]"] = run_benchmark(
+            rf_data_recording_config_interface.CreateVariationsMap,
+            lambda: (copy.deepcopy(rf_data_acq_config),),
+        )
+    return results
+
+
+## RX and TX args of a recording, as given by the RX and TX configs of a variation
+def create_recording_args(rx_recorded_data_path, num_rx_samps):
+    rx_args = SimpleNamespace(
+        args="type=x4xx,addr=192.168.100.2",
+        station_id="Rx1",
+        rx_recorded_data_path=rx_recorded_data_path,
+        rx_recorded_data_type="cf32_le",
+        captured_data_file_name="rx-waveform-td-rec-",
+        channels=[0],
+        num_rx_samps=num_rx_samps,
+        coerced_rx_rate=30.72e6,
+        coerced_rx_freq=3.6e9,
+        coerced_rx_gain=30.0,
+        coerced_rx_bandwidth=400e6,
+        channel_attenuation_db=0.0,
+        hw_type="x410",
+        hw_subtype="ZBX",
+        seid="3234567",
+        clock_reference="internal",
+        variation_index=0,
+        linked_variations=[],
+    )
+    tx_args = SimpleNamespace(
+        waveform_file_name=NR_WAVEFORM[1],
+        waveform_config={
+            "standard": "5gnr",
+            "generator": "5gnr_ni_rfmx_rfws",
+            "bandwidth": 20e6,
+            "frequency_range": "fr1",
+        },
+        seid="3234568",
+        hw_type="x410",
+        hw_subtype="ZBX",
+        freq=3.6e9,
+        rate=30.72e6,
+        max_RF_bandwidth=400e6,
+        gain=20.0,
+        clock_reference="internal",
+    )
+    general_config = {
+        "author": "NI",
+        "description": "File format benchmark",
+        "comment": "Using NI RF Data Recording API",
+        "use_tx_timestamp": "False",
+    }
+    return rx_args, [tx_args], general_config
+
+
+## Write synthetic cf32 records in SigMF format, the metadata template is created once per variation
+def benchmark_write_sigmf(record_sizes):
+    results = {}
+    with tempfile.TemporaryDirectory() as rx_recorded_data_path:
+        for record_size in record_sizes:
+            num_rx_samps = int(record_size)
+            rx_args, txs_args, general_config = create_recording_args(
+                rx_recorded_data_path, num_rx_samps
+            )
+            metadata_template = write_rx_recorded_data_in_sigmf.SigMFMetadataTemplate(
+                rx_args, txs_args, general_config
+            )
+            rx_data = (np.random.randn(2, num_rx_samps) * 0.1).astype(np.float32)
+            rx_data = rx_data.view(np.complex64).reshape(1, num_rx_samps)
+            capture_times = iter(range(1, MAX_ROUNDS + 2))
+
+            # A new file is written in each round, the previous file is removed before
+            def setup():
+                for file_name in os.listdir(rx_recorded_data_path):
+                    os.remove(os.path.join(rx_recorded_data_path, file_name))
+                return (
+                    rx_data,
+                    rx_args,
+                    txs_args,
+                    general_config,
+                    0,
+                    float(next(capture_times)),
+                    metadata_template,
+                )
+
+            # The written file names are printed, not shown
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[
+                    "write_rx_recorded_data_in_sigmf[cf32, {:g} MS]".format(record_size / 1e6)
+                ] = run_benchmark(
+                    write_rx_recorded_data_in_sigmf.write_rx_recorded_data_in_sigmf,
+                    setup,
+                    rx_data.nbytes,
+                )
+            del rx_data
+    return results
+
+
+BENCHMARKS = {
+    "waveform_data": benchmark_waveform_data,
+    "rfws": benchmark_rfws,
+    "map_metadata": benchmark_map_metadata,
+    "variations_map": benchmark_variations_map,
+    "write_sigmf": benchmark_write_sigmf,
+}
+
+
+## Compare the results of a benchmark with its baseline
+# Returns a list of regressions: metric, baseline value, value
+def compare_with_baseline(results, baseline, tolerance, alloc_tolerance):
+    regressions = []
+    # The min time is less sensitive to the load of the host than the median time
+    for metric, metric_tolerance in [
+        ("min_time", tolerance),
+        ("alloc_peak_mbytes", alloc_tolerance),
+    ]:
+        baseline_value = baseline.get(metric)
+        if baseline_value and results[metric] > baseline_value * (1 + metric_tolerance):
+            regressions.append((metric, baseline_value, results[metric]))
+    return regressions
+
+
+## Print the results of a benchmark
+def print_results(name, results):
+    print(name)
+    print(
+        "    ops/s:",
+        round(results["ops_per_second"], 2),
+        ", MB/s:",
+        round(results["mbytes_per_second"], 2),
+        ", median:",
+        round(results["median_time"] * 1000, 3),
+        "ms, min:",
+        round(results["min_time"] * 1000, 3),
+        "ms, rounds:",
+        results["rounds"],
+    )
+    print(
+        "    allocations: peak",
+        round(results["alloc_peak_mbytes"], 3),
+        "MByte, retained",
+        round(results["alloc_retained_mbytes"], 3),
+        "MByte",
+    )
+
+
+def main(benchmarks, record_sizes, baselines_file, tolerance, alloc_tolerance, update_baselines):
+    if os.path.isfile(baselines_file):
+        with open(baselines_file, "r") as file:
+            baselines = json.load(file)
+    else:
+        baselines = {}
+
+    all_regressions = {}
+    for benchmark in benchmarks:
+        if benchmark not in BENCHMARKS:
+            raise Exception("ERROR: Unknown benchmark", benchmark)
+        if benchmark == "write_sigmf":
+            benchmark_results = BENCHMARKS[benchmark](record_sizes)
+        else:
+            benchmark_results = BENCHMARKS[benchmark]()
+        for name, results in benchmark_results.items():
+            print_results(name, results)
+            if update_baselines:
+                baselines[name] = results
+            elif name in baselines:
+                regressions = compare_with_baseline(
+                    results, baselines[name], tolerance, alloc_tolerance
+                )
+                for metric, baseline_value, value in regressions:
+                    print(
+                        "    REGRESSION:",
+                        metric,
+                        round(value, 6),
+                        ", baseline:",
+                        round(baseline_value, 6),
+                    )
+                if regressions:
+                    all_regressions[name] = regressions
+            else:
+                print("    No baseline for this benchmark")
+
+    print("")
+    if update_baselines:
+        with open(baselines_file, "w") as file:
+            json.dump(baselines, file, indent=2)
+            file.write("\n")
+        print("Baselines updated:", baselines_file)
+    elif all_regressions:
+        print("Regressions beyond tolerance in:", list(all_regressions))
+    else:
+        print("No regressions beyond tolerance")
+    return all_regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="NI RF Data Recording API - File Format Benchmarks"
+    )
+    parser.add_argument(
+        "--benchmarks",
+        nargs="+",
+        default=list(BENCHMARKS),
+        help="benchmarks, possible values: " + ", ".join(BENCHMARKS),
+    )
+    parser.add_argument(
+        "--record-sizes",
+        nargs="+",
+        type=float,
+        default=DEFAULT_RECORD_SIZES,
+        help="sizes of the written cf32 records in samples",
+    )
+    parser.add_argument(
+        "--baselines", type=str, default=DEFAULT_BASELINES_FILE, help="baselines file"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="allowed relative deviation of the time from the baselines",
+    )
+    parser.add_argument(
+        "--alloc-tolerance",
+        type=float,
+        default=DEFAULT_ALLOC_TOLERANCE,
+        help="allowed relative deviation of the peak allocations from the baselines",
+    )
+    parser.add_argument(
+        "--update-baselines",
+        action="store_true",
+        help="store the results as new baselines instead of comparing them",
+    )
+    args = parser.parse_args()
+
+    regressions = main(
+        args.benchmarks,
+        args.record_sizes,
+        args.baselines,
+        args.tolerance,
+        args.alloc_tolerance,
+        args.update_baselines,
+    )
+    if regressions:
+        sys.exit(1)
@@ -9,6 +9,9 @@ Data format conversion Lib
 # Description:
 #   Change the data format of a given variable based on the need
 #
+import numpy as np
+
+
 # Change numerical string with k, M, or G to float number
 def si_unit_string_converstion_to_float(x):
     si_list = ["k", "M", "G"]
@@ -29,10 +32,10 @@ def si_unit_string_converstion_to_float(x):
     return float(value)
 
 
-# string to Boolean
+# string to Boolean, a boolean of the config (numpy boolean in a pandas Series) is returned as is
 def str2bool(v):
-    if isinstance(v, bool):
-        return v
+    if isinstance(v, (bool, np.bool_)):
+        return bool(v)
     if v.lower() in ("yes", "true", "True", "t", "y", "1"):
         return True
     elif v.lower() in ("no", "false", "False", "f", "n", "0"):
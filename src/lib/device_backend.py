@@ -0,0 +1,38 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Device Backend
+"""
+# Description:
+#   Select the UHD python module used to access the TX and RX stations
+#       - uhd: installed UHD with USRPs
+#       - simulated: simulated UHD module with Replay-to-RX loopback, no USRP is required
+#   The simulated devices are configured by the general config "simulated_device_<setting>"
+#   The loopback works within a process, RX stations in RX worker processes receive noise only
+#
+from lib import simulated_uhd
+
+DEVICE_BACKENDS = ["uhd", "simulated"]
+
+# Prefix of the simulation settings in the general config
+SIMULATED_DEVICE_SETTING_PREFIX = "simulated_device_"
+
+
+## Get UHD python module of the device backend, None to use the installed UHD
+def get_uhd_module(general_config):
+    device_backend = general_config.get("device_backend", "uhd")
+    if device_backend not in DEVICE_BACKENDS:
+        raise Exception("ERROR: Unknown device backend", device_backend)
+    if device_backend == "uhd":
+        return None
+    simulated_uhd.configure(
+        **{
+            key[len(SIMULATED_DEVICE_SETTING_PREFIX) :]: value
+            for key, value in general_config.items()
+            if key.startswith(SIMULATED_DEVICE_SETTING_PREFIX)
+        }
+    )
+    return simulated_uhd
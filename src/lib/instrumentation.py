@@ -0,0 +1,266 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Instrumentation - Stage Timing Spans and Counters
+"""
+# Description:
+#   Record where campaign time goes, across all variations and stations:
+#       - Spans: elapsed time of a stage of a variation, i.e. capture of a record by a RX station
+#       - Counters: RX bytes, records, stream errors and retries, uploaded TX bytes, variations
+#   Export:
+#       - JSON-lines trace: one line per span or counter event, written while the campaign runs
+#       - Prometheus textfile: stage time sums and counts and the counter totals, rewritten after
+#         each variation, i.e. for the textfile collector of the node exporter
+#   The tracer is configured by the general config "instrumentation_trace_file" and
+#   "instrumentation_metrics_file", it is disabled if none of them is given.
+#   RX worker processes collect their events, the events are merged by the main process.
+#
+import os
+import json
+import time
+import threading
+import contextlib
+
+# Stages of a variation
+STAGES = [
+    "hardware_discovery",
+    "config_build",
+    "waveform_parse",
+    "waveform_upload",
+    "settle",
+    "capture",
+    "metadata",
+    "write",
+    "record_flush",
+    "teardown",
+]
+
+# Counters: name -> help text of the Prometheus metric
+COUNTERS = {
+    "rx_bytes": "RX data bytes captured by the RX stations",
+    "rx_records": "Records captured by the RX stations",
+    "rx_overflows": "Overflows reported by the RX streams",
+    "rx_sequence_errors": "Sequence errors reported by the RX streams",
+    "rx_timeouts": "Timeouts reported by the RX streams",
+    "rx_late_commands": "Late stream commands reported by the RX streams",
+    "rx_other_errors": "Other errors reported by the RX streams",
+    "rx_record_retries": "Records captured again after RX stream errors",
+    "rx_corrupted_records": "Records written with RX stream errors after all retries",
+    "tx_upload_bytes": "TX waveform bytes uploaded to replay memory",
+    "variations": "Recorded variations",
+}
+
+# Prefix of the Prometheus metrics
+METRICS_PREFIX = "rf_data_recording_"
+
+# Span of a disabled tracer
+NULL_SPAN = contextlib.nullcontext()
+
+
+class Tracer:
+    """Record spans and counters of a campaign and export them"""
+
+    # trace_file: JSON-lines trace file, not written if None
+    # metrics_file: Prometheus textfile, not written if None
+    # collect_events: keep the events to be merged by another tracer, i.e. in a RX worker process
+    def __init__(self, trace_file=None, metrics_file=None, collect_events=False):
+        self.enabled = bool(trace_file or metrics_file or collect_events)
+        self.metrics_file = metrics_file
+        self.collect_events = collect_events
+        self.lock = threading.Lock()
+        # Current variation, used if the variation of an event is not given
+        self.variation = None
+        # Stage time sums in seconds and counts
+        self.stage_times = {}
+        self.stage_counts = {}
+        # Counter totals: (name, labels) -> value
+        self.counters = {}
+        # Collected events
+        self.events = []
+        self.trace = None
+        if trace_file:
+            trace_path = os.path.dirname(trace_file)
+            if trace_path and not os.path.isdir(trace_path):
+                os.makedirs(trace_path)
+            self.trace = open(trace_file, "w")
+
+    ## Set the current variation of the campaign
+    def set_variation(self, variation):
+        self.variation = variation
+
+    ## Measure the elapsed time of a stage
+    # variation: variation of the stage, the current variation if None
+    # attributes: additional fields of the trace event, i.e. the station
+    def span(self, stage, variation=None, **attributes):
+        if not self.enabled:
+            return NULL_SPAN
+        if stage not in STAGES:
+            raise Exception("ERROR: Unknown instrumentation stage", stage)
+        return self.record_span(stage, variation, attributes)
+
+    @contextlib.contextmanager
+    def record_span(self, stage, variation, attributes):
+        start_time = time.time()
+        start_counter = time.perf_counter()
+        try:
+            yield
+        finally:
+            event = {
+                "type": "span",
+                "stage": stage,
+                "variation": variation,
+                "start": start_time,
+                "duration": time.perf_counter() - start_counter,
+                "thread": threading.current_thread().name,
+            }
+            event.update(attributes)
+            self.record_event(event)
+
+    ## Increment a counter
+    # labels: labels of the Prometheus metric, i.e. the station
+    def add(self, counter, value=1, variation=None, **labels):
+        if not self.enabled:
+            return
+        if counter not in COUNTERS:
+            raise Exception("ERROR: Unknown instrumentation counter", counter)
+        self.record_event(
+            {
+                "type": "counter",
+                "name": counter,
+                "value": value,
+                "variation": variation,
+                "labels": labels,
+            }
+        )
+
+    ## Aggregate an event and write it to the trace
+    def record_event(self, event):
+        if event["variation"] is None:
+            event["variation"] = self.variation
+        with self.lock:
+            if event["type"] == "span":
+                stage = event["stage"]
+                self.stage_times[stage] = self.stage_times.get(stage, 0.0) + event["duration"]
+                self.stage_counts[stage] = self.stage_counts.get(stage, 0) + 1
+            else:
+                key = (event["name"], tuple(sorted(event["labels"].items())))
+                self.counters[key] = self.counters.get(key, 0) + event["value"]
+            if self.collect_events:
+                self.events.append(event)
+            if self.trace is not None:
+                self.trace.write(json.dumps(event, default=str) + "\n")
+
+    ## Get and clear the collected events
+    def drain_events(self):
+        with self.lock:
+            events = self.events
+            self.events = []
+        return events
+
+    ## Merge events collected by another tracer
+    def merge_events(self, events):
+        for event in events:
+            self.record_event(event)
+
+    ## Get metrics in the Prometheus text format
+    def get_metrics_text(self):
+        lines = []
+        with self.lock:
+            metric = METRICS_PREFIX + "stage_seconds"
+            lines.append("# HELP " + metric + " Elapsed time of the stages of the variations")
+            lines.append("# TYPE " + metric + " summary")
+            for stage in self.stage_times:
+                labels = format_labels({"stage": stage})
+                lines.append(metric + "_sum" + labels + " " + repr(self.stage_times[stage]))
+                lines.append(metric + "_count" + labels + " " + str(self.stage_counts[stage]))
+            for counter, help_text in COUNTERS.items():
+                metric = METRICS_PREFIX + counter + "_total"
+                lines.append("# HELP " + metric + " " + help_text)
+                lines.append("# TYPE " + metric + " counter")
+                for (name, labels), value in self.counters.items():
+                    if name == counter:
+                        lines.append(metric + format_labels(dict(labels)) + " " + repr(value))
+        return "\n".join(lines) + "\n"
+
+    ## Write metrics to the Prometheus textfile and flush the trace
+    # The textfile is replaced atomically, the collector never reads a partial file
+    def write_metrics(self):
+        if self.trace is not None:
+            with self.lock:
+                self.trace.flush()
+        if not self.metrics_file:
+            return
+        metrics_path = os.path.dirname(self.metrics_file)
+        if metrics_path and not os.path.isdir(metrics_path):
+            os.makedirs(metrics_path)
+        temp_metrics_file = self.metrics_file + ".tmp"
+        with open(temp_metrics_file, "w") as file:
+            file.write(self.get_metrics_text())
+        os.replace(temp_metrics_file, self.metrics_file)
+
+    ## Write metrics and close the trace
+    def close(self):
+        self.write_metrics()
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+        self.enabled = False
+
+
+## Format labels of a Prometheus metric
+def format_labels(labels):
+    if not labels:
+        return ""
+    return (
+        "{"
+        + ",".join(
+            key
+            + '="'
+            + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            + '"'
+            for key, value in labels.items()
+        )
+        + "}"
+    )
+
+
+# Tracer of the process, disabled until it is configured
+tracer = Tracer()
+
+
+## Get the tracer of the process
+def get_tracer():
+    return tracer
+
+
+## Configure the tracer of the process based on the general config
+# collect_events: keep the events to be merged by the main process, i.e. in a RX worker process
+def configure_tracer(general_config, collect_events=False):
+    global tracer
+    tracer.close()
+    if collect_events:
+        tracer = Tracer(collect_events=is_enabled(general_config))
+    else:
+        tracer = Tracer(
+            general_config.get("instrumentation_trace_file", None),
+            general_config.get("instrumentation_metrics_file", None),
+        )
+    return tracer
+
+
+## Check if instrumentation is enabled in the general config
+def is_enabled(general_config):
+    if general_config is None:
+        return False
+    return bool(
+        general_config.get("instrumentation_trace_file", None)
+        or general_config.get("instrumentation_metrics_file", None)
+    )
+
+
+## Write metrics and close the tracer of the process
+def close_tracer():
+    tracer.close()
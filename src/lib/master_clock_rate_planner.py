@@ -0,0 +1,177 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Master Clock Rate Planner
+"""
+# Description:
+#   Plan the master clock rate (MCR) of each USRP for the whole campaign instead of per variation.
+#   UHD cannot change the master clock rate of an open session, each MCR change reopens the device.
+#       - If a single MCR gives all requested rates of a device within the rate tolerance, it is used
+#         for all variations
+#       - Otherwise the rates are grouped by MCR: the MCR that serves most rates within the tolerance
+#         is selected first, rates not served by any MCR use the MCR with the lowest decimation error
+#   Variations are added in a single streaming pass, only the distinct rates and rate changes per
+#   device are kept, the memory does not grow with the number of variations.
+#
+import math
+from collections import Counter
+
+# Supported master clock rates per USRP mboard ID, the first one is the default
+# X300/X310: 200 MHz and 184.32 MHz, X4xx: 245.76 MHz and 250 MHz
+MASTER_CLOCK_RATES = {"X3": [200e6, 184.32e6], "X4": [245.76e6, 250e6]}
+
+
+## Get supported master clock rates of a USRP, None if the MCR cannot be derived for this USRP
+def get_master_clock_rates(usrp_mboard_id):
+    for mboard_id, master_clock_rates in MASTER_CLOCK_RATES.items():
+        if mboard_id in usrp_mboard_id:
+            return master_clock_rates
+    return None
+
+
+## Get even decimation factor of the requested rate, 0 if the rate is not achievable
+def get_decimation(master_clock_rate, requested_rate):
+    ratio_integ = round(master_clock_rate / requested_rate)
+    if ratio_integ < 1:
+        return 2
+    elif ratio_integ < 2:
+        return 0
+    # Find the higher even number
+    return math.ceil(ratio_integ / 2.0) * 2
+
+
+## Get deviation between even decimation factor and the fractional ratio of MCR and requested rate
+def get_decimation_error(master_clock_rate, requested_rate):
+    return abs(
+        get_decimation(master_clock_rate, requested_rate) - master_clock_rate / requested_rate
+    )
+
+
+## Get relative error of the achievable sampling rate in ppm
+def get_rate_error_ppm(master_clock_rate, requested_rate):
+    decimation = get_decimation(master_clock_rate, requested_rate)
+    if decimation == 0:
+        return math.inf
+    return abs(master_clock_rate / decimation - requested_rate) / requested_rate * 1e6
+
+
+## Find the best MCR for the requested rate: lowest decimation error, None if not supported
+def select_master_clock_rate(requested_rate, usrp_mboard_id):
+    master_clock_rates = get_master_clock_rates(usrp_mboard_id)
+    if master_clock_rates is None:
+        return None
+    ratio_dev = [get_decimation_error(x, requested_rate) for x in master_clock_rates]
+    return master_clock_rates[ratio_dev.index(min(ratio_dev))]
+
+
+## Add master clock rate to device args, i.e. ",master_clock_rate=245.76e6"
+def add_master_clock_rate_to_args(args, master_clock_rate):
+    return args + ",master_clock_rate=" + f"{master_clock_rate / 1e6:g}e6"
+
+
+class MasterClockRatePlanner:
+    """Campaign-wide master clock rate per device and requested rate"""
+
+    def __init__(self, rate_tolerance_ppm=1.0):
+        # Max relative error of the achievable sampling rate to use a shared MCR, in ppm
+        self.rate_tolerance_ppm = float(rate_tolerance_ppm)
+        # mboard ID and set of requested rates per device args
+        self.mboard_ids = {}
+        self.requested_rates = {}
+        # Rate changes in execution order per device args: (previous rate, rate) -> count
+        self.rate_changes = {}
+        # last requested rate per device args
+        self.last_rates = {}
+        # planned MCR per device args and requested rate
+        self.plan = {}
+
+    ## Add requested rates of all TX and RX stations of an executed variation in execution order
+    def add_variation(self, stations_data_recording_api_config):
+        for station_config in stations_data_recording_api_config:
+            args = station_config.args
+            self.mboard_ids[args] = station_config.hw_type
+            self.requested_rates.setdefault(args, set()).add(station_config.rate)
+            last_rate = self.last_rates.get(args)
+            if last_rate is not None and last_rate != station_config.rate:
+                rate_changes = self.rate_changes.setdefault(args, Counter())
+                rate_changes[(last_rate, station_config.rate)] += 1
+            self.last_rates[args] = station_config.rate
+
+    ## Plan MCR of all devices
+    def create_plan(self):
+        self.plan = {}
+        for args, requested_rates in self.requested_rates.items():
+            self.plan[args] = self.plan_device(self.mboard_ids[args], sorted(requested_rates))
+
+    ## Plan MCR per requested rate of a single device
+    def plan_device(self, usrp_mboard_id, requested_rates):
+        master_clock_rates = get_master_clock_rates(usrp_mboard_id)
+        if master_clock_rates is None:
+            return {rate: None for rate in requested_rates}
+        # Rates served by each MCR within the rate tolerance
+        served_rates = {
+            master_clock_rate: set(
+                rate
+                for rate in requested_rates
+                if get_rate_error_ppm(master_clock_rate, rate) <= self.rate_tolerance_ppm
+            )
+            for master_clock_rate in master_clock_rates
+        }
+        device_plan = {}
+        unassigned_rates = set(requested_rates)
+        while unassigned_rates:
+            # MCR serving most unassigned rates, the default MCR first on equal count
+            master_clock_rate = max(
+                master_clock_rates,
+                key=lambda x: len(served_rates[x] & unassigned_rates),
+            )
+            rates = served_rates[master_clock_rate] & unassigned_rates
+            if not rates:
+                break
+            for rate in rates:
+                device_plan[rate] = master_clock_rate
+            unassigned_rates = unassigned_rates - rates
+        # Rates not achievable within the tolerance: lowest decimation error
+        for rate in unassigned_rates:
+            device_plan[rate] = select_master_clock_rate(rate, usrp_mboard_id)
+        return device_plan
+
+    ## Get planned MCR of a device for the requested rate, None to use the default MCR
+    def get_master_clock_rate(self, args, requested_rate):
+        device_plan = self.plan.get(args)
+        if device_plan is None or requested_rate not in device_plan:
+            return None
+        return device_plan[requested_rate]
+
+    ## Count expected device reopenings due to MCR changes in execution order
+    def count_device_reopenings(self):
+        num_reopenings = 0
+        for args, rate_changes in self.rate_changes.items():
+            for (last_rate, rate), count in rate_changes.items():
+                if self.get_master_clock_rate(args, last_rate) != self.get_master_clock_rate(
+                    args, rate
+                ):
+                    num_reopenings = num_reopenings + count
+        return num_reopenings
+
+    def print_report(self):
+        print("Master clock rate plan:")
+        for args, device_plan in self.plan.items():
+            master_clock_rates = sorted(
+                set(x for x in device_plan.values() if x is not None), reverse=True
+            )
+            if not master_clock_rates:
+                print("   ", args, ": default master clock rate")
+                continue
+            print("   ", args, ":", [x / 1e6 for x in master_clock_rates], "MHz")
+            if len(master_clock_rates) > 1:
+                for master_clock_rate in master_clock_rates:
+                    rates = [rate for rate, x in device_plan.items() if x == master_clock_rate]
+                    print("       ", master_clock_rate / 1e6, "MHz:", sorted(rates), "sps")
+        print(
+            "Expected device reopenings due to master clock rate changes: ",
+            self.count_device_reopenings(),
+        )
@@ -15,6 +15,12 @@ import os
 import yaml
 import numpy as np
 
+# Use the fast C loader of libyaml if available
+try:
+    from yaml import CSafeLoader as YAMLLoader
+except ImportError:
+    from yaml import SafeLoader as YAMLLoader
+
 # to read csv file of MATLAB waveform created using IEEE reference generator
 import csv
 
@@ -33,9 +39,43 @@ import xml.etree.cElementTree as ET
 from lib import rf_data_recording_api_def
 from lib import read_waveform_data_interface
 from lib import data_format_conversion_lib
+from lib import waveform_cache
+
+## Create index of a RFWS file in a single pass: parameter name -> list of texts in document order
+# RFWS elements have an attribute 'name' with the parameter name, i.e. 'Bandwidth (Hz)'
+# A parameter can be given several times, i.e. for each subframe or for PDSCH and PUSCH
+def create_rfws_index(waveform_file_path):
+    rfws_index = {}
+    # position of the text of each open element in the index
+    text_positions = {}
+    for event, element in ET.iterparse(waveform_file_path, events=("start", "end")):
+        name = element.get("name")
+        if event == "start":
+            if name is not None:
+                texts = rfws_index.setdefault(name, [])
+                text_positions[element] = (texts, len(texts))
+                texts.append(None)
+        else:
+            if name is not None:
+                texts, position = text_positions.pop(element)
+                texts[position] = element.text
+            # The text is stored, free the element
+            element.clear()
+    return rfws_index
+
+
+## Get all texts of a RFWS parameter
+def get_rfws_values(rfws_index, name):
+    if name not in rfws_index:
+        raise Exception("ERROR: Parameter is not given in RFWS waveform config:", name)
+    return rfws_index[name]
+
 
 # Get 5G NR Waveform parameters from RFmx RFWS config
-def get_nr_waveform_parameters_from_rfws_format(waveform_path, waveform_file_name):
+# rfws_index: index of the RFWS file, created if not given
+def get_nr_waveform_parameters_from_rfws_format(
+    waveform_path, waveform_file_name, rfws_index=None
+):
     # Note: The wireless_link_parameter_map is not used to get parameters from RFWS waveform config file
     # Due to the dependency between parameters; it requires hierarchical parameter extraction.
 
@@ -46,101 +86,97 @@ def get_nr_waveform_parameters_from_rfws_format(waveform_path, waveform_file_nam
     waveform_file_path = os.path.join(waveform_path, waveform_file_name + ".rfws")
 
     ## Load Waveform Config from rfws file
-    xmlDoc = ET.parse(waveform_file_path)
-    root = xmlDoc.getroot()
-    # XPath expression searching all elements recursively starting from root './/*'
-    # that have an attribute 'name' with the value ei.e. 'Bandwidth (Hz)'
-    # returns a list, either iterate over the list or select list element zero [0] if you expect only one hit
-    # more sophisticated expressions are possible
+    if rfws_index is None:
+        rfws_index = create_rfws_index(waveform_file_path)
 
     # get standard
-    factory = root.findall(".//*[@name='factory']")
-    standard = factory[0].text
+    factory = get_rfws_values(rfws_index, "factory")
+    standard = factory[0]
     # waveform_config_src["factory"] = "standard"
     waveform_config_src["standard"] = "5gnr"
 
     # get frequency range
-    freqRanges = root.findall(".//*[@name='Frequency Range']")
-    FR = freqRanges[0].text
+    freqRanges = get_rfws_values(rfws_index, "Frequency Range")
+    FR = freqRanges[0]
     waveform_config_src["Frequency Range"] = FR
 
     # get bandwidth
-    bwElements = root.findall(".//*[@name='Bandwidth (Hz)']")
-    bw = bwElements[0].text
+    bwElements = get_rfws_values(rfws_index, "Bandwidth (Hz)")
+    bw = bwElements[0]
     waveform_config_src[
         "Bandwidth (Hz)"
     ] = data_format_conversion_lib.si_unit_string_converstion_to_float(bw)
 
     # get link direction
-    link_directions = root.findall(".//*[@name='Link Direction']")
-    link_direction = link_directions[0].text
+    link_directions = get_rfws_values(rfws_index, "Link Direction")
+    link_direction = link_directions[0]
     waveform_config_src["Link Direction"] = link_direction
 
     # get cell id
-    cell_id = root.findall(".//*[@name='Cell ID']")
-    cell_id_str = cell_id[0].text  #
+    cell_id = get_rfws_values(rfws_index, "Cell ID")
+    cell_id_str = cell_id[0]  #
     waveform_config_src["Cell ID"] = cell_id_str
 
     # get number of frames
-    n_frames = root.findall(".//*[@name='Number of Frames']")
-    n_frames = n_frames[0].text
+    n_frames = get_rfws_values(rfws_index, "Number of Frames")
+    n_frames = n_frames[0]
     waveform_config_src["Number of Frames"] = n_frames
 
     # get subcarrier spacing
-    scs = root.findall(".//*[@name='Subcarrier Spacing (Hz)']")
-    scs = scs[0].text
+    scs = get_rfws_values(rfws_index, "Subcarrier Spacing (Hz)")
+    scs = scs[0]
     waveform_config_src[
         "Subcarrier Spacing (Hz)"
     ] = data_format_conversion_lib.si_unit_string_converstion_to_float(scs)
 
     # get Cyclic prefix mode
-    cp_mode = root.findall(".//*[@name='Cyclic Prefix Mode']")
-    cp_mode_str = cp_mode[0].text  #
+    cp_mode = get_rfws_values(rfws_index, "Cyclic Prefix Mode")
+    cp_mode_str = cp_mode[0]  #
     waveform_config_src["Cyclic Prefix Mode"] = cp_mode_str
 
     # get CC index
-    # cc_index = root.findall(".//*[@name='CarrierCCIndex']")
-    # cc_index = cc_index[0].text
+    # cc_index = get_rfws_values(rfws_index, "CarrierCCIndex")
+    # cc_index = cc_index[0]
     # waveform_config_src["carrier_CC_index"] = cc_index
 
     # get ssb info
-    ssb_config_set = root.findall(".//*[@name='Configuration Set']")
-    ssb_config_set = ssb_config_set[0].text
+    ssb_config_set = get_rfws_values(rfws_index, "Configuration Set")
+    ssb_config_set = ssb_config_set[0]
     waveform_config_src["Configuration Set"] = ssb_config_set
 
     # get ssb info
-    ssb_scs = root.findall(".//*[@name='Subcarrier Spacing Common']")
-    ssb_scs_str = ssb_scs[0].text
+    ssb_scs = get_rfws_values(rfws_index, "Subcarrier Spacing Common")
+    ssb_scs_str = ssb_scs[0]
     waveform_config_src[
         "Subcarrier Spacing Common"
     ] = data_format_conversion_lib.si_unit_string_converstion_to_float(ssb_scs_str)
 
     # get ssb periodicity
-    ssb_periodicity = root.findall(".//*[@name='Periodicity']")
-    ssb_periodicity = ssb_periodicity[0].text
+    ssb_periodicity = get_rfws_values(rfws_index, "Periodicity")
+    ssb_periodicity = ssb_periodicity[0]
     waveform_config_src[
         "Periodicity"
     ] = data_format_conversion_lib.si_unit_string_converstion_to_float(ssb_periodicity)
 
     if waveform_config_src["Link Direction"] == "Downlink":
         # check if test model is enabled
-        dl_ch_config_modes = root.findall(".//*[@name='DL Ch Configuration Mode']")
-        dl_ch_config_mode = dl_ch_config_modes[0].text
+        dl_ch_config_modes = get_rfws_values(rfws_index, "DL Ch Configuration Mode")
+        dl_ch_config_mode = dl_ch_config_modes[0]
         if dl_ch_config_mode == "Test Model":
             # get DL test model
-            dl_test_models = root.findall(".//*[@name='DL Test Model']")
-            dl_test_model = dl_test_models[0].text
+            dl_test_models = get_rfws_values(rfws_index, "DL Test Model")
+            dl_test_model = dl_test_models[0]
             waveform_config_src["Test Model"] = dl_test_model
 
             # get modulation type
-            mod = root.findall(".//*[@name='DL Test Model Modulation Type']")
+            mod = get_rfws_values(rfws_index, "DL Test Model Modulation Type")
             # for PDSCH, select first catch, for PUSCH select second catch
-            mod = mod[0].text
+            mod = mod[0]
             waveform_config_src["DL Modulation Type"] = mod
 
             # get frame structure - duplexing scheme
-            dl_duplex = root.findall(".//*[@name='DL Test Model Duplex Scheme']")
-            dl_duplex = dl_duplex[0].text
+            dl_duplex = get_rfws_values(rfws_index, "DL Test Model Duplex Scheme")
+            dl_duplex = dl_duplex[0]
             waveform_config_src["Duplex Scheme"] = dl_duplex
 
         elif dl_ch_config_mode == "User Defined":
@@ -148,9 +184,9 @@ def get_nr_waveform_parameters_from_rfws_format(waveform_path, waveform_file_nam
             waveform_config_src["Test Model"] = dl_ch_config_mode
 
             # get modulation type
-            mod = root.findall(".//*[@name='Modulation Type']")
+            mod = get_rfws_values(rfws_index, "Modulation Type")
             # for PDSCH, select first catch, for PUSCH select second catch
-            mod = mod[0].text
+            mod = mod[0]
             waveform_config_src["DL Modulation Type"] = mod
 
             # get frame structure - duplexing scheme
@@ -161,9 +197,9 @@ def get_nr_waveform_parameters_from_rfws_format(waveform_path, waveform_file_nam
         waveform_config_src["Test Model"] = "user_defined"
 
         # get modulation type
-        mod = root.findall(".//*[@name='Modulation Type']")
+        mod = get_rfws_values(rfws_index, "Modulation Type")
         # for PDSCH, select first catch, for PUSCH select second catch
-        mod = mod[1].text
+        mod = mod[1]
         waveform_config_src["UL Modulation Type"] = mod
 
         # get frame structure - duplexing scheme
@@ -174,17 +210,20 @@ def get_nr_waveform_parameters_from_rfws_format(waveform_path, waveform_file_nam
             waveform_config_src["link_direction"],
         )
 
-    # get rate
-    tx_data_complex, waveform_IQ_rate = read_waveform_data_interface.read_waveform_data_tdms(
+    # get rate from the tdms file metadata, the samples are not loaded
+    waveform_info = read_waveform_data_interface.read_waveform_info_tdms(
         waveform_path, waveform_file_name
     )
-    waveform_config_src["sample_rate_hz"] = waveform_IQ_rate
+    waveform_config_src["sample_rate_hz"] = waveform_info["waveform_IQ_rate"]
 
     return waveform_config_src
 
 
 # Get LTE Waveform parameters from RFmx RFWS config
-def get_lte_waveform_parameters_from_rfws_format(waveform_path, waveform_file_name):
+# rfws_index: index of the RFWS file, created if not given
+def get_lte_waveform_parameters_from_rfws_format(
+    waveform_path, waveform_file_name, rfws_index=None
+):
     # Note: The wireless_link_parameter_map is not used to get parameters from RFWS waveform config file
     # Due to the dependency between parameters; it requires hierarchical parameter extraction.
 
@@ -200,16 +239,12 @@ def get_lte_waveform_parameters_from_rfws_format(waveform_path, waveform_file_na
     waveform_file_path = os.path.join(waveform_path, waveform_file_name + ".rfws")
 
     ## Load Waveform Config from rfws file
-    xmlDoc = ET.parse(waveform_file_path)
-    root = xmlDoc.getroot()
-    # XPath expression searching all elements recursively starting from root './/*'
-    # that have an attribute 'name' with the value i.e. 'Bandwidth (Hz)'
-    # returns a list, either iterate over the list or select list element zero [0] if you expect only one hit
-    # more sophisticated expressions are possible
+    if rfws_index is None:
+        rfws_index = create_rfws_index(waveform_file_path)
 
     ## get standard
-    factory = root.findall(".//*[@name='factory']")
-    standard = factory[0].text
+    factory = get_rfws_values(rfws_index, "factory")
+    standard = factory[0]
     # waveform_config_src["factory"] = "standard"
     waveform_config_src["standard"] = "lte"
 
@@ -220,8 +255,8 @@ def get_lte_waveform_parameters_from_rfws_format(waveform_path, waveform_file_na
     waveform_config_src["factory"] = result.group(1)
 
     # get bandwidth
-    bwElements = root.findall(".//*[@name='Bandwidth']")
-    bw_str = bwElements[0].text
+    bwElements = get_rfws_values(rfws_index, "Bandwidth")
+    bw_str = bwElements[0]
     # the output likes this: "afGenLte_bw10MHz"
     bw = get_lte_parameter_config(bw_str, "bw")
     bw_wo_unit = bw[:-2]
@@ -230,39 +265,39 @@ def get_lte_waveform_parameters_from_rfws_format(waveform_path, waveform_file_na
     ] = data_format_conversion_lib.si_unit_string_converstion_to_float(bw_wo_unit)
 
     # get link direction
-    link_directions = root.findall(".//*[@name='LinkDirection']")
-    link_direction_str = link_directions[0].text  #
+    link_directions = get_rfws_values(rfws_index, "LinkDirection")
+    link_direction_str = link_directions[0]  #
     link_direction = get_lte_parameter_config(link_direction_str, "ld")
     waveform_config_src["LinkDirection"] = link_direction
 
     # get cell id
-    cell_id = root.findall(".//*[@name='CellID']")
-    cell_id_str = cell_id[0].text  #
+    cell_id = get_rfws_values(rfws_index, "CellID")
+    cell_id_str = cell_id[0]  #
     waveform_config_src["CellID"] = cell_id_str
 
     # get Cyclic prefix mode
-    cp_mode = root.findall(".//*[@name='CyclicPrefixType']")
-    cp_mode_str = cp_mode[0].text  #
+    cp_mode = get_rfws_values(rfws_index, "CyclicPrefixType")
+    cp_mode_str = cp_mode[0]  #
     waveform_config_src["CyclicPrefixType"] = cp_mode_str
 
     # get test model
-    test_models = root.findall(".//*[@name='TestModel']")
-    test_model_str = test_models[0].text
+    test_models = get_rfws_values(rfws_index, "TestModel")
+    test_model_str = test_models[0]
     test_model = get_lte_parameter_config(test_model_str, "tm")
     waveform_config_src["TestModel"] = test_model
 
     if waveform_config_src["LinkDirection"] == "Downlink":
         # get modulation type
-        mod = root.findall(".//*[@name='PDSCHCodeWord1ModulationType']")
+        mod = get_rfws_values(rfws_index, "PDSCHCodeWord1ModulationType")
         # Select the first hit, since every subframe has own modulation config
-        mod = mod[0].text
+        mod = mod[0]
         waveform_config_src["PDSCHCodeWord1ModulationType"] = get_lte_parameter_config(mod, "mt")
 
     elif waveform_config_src["LinkDirection"] == "Uplink":
         # get modulation type
-        mod = root.findall(".//*[@name='User Defined Modulation Type']")
+        mod = get_rfws_values(rfws_index, "User Defined Modulation Type")
         # Select the first hit, since every subframe has own modulation config
-        mod = mod[0].text
+        mod = mod[0]
         waveform_config_src["User Defined Modulation Type"] = get_lte_parameter_config(mod, "mt")
     else:
         raise Exception(
@@ -273,50 +308,54 @@ def get_lte_waveform_parameters_from_rfws_format(waveform_path, waveform_file_na
     # get subcarrier spacing
     waveform_config_src["subcarrier_spacing"] = 15000.0
 
-    # get rate
-    tx_data_complex, waveform_IQ_rate = read_waveform_data_interface.read_waveform_data_tdms(
+    # get rate from the tdms file metadata, the samples are not loaded
+    waveform_info = read_waveform_data_interface.read_waveform_info_tdms(
         waveform_path, waveform_file_name
     )
-    waveform_config_src["sample_rate"] = waveform_IQ_rate
+    waveform_config_src["sample_rate"] = waveform_info["waveform_IQ_rate"]
 
     return waveform_config_src
 
 
 ## Read tdms waveform data config from rfws file
-def read_tdms_waveform_config(waveform_path, waveform_file_name):
+# waveform_cache_path: the extracted waveform config is cached on disk if given
+def read_tdms_waveform_config(waveform_path, waveform_file_name, waveform_cache_path=None):
 
     # The tdms waveform config file is saved with the same name of waveform but it has .rfws extension
     waveform_file_path = os.path.join(waveform_path, waveform_file_name + ".rfws")
 
     # check if file exists
-    if exists(waveform_file_path):
-        ## Load Waveform Config from rfws file
-        xmlDoc = ET.parse(waveform_file_path)
-        root = xmlDoc.getroot()
-        # Get standard
-        factory = root.findall(".//*[@name='factory']")
-        standard = factory[0].text
-
-        # XPath expressiion searching all elements recursively starting from root './/*'
-        # that have an attribute 'name' with the value e.i. 'Bandwidth (Hz)'
-        # returns a list, either iterate over the list or select list element zero [0] if you expect only one hit
-        # more sophisticated expressions are possible
-    else:
+    if not exists(waveform_file_path):
         raise Exception("ERROR: Waveform Config file is not exist", waveform_file_path)
 
-    # Get parameters based on standard
-    if "NR" in standard:
-        waveform_config_src = get_nr_waveform_parameters_from_rfws_format(
-            waveform_path, waveform_file_name
-        )
-    elif "LTE" in standard:
-        waveform_config_src = get_lte_waveform_parameters_from_rfws_format(
-            waveform_path, waveform_file_name
-        )
-    else:
-        raise Exception("ERROR: Unknown or not supported standard", standard)
+    def extract_waveform_config():
+        ## Load Waveform Config from rfws file, parse it only once for all parameters
+        rfws_index = create_rfws_index(waveform_file_path)
+        # Get standard
+        factory = get_rfws_values(rfws_index, "factory")
+        standard = factory[0]
 
-    return waveform_config_src
+        # Get parameters based on standard
+        if "NR" in standard:
+            waveform_config_src = get_nr_waveform_parameters_from_rfws_format(
+                waveform_path, waveform_file_name, rfws_index
+            )
+        elif "LTE" in standard:
+            waveform_config_src = get_lte_waveform_parameters_from_rfws_format(
+                waveform_path, waveform_file_name, rfws_index
+            )
+        else:
+            raise Exception("ERROR: Unknown or not supported standard", standard)
+        return waveform_config_src
+
+    if waveform_cache_path is None:
+        return extract_waveform_config()
+    # The IQ rate is read from the tdms waveform, the cache entry depends on both files
+    cache = waveform_cache.get_waveform_cache(waveform_cache_path)
+    return cache.load_waveform_config(
+        [waveform_file_path, os.path.join(waveform_path, waveform_file_name + ".tdms")],
+        extract_waveform_config,
+    )
 
 
 def read_matlab_waveform_config(waveform_path, waveform_file_name, format):
@@ -369,69 +408,134 @@ def read_matlab_waveform_config(waveform_path, waveform_file_name, format):
     return waveform_config_src
 
 
+class WirelessLinkParameterMap:
+    """Wireless link parameter map, loaded once and compiled per waveform generator"""
+
+    def __init__(self, wireless_link_parameter_map_file):
+        # read waveform parameter map from yaml file
+        path_to_file = get_wireless_link_parameter_map_path(wireless_link_parameter_map_file)
+        with open(path_to_file, "r") as file:
+            self.wireless_link_parameter_map_dic = yaml.load(file, Loader=YAMLLoader)
+        # Compiled parameter table per waveform generator:
+        # list of (parameter name of waveform generator, SigMF parameter name, value map or None)
+        # in the order of the parameter map, a generator parameter can be mapped to several SigMF parameters
+        self.parameter_tables = {}
+
+    ## Get standard and name of generator
+    def get_standard_key(self, waveform_generator):
+        # check if standard key is given
+        standard_key = self.wireless_link_parameter_map_dic["waveform_generator"].get(
+            waveform_generator
+        )
+        if standard_key is None:
+            raise Exception(
+                f"Invalid standard key: Name should be corrected or added to wireless_link_parameter_map.yaml, given: ",
+                waveform_generator,
+            )
+        return standard_key
+
+    ## Get compiled parameter table of a waveform generator, compile it on first use
+    def get_parameter_table(self, waveform_generator):
+        parameter_table = self.parameter_tables.get(waveform_generator)
+        if parameter_table is None:
+            parameter_table = self.compile_parameter_table(waveform_generator)
+            self.parameter_tables[waveform_generator] = parameter_table
+        return parameter_table
+
+    def compile_parameter_table(self, waveform_generator):
+        standard_key = self.get_standard_key(waveform_generator)
+
+        # get parameters map based on standard key
+        if standard_key["standard"] == "802.11":
+            waveform_parameter_map_dic = self.wireless_link_parameter_map_dic["transmitter"]["wifi"]
+        else:
+            waveform_parameter_map_dic = self.wireless_link_parameter_map_dic["transmitter"][
+                standard_key["standard"]
+            ]
+
+        generator_parameter_key = waveform_generator + "_parameter"
+        parameter_table = []
+        for parameter_pair in waveform_parameter_map_dic:
+            # check if key for chosen simulator even exists
+            if generator_parameter_key in parameter_pair.keys():
+                generator_parameter = parameter_pair[generator_parameter_key]
+                # only continue with mapping from file if direct equivalent exists
+                if not generator_parameter["name"]:
+                    raise Exception(
+                        f"Incomplete specification in field '{waveform_generator}_parameter'!"
+                    )
+                parameter_table.append(
+                    (
+                        generator_parameter["name"],
+                        parameter_pair["sigmf_parameter_name"],
+                        generator_parameter.get("value_map"),
+                    )
+                )
+        return parameter_table
+
+    ## Map waveform config of the waveform generator to API and SigMF parameter names in a single pass
+    def map_parameters(self, waveform_config_src, waveform_generator):
+        waveform_config = {}
+        for name, sigmf_parameter_name, value_map in self.get_parameter_table(waveform_generator):
+            # It is not necessary to get all parameters from wireless_link_parameter_map.yaml in waveform_config_src
+            # since some parameters related to DL or UL only
+            if name in waveform_config_src:
+                value = waveform_config_src[name]
+                # additional mapping if parameter values should come from a discrete set of values
+                if value_map is not None:
+                    value = value_map[value]
+                # write to target dictionary for SigMF
+                waveform_config[sigmf_parameter_name] = value
+        return waveform_config
+
+
+## Get path of the wireless link parameter map file in the config folder
+def get_wireless_link_parameter_map_path(wireless_link_parameter_map_file):
+    dir_path = os.path.dirname(__file__)
+    src_path = os.path.split(dir_path)[0]
+    return os.path.join(src_path, "config", wireless_link_parameter_map_file)
+
+
+## Get keys of the given source files: modification time and size, missing files are skipped
+# A file changed between two campaigns in the same process gives a new key
+def get_source_file_keys(source_files):
+    return tuple(
+        waveform_cache.get_file_key(source_file)
+        for source_file in source_files
+        if os.path.exists(source_file)
+    )
+
+
+# Wireless link parameter maps, one per parameter map file
+# key: (parameter map file, file key of parameter map file)
+wireless_link_parameter_maps = {}
+
+
+## Get the shared wireless link parameter map of the given file
+def get_wireless_link_parameter_map(wireless_link_parameter_map_file):
+    wireless_link_parameter_map_key = (wireless_link_parameter_map_file,) + get_source_file_keys(
+        [get_wireless_link_parameter_map_path(wireless_link_parameter_map_file)]
+    )
+    wireless_link_parameter_map = wireless_link_parameter_maps.get(wireless_link_parameter_map_key)
+    if wireless_link_parameter_map is None:
+        wireless_link_parameter_map = WirelessLinkParameterMap(wireless_link_parameter_map_file)
+        wireless_link_parameter_maps[wireless_link_parameter_map_key] = wireless_link_parameter_map
+    return wireless_link_parameter_map
+
+
 def map_metadata_to_sigmf_format(
     waveform_config_src, wireless_link_parameter_map_file, waveform_generator
 ):
     """
     Maps metadata from Waveform creator to API and SigMF format.
     The used parameters and the mapping pairs are specified in a separate YAML file
-    that must be provided as well.
+    that must be provided as well. The YAML file is loaded once and shared by all TX configs.
     """
-    # read waveform parameter map from yaml file
-    dir_path = os.path.dirname(__file__)
-    src_path = os.path.split(dir_path)[0]
-    with open(os.path.join(src_path, "config", wireless_link_parameter_map_file), "r") as file:
-        wireless_link_parameter_map_dic = yaml.load(file, Loader=yaml.Loader)
-
-    # check if standard key is given
-    if wireless_link_parameter_map_dic["waveform_generator"][waveform_generator] is None:
-        raise Exception(
-            f"Invalid standard key: Name should be corrected or added to wireless_link_parameter_map.yaml, given: ",
-            waveform_generator,
-        )
-
-    #  get standard and name of generator
-    standard_key = wireless_link_parameter_map_dic["waveform_generator"][waveform_generator]
-
-    # get parameters map based on standard key
-    if standard_key["standard"] == "802.11":
-        waveform_parameter_map_dic = wireless_link_parameter_map_dic["transmitter"]["wifi"]
-    else:
-        waveform_parameter_map_dic = wireless_link_parameter_map_dic["transmitter"][
-            standard_key["standard"]
-        ]
-
-    # pre-allocate target dict
-    waveform_config = {}
-
-    for parameter_pair in waveform_parameter_map_dic:
-        # check if key for chosen simulator even exists
-        if waveform_generator + "_parameter" in parameter_pair.keys():
-            # only continue with mapping from file if direct equivalent exists
-            if parameter_pair[waveform_generator + "_parameter"]["name"]:
-                # It is not necessary to get all parameters from wireless_link_parameter_map.yaml in waveform_config_src
-                # since some parameters related to DL or UL only
-                if (
-                    parameter_pair[waveform_generator + "_parameter"]["name"]
-                    in waveform_config_src.keys()
-                ):
-                    # extract value from waveform config source
-                    value = waveform_config_src[
-                        parameter_pair[waveform_generator + "_parameter"]["name"]
-                    ]
-                    # additional mapping if parameter values should come from a discrete set of values
-                    if "value_map" in parameter_pair[waveform_generator + "_parameter"].keys():
-                        value = parameter_pair[waveform_generator + "_parameter"]["value_map"][
-                            value
-                        ]
-                    # write to target dictionary for SigMF
-                    waveform_config[parameter_pair["sigmf_parameter_name"]] = value
-            else:
-                raise Exception(
-                    f"Incomplete specification in field '{waveform_generator}_parameter'!"
-                )
-        # else:  # fill_non_explicit_fields
-        #     waveform_config[parameter_pair["sigmf_parameter_name"]] = "none"
+    wireless_link_parameter_map = get_wireless_link_parameter_map(wireless_link_parameter_map_file)
+    standard_key = wireless_link_parameter_map.get_standard_key(waveform_generator)
+    waveform_config = wireless_link_parameter_map.map_parameters(
+        waveform_config_src, waveform_generator
+    )
     if not waveform_config:
         raise Exception(
             """ERROR: Check waveform config: waveform_generator, waveform_file_name, waveform_path, waveform_path_type, waveform_format")
@@ -471,6 +575,28 @@ def map_metadata_to_sigmf_format(
     return waveform_config
 
 
+## Get the source files of the waveform config of the given format
+def get_waveform_config_files(waveform_path, waveform_file_name, waveform_format):
+    if waveform_format == "tdms":
+        # The IQ rate is read from the tdms waveform
+        return [
+            os.path.join(waveform_path, waveform_file_name + ".rfws"),
+            os.path.join(waveform_path, waveform_file_name + ".tdms"),
+        ]
+    elif waveform_format == "matlab":
+        return [os.path.join(waveform_path, waveform_file_name + ".yaml")]
+    elif waveform_format == "matlab_ieee":
+        return [os.path.join(waveform_path, waveform_file_name + "/cfg.csv")]
+    return []
+
+
+# Cache of mapped waveform configs, each waveform config is read once per campaign
+# key: (waveform path, file name, format, generator, wireless link parameter map,
+#       file keys of waveform config files and parameter map file)
+# A waveform regenerated under the same name gives a new key and is read again
+waveform_config_cache = {}
+
+
 # read tx waveform config
 def read_tx_waveform_config(tx_data_recording_api_config, wireless_link_parameter_map):
 
@@ -480,11 +606,29 @@ def read_tx_waveform_config(tx_data_recording_api_config, wireless_link_paramete
     waveform_format = tx_data_recording_api_config.waveform_format
     waveform_generator = tx_data_recording_api_config.waveform_generator
 
+    # Use cached waveform config, a copy is given to each TX config
+    waveform_config_key = (
+        waveform_path,
+        waveform_file_name,
+        waveform_format,
+        waveform_generator,
+        wireless_link_parameter_map,
+    ) + get_source_file_keys(
+        get_waveform_config_files(waveform_path, waveform_file_name, waveform_format)
+        + [get_wireless_link_parameter_map_path(wireless_link_parameter_map)]
+    )
+    if waveform_config_key in waveform_config_cache:
+        tx_data_recording_api_config.waveform_config = dict(
+            waveform_config_cache[waveform_config_key]
+        )
+        return tx_data_recording_api_config
+
     if waveform_format in ["tdms", "matlab", "matlab_ieee"]:
         if waveform_format == "tdms":
             waveform_config_src = read_tdms_waveform_config(
                 waveform_path,
                 waveform_file_name,
+                tx_data_recording_api_config.waveform_cache_path,
             )
         elif waveform_format in ["matlab", "matlab_ieee"]:
 
@@ -496,6 +640,9 @@ def read_tx_waveform_config(tx_data_recording_api_config, wireless_link_paramete
         tx_data_recording_api_config.waveform_config = map_metadata_to_sigmf_format(
             waveform_config_src, wireless_link_parameter_map, waveform_generator
         )
+        waveform_config_cache[waveform_config_key] = dict(
+            tx_data_recording_api_config.waveform_config
+        )
     else:
         raise Exception(f"Error: Waveform format is not supported: ", waveform_format)
 
@@ -30,6 +30,42 @@ import matplotlib.pyplot as plt
 #    * Read Waveforms functions
 # ***********************************************************************/
 
+## Get waveform channel of a TDMS file
+def get_waveform_channel_tdms(tdms_file):
+    # get all channels
+    group = tdms_file["waveforms"]
+    # get channel dat
+    channel = ""
+    if "Channel 0" in group:
+        channel = group["Channel 0"]
+    elif "segment0/channel0" in group:
+        channel = group["segment0/channel0"]
+    if not channel:
+        raise Exception("ERROR: Unknown channel name of a given TDMS Waveform")
+    return channel
+
+
+## Read waveform info in TDMS format from the file metadata only, the samples are not loaded
+# Return IQ rate, number of complex samples and channel layout
+def read_waveform_info_tdms(waveform_path, waveform_file_name):
+
+    path_to_file = os.path.join(waveform_path, waveform_file_name + ".tdms")
+    # check if file exists
+    if not exists(path_to_file):
+        raise Exception("ERROR: Waveform Config file is not exist", path_to_file)
+    tdms_file = TdmsFile.read_metadata(path_to_file)
+    channel = get_waveform_channel_tdms(tdms_file)
+
+    waveform_info = {
+        "waveform_IQ_rate": channel.properties["NI_RF_IQRate"],
+        # I and Q are interleaved in a single channel
+        "num_samples": len(channel) // 2,
+        "channel_name": channel.name,
+        "waveform_type": channel.properties.get("NI_RF_WaveformType", ""),
+    }
+    return waveform_info
+
+
 ## Read waveform data in TDMS format
 def read_waveform_data_tdms(waveform_path, waveform_file_name):
 
@@ -39,17 +75,7 @@ def read_waveform_data_tdms(waveform_path, waveform_file_name):
     file_exists = exists(path_to_file)
     if file_exists:
         tdms_file = TdmsFile.read(path_to_file)
-
-        # get all channels
-        group = tdms_file["waveforms"]
-        # get channel dat
-        channel = ""
-        if "Channel 0" in group:
-            channel = group["Channel 0"]
-        elif "segment0/channel0" in group:
-            channel = group["segment0/channel0"]
-        if not channel:
-            raise Exception("ERROR: Unknown channel name of a given TDMS Waveform")
+        channel = get_waveform_channel_tdms(tdms_file)
 
         waveform_IQ_rate = channel.properties["NI_RF_IQRate"]
 
@@ -0,0 +1,92 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Replay Memory Manager
+"""
+# Description:
+#   Manage the on-board memory (DRAM) of an RFNoC replay block to hold several TX waveforms at once.
+#       - Each waveform gets its own word-aligned memory region, identified by its waveform key
+#         (waveform file path, modification time and size), the samples are not hashed
+#       - Region sizes are a whole number of replay words, the replay block records and plays
+#         whole words only
+#       - Waveforms are uploaded once, switching between waveforms only changes the play address
+#       - If the memory is full, the least recently played waveforms are evicted
+#
+from collections import OrderedDict
+
+
+class ReplayMemoryManager:
+    """Allocator of replay block memory regions with least recently used eviction"""
+
+    def __init__(self, mem_size, word_size):
+        # Size of replay block memory in bytes
+        self.mem_size = int(mem_size)
+        # Size of words used by replay block in bytes, regions are aligned to words
+        self.word_size = int(word_size)
+        # Memory region (address, size) in bytes per waveform key, sizes are whole words,
+        # ordered from least to most recently used
+        self.regions = OrderedDict()
+        # Statistics: number of evicted waveforms
+        self.num_evictions = 0
+        # Waveforms of the campaign are uploaded on first use of the replay block
+        self.campaign_waveforms_uploaded = False
+
+    ## Round size up to a multiple of the word size
+    def align(self, size):
+        return -(-int(size) // self.word_size) * self.word_size
+
+    ## Get memory region of a resident waveform, None if the waveform is not in memory
+    def get_region(self, waveform_key):
+        region = self.regions.get(waveform_key)
+        if region is not None:
+            self.regions.move_to_end(waveform_key)
+        return region
+
+    ## Find the lowest free address for the given size, None if there is no gap large enough
+    def find_free_address(self, size):
+        aligned_size = self.align(size)
+        addr = 0
+        for region_addr, region_size in sorted(self.regions.values()):
+            if region_addr - addr >= aligned_size:
+                return addr
+            addr = max(addr, region_addr + self.align(region_size))
+        if self.mem_size - addr >= aligned_size:
+            return addr
+        return None
+
+    ## Check if the waveform fits into memory without evicting other waveforms
+    def has_free_space(self, size):
+        return self.find_free_address(size) is not None
+
+    ## Allocate memory region for a waveform, evict least recently used waveforms if needed
+    # The region size is rounded up to whole words, see get_region
+    def allocate(self, waveform_key, size):
+        if self.align(size) > self.mem_size:
+            raise Exception(
+                "ERROR: Waveform size",
+                size,
+                "bytes exceeds replay memory size",
+                self.mem_size,
+                "bytes",
+            )
+        self.free(waveform_key)
+        addr = self.find_free_address(size)
+        while addr is None:
+            evicted_hash, evicted_region = self.regions.popitem(last=False)
+            self.num_evictions = self.num_evictions + 1
+            print("Evict waveform from replay memory at address", evicted_region[0])
+            addr = self.find_free_address(size)
+        self.regions[waveform_key] = (addr, self.align(size))
+        return addr
+
+    ## Free memory region of a waveform, i.e. if upload failed
+    def free(self, waveform_key):
+        self.regions.pop(waveform_key, None)
+
+    ## Free all regions, the memory content is unknown
+    def clear(self):
+        self.regions.clear()
+        self.campaign_waveforms_uploaded = False
@@ -19,7 +19,6 @@ import signal
 # from timeit import default_timer as timer
 from pathlib import Path
 import pandas as pd
-import uhd
 import math
 
 # to read tdms properties from rfws file
@@ -37,12 +36,18 @@ from lib import run_rf_replay_data_transmitter
 from lib import run_rf_data_recorder
 from lib import sync_settings
 from lib import rf_data_recording_config_interface
+from lib import usrp_session_pool
+from lib import rx_worker_process
+from lib import device_backend
+from lib import data_format_conversion_lib
+from lib import master_clock_rate_planner
+from lib import instrumentation
 
 
 class RFDataRecorderAPI:
     """Top-level RF Data Recorder API class"""
 
-    def __init__(self, rf_data_acq_config_file):
+    def __init__(self, rf_data_acq_config_file, uhd_module=None):
         # read general parameter set from config file
         variations_map = rf_data_recording_config_interface.generate_rf_data_recording_configs(
             rf_data_acq_config_file
@@ -51,6 +56,16 @@ class RFDataRecorderAPI:
         # Store them in the class
         self.variations_map = variations_map
 
+        # Device session pool: keep one open USRP session per device for the whole campaign
+        # uhd_module: UHD python module, default is given by the device backend of the config
+        if uhd_module is None:
+            uhd_module = device_backend.get_uhd_module(variations_map.general_config.iloc[0])
+        self.session_pool = usrp_session_pool.USRPSessionPool(uhd_module)
+        # Campaign-wide master clock rate plan, the MCR is selected per variation if not given
+        self.master_clock_rate_plan = None
+        # RX worker processes per RX device address, if RX stations run in their own process
+        self.rx_workers = {}
+
     # Modulation schemes: lookup table as a constant dictionary:
     modulation_schemes = {"1": "BPSK", "2": "QPSK", "4": "16QAM", "6": "64QAM", "8": "256QAM"}
     RFmode = ["Tx", "Rx"]
@@ -93,16 +108,21 @@ class RFDataRecorderAPI:
             # absolute: Full path to waveform should be given to use waveforms from another directory
             # relative: path related to waveform folder given with the API
             self.waveform_path_type = iteration_config[tx_id + "_waveform_path_type"]
-            if self.waveform_path_type == "relative":
-                dir_path = os.path.dirname(__file__)
-                src_path = os.path.split(dir_path)[0]
-                self.waveform_path = os.path.join(src_path, self.waveform_path)
-            elif self.waveform_path_type == "absolute":
-                pass
-            else:
-                raise Exception("Error: Unknow waveform path type", self.waveform_path_type)
+            self.waveform_path = RFDataRecorderAPI.get_waveform_path(
+                self.waveform_path, self.waveform_path_type
+            )
             # "possible values: tdms, matlab_ieee, type = str ",
             self.waveform_format = iteration_config[tx_id + "_waveform_format"]
+            # "path to the cache of converted waveforms, type = str, cache is disabled if not given",
+            self.waveform_cache_path = general_config.get("waveform_cache_path", None)
+            # "waveforms (path, file name, format) played by this TX station during the campaign,
+            # they are uploaded once to the replay memory, type = list"
+            self.campaign_waveforms = [
+                (self.waveform_path, self.waveform_file_name, self.waveform_format)
+            ]
+            # "waveform samples and IQ rate loaded ahead of the variation execution,
+            # type = tuple (tx_data, waveform_IQ_rate), the waveform is read by the TX station if None"
+            self.tx_waveform = None
             # "clock reference source (internal, external, gpsdo, type = str",
             self.clock_reference = iteration_config["tx_clock_reference"]
             # "radio block to use (e.g., 0 or 1), type = int",
@@ -136,6 +156,8 @@ class RFDataRecorderAPI:
         def __init__(self, iteration_config, general_config, idx):
             # ============= RX Config parameters =============
             rx_id = RFDataRecorderAPI.RFmode[1] + str(idx)
+            # "RX station ID, i.e. Rx1, part of the multi-record file name, type = str"
+            self.station_id = rx_id
             # Device args to use when connecting to the USRP, type=str",
             self.args = iteration_config[rx_id + "_args"]
             # "RF center frequency in Hz, type = float ",
@@ -166,6 +188,14 @@ class RFDataRecorderAPI:
             self.rx_recorded_data_path = general_config["rx_recorded_data_path"]
             # rx recorded data saving format, type = str, possible values "SigMF"
             self.rx_recorded_data_saving_format = general_config["rx_recorded_data_saving_format"]
+            # rx recorded data type in SigMF notation, type = str, possible values "cf32_le", "ci16_le"
+            self.rx_recorded_data_type = general_config.get("rx_recorded_data_type", "cf32_le")
+            # write all records of a variation into a single SigMF dataset, type = bool
+            self.enable_multi_record_file = data_format_conversion_lib.str2bool(
+                general_config.get("enable_multi_record_file", "False")
+            )
+            # max number of retries of a record with RX stream errors, type = int, 0: no retry
+            self.rx_record_max_retries = int(general_config.get("rx_record_max_retries", 0))
             # "Hardware type, i.e. for USRP: USRP mboard ID (X310, or ....)
             self.hw_type = iteration_config[rx_id + "_hw_type"]
             # "Hardware subtype, i.e. for USRP: daughter board type (UBX-160, CBX-120)
@@ -185,6 +215,10 @@ class RFDataRecorderAPI:
             # channel parameters of this RX
             # expected channel atteuntion, type = float"
             self.channel_attenuation_db = iteration_config[rx_id + "_channel_attenuation_db"]
+            # index of this variation in the config cross product, type = int
+            self.variation_index = None
+            # duplicate variations with the same effective config, linked in the meta-data, type = list
+            self.linked_variations = []
 
     ## Get Hw type, subtype and HW ID of TX and RX stations
     # For USRP:
@@ -202,10 +236,10 @@ class RFDataRecorderAPI:
         def get_usrp_mboard_info(num_usrps, RFmode, variations_product):
             for n in range(num_usrps):
                 idx = n + 1
-                args_list = variations_product[RFmode + str(idx) + "_args"]
+                args_list = variations_product.column_values(RFmode + str(idx) + "_args")
                 args = args_list[0]
-                # open the session to USRP
-                usrp = uhd.usrp.MultiUSRP(args)
+                # open the session to USRP, the session is kept open in the pool
+                usrp = self.session_pool.get_multi_usrp(args).device
                 # get USRP daughterboard ID, UBX, CBX ...etc
                 if RFmode == RFDataRecorderAPI.RFmode[0]:
                     usrp_info = usrp.get_usrp_tx_info()
@@ -235,28 +269,22 @@ class RFDataRecorderAPI:
                         usrp_bandwidth,
                     )
 
-                data_frame_i = pd.DataFrame(
-                    {RFmode + str(idx) + "_hw_type": ["USRP " + usrp_mboard_id]}
+                # HW info is the same for all variations
+                variations_product.add_parameter(
+                    RFmode + str(idx) + "_hw_type", ["USRP " + usrp_mboard_id]
                 )
-                variations_product = variations_product.merge(data_frame_i, how="cross")
-
-                data_frame_i = pd.DataFrame(
-                    {RFmode + str(idx) + "_hw_subtype": [usrp_daughterboard_id_wo_ref]}
+                variations_product.add_parameter(
+                    RFmode + str(idx) + "_hw_subtype", [usrp_daughterboard_id_wo_ref]
                 )
-                variations_product = variations_product.merge(data_frame_i, how="cross")
-
-                data_frame_i = pd.DataFrame({RFmode + str(idx) + "_seid": [usrp_serial_number]})
-                variations_product = variations_product.merge(data_frame_i, how="cross")
-
-                data_frame_i = pd.DataFrame(
-                    {RFmode + str(idx) + "_max_RF_bandwidth": [usrp_bandwidth]}
+                variations_product.add_parameter(RFmode + str(idx) + "_seid", [usrp_serial_number])
+                variations_product.add_parameter(
+                    RFmode + str(idx) + "_max_RF_bandwidth", [usrp_bandwidth]
                 )
-                variations_product = variations_product.merge(data_frame_i, how="cross")
 
             return variations_product
 
         # get hW info of TX Stations
-        num_tx_usrps = int(general_config["num_tx_usrps"])
+        num_tx_usrps = int(general_config["num_tx_usrps"].iloc[0])
         if num_tx_usrps > 0:
             # if Tx station is USRP
             variations_product = get_usrp_mboard_info(
@@ -264,7 +292,7 @@ class RFDataRecorderAPI:
             )
 
         # get hW info of RX Stations
-        num_rx_usrps = int(general_config["num_rx_usrps"])
+        num_rx_usrps = int(general_config["num_rx_usrps"].iloc[0])
         if num_rx_usrps > 0:
             # if Rx station is USRP
             variations_product = get_usrp_mboard_info(
@@ -280,6 +308,43 @@ class RFDataRecorderAPI:
 
         return variations_map
 
+    ## Get full path of waveform folder
+    # waveform_path_type: relative (to the API src folder) or absolute
+    def get_waveform_path(waveform_path, waveform_path_type):
+        if waveform_path_type == "relative":
+            dir_path = os.path.dirname(__file__)
+            src_path = os.path.split(dir_path)[0]
+            waveform_path = os.path.join(src_path, waveform_path)
+        elif waveform_path_type == "absolute":
+            pass
+        else:
+            raise Exception("Error: Unknow waveform path type", waveform_path_type)
+        return waveform_path
+
+    ## Get all waveforms of each TX station used by the campaign
+    # Return list of waveforms (path, file name, format) per TX station
+    def get_campaign_tx_waveforms(self, variations_map):
+        variations_product = variations_map.variations_product
+        general_config = variations_map.general_config.iloc[0]
+        campaign_tx_waveforms = []
+        for idx in range(1, general_config["num_tx_usrps"] + 1):
+            tx_id = RFDataRecorderAPI.RFmode[0] + str(idx)
+            waveform_columns = [
+                tx_id + "_waveform_path",
+                tx_id + "_waveform_path_type",
+                tx_id + "_waveform_file_name",
+                tx_id + "_waveform_format",
+            ]
+            tx_waveforms = []
+            for waveform in variations_product.column_combinations(waveform_columns):
+                waveform_path, waveform_path_type, waveform_file_name, waveform_format = waveform
+                waveform_path = RFDataRecorderAPI.get_waveform_path(
+                    waveform_path, waveform_path_type
+                )
+                tx_waveforms.append((waveform_path, waveform_file_name, waveform_format))
+            campaign_tx_waveforms.append(tx_waveforms)
+        return campaign_tx_waveforms
+
     ## Update TX rate based on user selection:
     # "waveform_config": Set TX rate and bandwith based on waveform config
     # "user_defined": use the given value by the user in the config file: config_rf_data-recording_api
@@ -344,76 +409,24 @@ class RFDataRecorderAPI:
         return txs_data_recording_api_config, rxs_data_recording_api_config
 
     ## Find proper master clock rate
-    def calculate_master_clock_rate(requested_rate, usrp_mboard_id, args_in):
-        def round_up_to_even(f):
-            return math.ceil(f / 2.0) * 2
-
-        # Derive master clock rate for X310 / X300 USRP
-        if "X3" in usrp_mboard_id:
-            # There are two master clock rates (MCR) supported on the X300 and X310: 200.0 MHz and 184.32 MHz.
-            # The achievable sampling rates are by using an even decimation factor
-            master_clock_rate_x310 = [200e6, 184.32e6]
-
-            # Calculate the ratio between MCR and requested sampling rate
-            ratio_frac = [x / requested_rate for x in master_clock_rate_x310]
-            # Change to integer
-            ratio_integ = [round(x) for x in ratio_frac]
-            # Find the higher even number
-            ratio_even = []
-            for index, value in enumerate(ratio_frac):
-                value = ratio_integ[index]
-                if value < 1:
-                    ratio_even.append(2)
-                elif value < 2:
-                    ratio_even.append(0)
-                else:
-                    ratio_even.append(round_up_to_even(value))
-            # Calculate the deviation
-            ratio_dev = []
-            for index, value in enumerate(ratio_even):
-                value1 = ratio_even[index]
-                value2 = ratio_frac[index]
-                ratio_dev.append(abs(value1 - value2))
-            # Find the best MCR for the requested rate
-            pos = ratio_dev.index(min(ratio_dev))
-            master_clock_rate_config = master_clock_rate_x310[pos]
-            if master_clock_rate_config == 184.32e6:
-                args_out = args_in + ",master_clock_rate=184.32e6"
-            else:
-                args_out = args_in + ",master_clock_rate=200e6"
-        # Derive master clock rate for X410 USRP
-        elif "X4" in usrp_mboard_id:
-            # There are two master clock rates (MCR) supported on the X4XX: 245.76 MHz and 250 MHz.
-            # The achievable sampling rates are by using an even decimation factor
-            master_clock_rate_x310 = [245.76e6, 250e6]
-
-            # Calculate the ratio between MCR and requested sampling rate
-            ratio_frac = [x / requested_rate for x in master_clock_rate_x310]
-            # Change to integer
-            ratio_integ = [round(x) for x in ratio_frac]
-            # Find the higher even number
-            ratio_even = []
-            for index, value in enumerate(ratio_frac):
-                value = ratio_integ[index]
-                if value < 1:
-                    ratio_even.append(2)
-                elif value < 2:
-                    ratio_even.append(0)
-                else:
-                    ratio_even.append(round_up_to_even(value))
-            # Calculate the deviation
-            ratio_dev = []
-            for index, value in enumerate(ratio_even):
-                value1 = ratio_even[index]
-                value2 = ratio_frac[index]
-                ratio_dev.append(abs(value1 - value2))
-            # Find the best MCR for the requested rate
-            pos = ratio_dev.index(min(ratio_dev))
-            master_clock_rate_config = master_clock_rate_x310[pos]
-            if master_clock_rate_config == 245.76e6:
-                args_out = args_in + ",master_clock_rate=245.76e6"
-            else:
-                args_out = args_in + ",master_clock_rate=250e6"
+    # The planned master clock rate of the campaign is used if given,
+    # otherwise the master clock rate with the lowest decimation error for the requested rate
+    def calculate_master_clock_rate(
+        requested_rate, usrp_mboard_id, args_in, master_clock_rate_plan=None
+    ):
+        # Derive master clock rate for X410/X310/X300 USRP
+        if master_clock_rate_plan is not None:
+            master_clock_rate_config = master_clock_rate_plan.get_master_clock_rate(
+                args_in, requested_rate
+            )
+        else:
+            master_clock_rate_config = master_clock_rate_planner.select_master_clock_rate(
+                requested_rate, usrp_mboard_id
+            )
+        if master_clock_rate_config is not None:
+            args_out = master_clock_rate_planner.add_master_clock_rate_to_args(
+                args_in, master_clock_rate_config
+            )
         # Derive master clock rate for other USRPs is not supported yet
         else:
             print(
@@ -434,6 +447,7 @@ class RFDataRecorderAPI:
                 tx_data_recording_api_config.rate,
                 tx_data_recording_api_config.hw_type,
                 tx_data_recording_api_config.args,
+                self.master_clock_rate_plan,
             )
             txs_data_recording_api_config[tx_idx] = tx_data_recording_api_config
 
@@ -443,6 +457,7 @@ class RFDataRecorderAPI:
                 rx_data_recording_api_config.rate,
                 rx_data_recording_api_config.hw_type,
                 rx_data_recording_api_config.args,
+                self.master_clock_rate_plan,
             )
             rxs_data_recording_api_config[rx_idx] = rx_data_recording_api_config
 
@@ -476,20 +491,27 @@ class RFDataRecorderAPI:
             ] = rx_data_recording_api_config.bandwidth
         warnings.filterwarnings("default")
         print("Iteration config: ")
-        print(iteration_config)
+        print(pd.Series(iteration_config))
         print("General config: ")
         print(general_config)
 
+    ## Get streaming duration of a TX-only variation in seconds, None if TX is stopped by Ctrl+C
+    def get_tx_only_streaming_duration(general_config):
+        streaming_duration = general_config.get("tx_only_streaming_duration", None)
+        if streaming_duration is None:
+            return None
+        return float(streaming_duration)
+
     ## Use Ctrl-handler to stop TX in case of Tx Only
-    def call_stop_tx_siganl():
+    # streaming_duration: stop TX after the given time in seconds, if None wait for Ctrl+C
+    def call_stop_tx_siganl(variation_sync, streaming_duration=None):
         # Ctrl+C handler
         def signal_handler(sig, frame):
             print("Exiting . . .")
-            sync_settings.stop_tx_signal_called = True
+            variation_sync.stop_tx()
 
         # Wait until the Tx station is ready and then print how to stop tx
-        while sync_settings.start_rx_data_acquisition_called == False:
-            time.sleep(0.1)  # sleep for 100ms
+        variation_sync.start_rx_data_acquisition.wait()
 
         # ** Wait until user says to stop **
         # Setup SIGINT handler (Ctrl+C)
@@ -497,11 +519,19 @@ class RFDataRecorderAPI:
         list = ["\\", "|", "/", "—"]
         print("")
         print("Press Ctrl+C to stop RF streaming for this iteration ...")
-        while sync_settings.stop_tx_signal_called == False:
+        streaming_start_time = time.time()
+        while not variation_sync.stop_tx_signal.is_set():
             for i in range(0, 4):
                 index = i % 4
                 print("\rRF streaming {}".format(list[index]), end="")
                 time.sleep(0.1)  # sleep for 100ms
+            if (
+                streaming_duration is not None
+                and time.time() - streaming_start_time >= streaming_duration
+            ):
+                print("")
+                print("RF streaming duration elapsed, stop TX")
+                variation_sync.stop_tx()
 
     ## Start execution - TX emitters in parallel
     def start_execution_txs_in_parallel(
@@ -513,32 +543,42 @@ class RFDataRecorderAPI:
         rx_data_nbytes_que,
     ):
 
+        # Sync of TX and RX stations of this variation
+        # Trigger Rx:
+        # ---------The data acquisition will start as soon as all Tx stations started signal transmission
+        # Stop Tx:
+        # ------ As soon as the data of all Rx stations is recorded, the txs will stop data tranmission
+        variation_sync = sync_settings.VariationSync(
+            len(txs_data_recording_api_config), len(rxs_data_recording_api_config)
+        )
         # initialize threads
         threads = []
         # start transmitters
         for idx, tx_data_recording_api_config in enumerate(txs_data_recording_api_config):
             process = threading.Thread(
-                target=run_rf_replay_data_transmitter.rf_replay_data_transmitter,
-                args=(txs_data_recording_api_config[idx],),
+                target=variation_sync.run_station,
+                args=(
+                    run_rf_replay_data_transmitter.rf_replay_data_transmitter,
+                    txs_data_recording_api_config[idx],
+                    variation_sync,
+                    self.session_pool,
+                ),
             )
             process.start()
             threads.append(process)
 
         # start receivers
-        # Trigger Rx:
-        # ---------The data acquisition will start as soon as one Tx station is ready and started signal transmission
-        # ---------The flag: "sync_settings.start_rx_data_acquisition_called" is used for that
-        # Stop Tx:
-        # ------ As soon as the Rx data is recorded, the txs will stop data tranmission
-        # ------ The flag "sync_settings.stop_tx_signal_called" is used for that
         for idx, rx_data_recording_api_config in enumerate(rxs_data_recording_api_config):
             process = threading.Thread(
-                target=run_rf_data_recorder.rf_data_recorder,
+                target=variation_sync.run_station,
                 args=(
+                    self.get_rx_station(rxs_data_recording_api_config[idx], general_config),
                     rxs_data_recording_api_config[idx],
                     txs_data_recording_api_config,
                     general_config,
                     rx_data_nbytes_que,
+                    variation_sync,
+                    self.session_pool,
                 ),
             )
             process.start()
@@ -546,8 +586,10 @@ class RFDataRecorderAPI:
 
         # For Tx-only mode: the stop tx signal is done manaully using Ctrl+C command
         if api_operation_mode == RFDataRecorderAPI.API_operation_modes[0]:
-            # Ctrl+C handler
-            RFDataRecorderAPI.call_stop_tx_siganl()
+            # Ctrl+C handler, or stop after the TX-only streaming duration if given
+            RFDataRecorderAPI.call_stop_tx_siganl(
+                variation_sync, RFDataRecorderAPI.get_tx_only_streaming_duration(general_config)
+            )
 
         # We now pause execution on the main thread by 'joining' all of our started threads.
         # This ensures that each has finished processing the urls.
@@ -555,7 +597,8 @@ class RFDataRecorderAPI:
             process.join()
 
         # settling time
-        time.sleep(0.05)
+        with instrumentation.get_tracer().span("settle"):
+            time.sleep(0.05)
 
     ## Start execution - TX emitters in sequential
     def start_execution_txs_in_sequential(
@@ -569,32 +612,30 @@ class RFDataRecorderAPI:
     ):
 
         for tx_idx, tx_data_recording_api_config in enumerate(txs_data_recording_api_config):
-            ##  Initlize sync settings
-            sync_settings.init()
+            ##  Sync of the active TX and all RX stations
+            # Trigger Rx:
+            # ---------The data acquisition will start as soon as the Tx station started signal transmission
+            # Stop Tx:
+            # ------ As soon as the data of all Rx stations is recorded, the tx will stop data tranmission
+            variation_sync = sync_settings.VariationSync(1, len(rxs_data_recording_api_config))
             if enable_console_logging:
-                print(
-                    "Sync Status: Start Data acquisition called = ",
-                    sync_settings.start_rx_data_acquisition_called,
-                    " Stop Tx Signal called = ",
-                    sync_settings.stop_tx_signal_called,
-                )
+                print("Sync: Tx station ", tx_idx + 1, " of ", len(txs_data_recording_api_config))
             # initialize threads
             threads = []
             # start transmitter
             process = threading.Thread(
-                target=run_rf_replay_data_transmitter.rf_replay_data_transmitter,
-                args=(txs_data_recording_api_config[tx_idx],),
+                target=variation_sync.run_station,
+                args=(
+                    run_rf_replay_data_transmitter.rf_replay_data_transmitter,
+                    txs_data_recording_api_config[tx_idx],
+                    variation_sync,
+                    self.session_pool,
+                ),
             )
             process.start()
             threads.append(process)
 
             # start receivers
-            # Trigger Rx:
-            # ---------The data acquisition will start as soon as one Tx station is ready and started signal transmission
-            # ---------The flag: "sync_settings.start_rx_data_acquisition_called" is used for that
-            # Stop Tx:
-            # ------ As soon as the Rx data is recorded, the txs will stop data tranmission
-            # ------ The flag "sync_settings.stop_tx_signal_called" is used for that
 
             # Read tx config of related Tx to be stored in meta-data
             # In case of squential tranmissions, store only the meta-data of active Tx.
@@ -602,12 +643,15 @@ class RFDataRecorderAPI:
             for rx_idx, rx_data_recording_api_config in enumerate(rxs_data_recording_api_config):
                 rx_data_recording_api_config = rxs_data_recording_api_config[rx_idx]
                 process = threading.Thread(
-                    target=run_rf_data_recorder.rf_data_recorder,
+                    target=variation_sync.run_station,
                     args=(
+                        self.get_rx_station(rx_data_recording_api_config, general_config),
                         rx_data_recording_api_config,
                         txs_data_recording_api_config_i,
                         general_config,
                         rx_data_nbytes_que,
+                        variation_sync,
+                        self.session_pool,
                     ),
                 )
                 process.start()
@@ -615,8 +659,11 @@ class RFDataRecorderAPI:
 
             # Tx-only mode
             if api_operation_mode == RFDataRecorderAPI.API_operation_modes[0]:
-                # Ctrl+C handler
-                RFDataRecorderAPI.call_stop_tx_siganl(api_operation_mode)
+                # Ctrl+C handler, or stop after the TX-only streaming duration if given
+                RFDataRecorderAPI.call_stop_tx_siganl(
+                    variation_sync,
+                    RFDataRecorderAPI.get_tx_only_streaming_duration(general_config),
+                )
 
             # We now pause execution on the main thread by 'joining' all of our started threads.
             # This ensures that each has finished processing the urls.
@@ -624,7 +671,8 @@ class RFDataRecorderAPI:
                 process.join()
 
             # settling time
-            time.sleep(0.05)
+            with instrumentation.get_tracer().span("settle"):
+                time.sleep(0.05)
 
     ## Execute Rxs only for RX only mode
     def start_rxs_execution(
@@ -637,17 +685,19 @@ class RFDataRecorderAPI:
 
         threads = []
         # For Rx only, no trigger required from Tx to start data acquisition
-        # Send a command to start RX data acquisition
-        sync_settings.start_rx_data_acquisition_called = True
+        variation_sync = sync_settings.VariationSync(0, len(rxs_data_recording_api_config))
 
         for idx, rx_data_recording_api_config in enumerate(rxs_data_recording_api_config):
             process = threading.Thread(
-                target=run_rf_data_recorder.rf_data_recorder,
+                target=variation_sync.run_station,
                 args=(
+                    self.get_rx_station(rxs_data_recording_api_config[idx], general_config),
                     rxs_data_recording_api_config[idx],
                     txs_data_recording_api_config,
                     general_config,
                     rx_data_nbytes_que,
+                    variation_sync,
+                    self.session_pool,
                 ),
             )
             process.start()
@@ -659,4 +709,33 @@ class RFDataRecorderAPI:
             process.join()
 
         # settling time
-        time.sleep(0.05)
+        with instrumentation.get_tracer().span("settle"):
+            time.sleep(0.05)
+
+    ## Get RX station function: RF data recorder thread or RX worker process of the RX device
+    # rx_worker_type: "thread" runs the recorder in the main process, "process" in a RX worker process
+    def get_rx_station(self, rx_data_recording_api_config, general_config):
+        rx_worker_type = general_config.get("rx_worker_type", "thread")
+        if rx_worker_type not in rx_worker_process.RX_WORKER_TYPES:
+            raise Exception("ERROR: Unknown RX worker type", rx_worker_type)
+        if rx_worker_type == "thread":
+            return run_rf_data_recorder.rf_data_recorder
+        address = usrp_session_pool.get_device_address(rx_data_recording_api_config.args)
+        rx_worker = self.rx_workers.get(address)
+        if rx_worker is None:
+            # The RX device is opened by the worker, release the session of the main process
+            self.session_pool.close_session(rx_data_recording_api_config.args)
+            rx_worker = rx_worker_process.RxWorkerProcess()
+            self.rx_workers[address] = rx_worker
+        return rx_worker.record
+
+    ## Close all USRP sessions at the end of the campaign
+    def close_sessions(self):
+        for rx_worker in self.rx_workers.values():
+            rx_worker.close()
+        self.rx_workers = {}
+        print(
+            "Number of opened USRP sessions during the campaign: ",
+            self.session_pool.num_session_constructions,
+        )
+        self.session_pool.close_all()
@@ -18,6 +18,7 @@ import yaml
 import json
 import pandas as pd
 import functools
+import itertools
 from pathlib import Path
 
 # import other functions
@@ -47,10 +48,11 @@ def read_config_files(rf_data_acq_config_file: str):
 
 
 # Check whether dict of config is filled at all
+# A boolean value is filled, i.e. use_tx_timestamp: false
 def check_config_dict(config_dict):
     if bool(config_dict):
         for key, value in config_dict.items():
-            if not value:
+            if not value and not isinstance(value, bool):
                 raise Exception(f"Config field '{key}' is not filled!")
 
 
@@ -126,6 +128,74 @@ def get_device_variations_config_dict(device_variations_config_dict, RFmode, var
     return variations_dict, num_usrps
 
 
+# Lazy cross product of all parameter variations
+class VariationsProduct:
+    """Cross product of parameter variations, variations are created on access only"""
+
+    def __init__(self, variations_dict):
+        # parameter names and list of values per parameter
+        self.parameters = list(variations_dict.keys())
+        self.values = [list(values) for values in variations_dict.values()]
+
+    ## Number of variations
+    def __len__(self):
+        num_variations = 1
+        for values in self.values:
+            num_variations = num_variations * len(values)
+        return num_variations
+
+    ## Get variation by index, the last parameter changes fastest
+    # Mixed-radix decoding of the index: the number of values of each parameter is its radix
+    def __getitem__(self, index):
+        num_variations = len(self)
+        if index < 0:
+            index = index + num_variations
+        if index < 0 or index >= num_variations:
+            raise IndexError("Variation index out of range")
+        variation = {}
+        for parameter, values in zip(reversed(self.parameters), reversed(self.values)):
+            index, value_idx = divmod(index, len(values))
+            variation[parameter] = values[value_idx]
+        # keep parameter order of the config file
+        return {parameter: variation[parameter] for parameter in self.parameters}
+
+    ## Iterate over all variations in index order
+    def __iter__(self):
+        for values in itertools.product(*self.values):
+            yield dict(zip(self.parameters, values))
+
+    ## Add a parameter to all variations, i.e. HW info
+    def add_parameter(self, parameter, values):
+        if parameter in self.parameters:
+            self.values[self.parameters.index(parameter)] = list(values)
+        else:
+            self.parameters.append(parameter)
+            self.values.append(list(values))
+
+    ## Get list of values of a parameter
+    def column_values(self, parameter):
+        return self.values[self.parameters.index(parameter)]
+
+    ## Get all distinct combinations of values of the given parameters
+    def column_combinations(self, parameters):
+        combinations = []
+        for combination in itertools.product(
+            *[self.column_values(parameter) for parameter in parameters]
+        ):
+            if combination not in combinations:
+                combinations.append(combination)
+        return combinations
+
+    def __str__(self):
+        lines = []
+        for parameter, values in zip(self.parameters, self.values):
+            lines.append(parameter + ": " + str(values))
+        lines.append(
+            "[" + str(len(self)) + " variations x " + str(len(self.parameters)) + " parameters]"
+        )
+        return "\n".join(lines)
+
+
 # Create variation map
 class CreateVariationsMap:
     """Top-level Create variation map class"""
@@ -184,17 +254,8 @@ class CreateVariationsMap:
         # ---------------------------------------
         ## Get Variations map by doing a Cross-product
         # --------------------------------------
-        # First, create a data frame for all parameters
-        # preallocate list to collect pandas data frames
-        variations_list = list(variations_dict.items())
-        parameter_config = variations_list[0]
-        parameter, value = parameter_config
-        variations_product = pd.DataFrame({parameter: value})
-        for i in range(len(variations_list) - 1):
-            parameter_config = variations_list[i + 1]
-            parameter, value = parameter_config
-            data_frame_i = pd.DataFrame({parameter: value})
-            variations_product = variations_product.merge(data_frame_i, how="cross")
+        # The cross product is not materialized, variations are created on access
+        variations_product = VariationsProduct(variations_dict)
 
         # Store variations product in self class
         self.variations_product = variations_product
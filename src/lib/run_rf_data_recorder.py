@@ -18,7 +18,6 @@ RF Data Recorder
 from pickle import FALSE, TRUE
 from unicodedata import name
 import numpy as np
-import uhd
 
 # To save to specific path
 import os
@@ -32,12 +31,190 @@ from termcolor import colored, cprint
 
 # import related functions
 from lib import write_rx_recorded_data_in_sigmf
-from lib import sync_settings
+from lib import usrp_session_pool
+from lib import rx_data_writer
+from lib import instrumentation
 
+# Complex int16 sample: interleaved I and Q as given by the sc16 wire format
+SC16_DTYPE = np.dtype([("re", "<i2"), ("im", "<i2")])
 
-def rf_data_recorder(rx_args, txs_args, general_config, rx_data_nbytes_que):
+# Supported RX recorded data types in SigMF notation
+# SigMF data type: (UHD CPU format, numpy data type of the record buffers)
+RX_RECORDED_DATA_TYPES = {
+    "cf32_le": ("fc32", np.complex64),
+    # sc16 samples are streamed to the host and written to file without conversion
+    "ci16_le": ("sc16", SC16_DTYPE),
+}
+
+# Number of record buffers: capture the next record while the previous one is written
+NUM_RX_RECORD_BUFFERS = 2
+
+# Errors reported by the RX metadata of a recv call, counted per record and per device
+#   overflow: samples were dropped, the host did not read the stream fast enough
+#   sequence_error: packets were lost between device and host
+#   timeout: no samples were received within the timeout, the record is incomplete
+#   late: the stream command was issued too late
+#   other: broken chain, alignment or bad packet
+# Instrumentation counter of each error
+RX_STREAM_ERROR_COUNTERS = {
+    "overflow": "rx_overflows",
+    "sequence_error": "rx_sequence_errors",
+    "timeout": "rx_timeouts",
+    "late": "rx_late_commands",
+    "other": "rx_other_errors",
+}
+RX_STREAM_ERRORS = list(RX_STREAM_ERROR_COUNTERS)
+
+
+## Get shape (number of channels, number of samples) and numpy data type of a RX record buffer
+def get_rx_record_layout(rx_args):
+    if rx_args.rx_recorded_data_type not in RX_RECORDED_DATA_TYPES:
+        raise Exception(
+            "ERROR: Unknown or not supported Rx recorded data type", rx_args.rx_recorded_data_type
+        )
+    channels = rx_args.channels if isinstance(rx_args.channels, list) else [rx_args.channels]
+    num_rx_samps = int(np.ceil(rx_args.duration * rx_args.rate))
+    return (len(channels), num_rx_samps), RX_RECORDED_DATA_TYPES[rx_args.rx_recorded_data_type][1]
+
+
+class RxCaptureEngine:
+    """Configure the RX radio once per variation and capture records using stream commands"""
+
+    def __init__(self, uhd, usrp, rx_streamer, channels, dtype=np.complex64):
+        self.uhd = uhd
+        self.usrp = usrp
+        self.rx_streamer = rx_streamer
+        self.channels = channels
+        # Receive buffer for multi-channel capture, allocated once
+        self.max_num_samps = rx_streamer.get_max_num_samps()
+        self.recv_buffer = np.zeros((len(channels), self.max_num_samps), dtype=dtype)
+        self.rx_metadata = uhd.types.RXMetadata()
+        # Errors reported by the RX stream during the last capture
+        self.record_errors = dict.fromkeys(RX_STREAM_ERRORS, 0)
+        # Errors reported by the RX stream of the device and number of captured again records
+        self.stream_errors = dict.fromkeys(RX_STREAM_ERRORS, 0)
+        self.num_record_retries = 0
+
+    ## Set RF frequency, rate and gain once, all records of this variation use the same config
+    # Only settings changed since the previous variation are pushed to the device
+    # Return True if RF tuning (rate or frequency) changed
+    def configure(self, freq, rate, gain, applied_settings):
+        tuning_changed = False
+        for chan in self.channels:
+            if applied_settings.is_changed(("rx_rate", chan), rate):
+                self.usrp.set_rx_rate(rate, chan)
+                applied_settings.update(("rx_rate", chan), rate)
+                # DSP frequency depends on the rate, tune again
+                applied_settings.invalidate(("rx_freq", chan))
+            if applied_settings.is_changed(("rx_freq", chan), freq):
+                self.usrp.set_rx_freq(self.uhd.types.TuneRequest(freq), chan)
+                applied_settings.update(("rx_freq", chan), freq)
+                tuning_changed = True
+                # Gain tables can depend on the frequency band, set gain again
+                applied_settings.invalidate(("rx_gain", chan))
+            if applied_settings.is_changed(("rx_gain", chan), gain):
+                self.usrp.set_rx_gain(gain, chan)
+                applied_settings.update(("rx_gain", chan), gain)
+        return tuning_changed
+
+    ## Wait for LO lock as RF settling time if the daughterboard supports the LO locked sensor
+    def wait_for_lo_locked(self, timeout=1.0):
+        start_time = time.time()
+        for chan in self.channels:
+            if "lo_locked" not in self.usrp.get_rx_sensor_names(chan):
+                continue
+            while not self.usrp.get_rx_sensor("lo_locked", chan).to_bool():
+                if time.time() - start_time > timeout:
+                    print("Warning: RX LO is not locked on channel ", chan)
+                    break
+                time.sleep(0.001)
+
+    ## Capture a single record into the given preallocated buffer [channels, samples]
+    # The RX metadata of each recv call is checked, errors of the record are kept in record_errors
+    # Return number of received samples, it is less than the record size after a timeout
+    def capture(self, rx_data, timeout=1.0):
+        num_samps = rx_data.shape[-1]
+        self.record_errors = dict.fromkeys(RX_STREAM_ERRORS, 0)
+        # Request exactly one record, the streamer stops after the requested number of samples
+        stream_cmd = self.uhd.types.StreamCMD(self.uhd.types.StreamMode.num_done)
+        stream_cmd.num_samps = num_samps
+        stream_cmd.stream_now = True
+        self.rx_streamer.issue_stream_cmd(stream_cmd)
+
+        total_samps = 0
+        while total_samps < num_samps:
+            if len(self.channels) == 1:
+                # Single channel: receive directly into the record buffer
+                samps = self.rx_streamer.recv(
+                    rx_data[0, total_samps:], self.rx_metadata, timeout
+                )
+                real_samps = min(num_samps - total_samps, samps)
+            else:
+                # Multi-channel: every channel row of the record buffer is not contiguous
+                samps = self.rx_streamer.recv(self.recv_buffer, self.rx_metadata, timeout)
+                real_samps = min(num_samps - total_samps, samps)
+                rx_data[:, total_samps : total_samps + real_samps] = self.recv_buffer[
+                    :, 0:real_samps
+                ]
+            total_samps = total_samps + real_samps
+
+            if self.rx_metadata.error_code != self.uhd.types.RXMetadataErrorCode.none:
+                stream_error = self.get_stream_error()
+                self.record_errors[stream_error] = self.record_errors[stream_error] + 1
+                self.stream_errors[stream_error] = self.stream_errors[stream_error] + 1
+                # No more samples are received for this record
+                if stream_error == "timeout":
+                    break
+
+        return total_samps
+
+    ## Get the RX stream error of the last recv call
+    def get_stream_error(self):
+        error_codes = self.uhd.types.RXMetadataErrorCode
+        if self.rx_metadata.error_code == error_codes.overflow:
+            # UHD reports lost packets as an overflow out of sequence
+            if self.rx_metadata.out_of_sequence:
+                return "sequence_error"
+            return "overflow"
+        if self.rx_metadata.error_code == error_codes.timeout:
+            return "timeout"
+        if self.rx_metadata.error_code == error_codes.late:
+            return "late"
+        return "other"
+
+    ## Stop the RX stream and drop samples in flight after a corrupted capture
+    def stop_stream(self, timeout=0.1):
+        self.rx_streamer.issue_stream_cmd(
+            self.uhd.types.StreamCMD(self.uhd.types.StreamMode.stop_cont)
+        )
+        while self.rx_streamer.recv(self.recv_buffer, self.rx_metadata, timeout) > 0:
+            pass
+
+    ## Print errors of the RX stream and number of captured again records
+    def print_stream_errors(self):
+        print("Rx stream errors:")
+        for stream_error, count in self.stream_errors.items():
+            print("   ", stream_error, ":", colored(count, "red" if count else "green"))
+        print("    record retries:", colored(self.num_record_retries, "yellow"))
+
+
+# record_memory: memory of the record buffers if the recorder runs in an RX worker process
+def rf_data_recorder(
+    rx_args,
+    txs_args,
+    general_config,
+    rx_data_nbytes_que,
+    variation_sync,
+    session_pool=None,
+    record_memory=None,
+):
     """RX Data Recorder"""
 
+    # Use a local session pool if no campaign session pool is given
+    close_session_pool = session_pool is None
+    if close_session_pool:
+        session_pool = usrp_session_pool.USRPSessionPool()
+
     # Check if motherboard type is x4xx
     isX4xx = bool(rx_args.hw_type.find("x4xx"))
 
@@ -47,117 +224,241 @@ def rf_data_recorder(rx_args, txs_args, general_config, rx_data_nbytes_que):
     if not isinstance(rx_args.channels, list):
         rx_args.channels = [rx_args.channels]
 
-    # Initialize usrp
+    # Initialize usrp, reuse the open session of the campaign if possible
     print("Initialize usrp ...")
-    usrp = uhd.usrp.MultiUSRP(rx_args.args)
+    session = session_pool.get_multi_usrp(rx_args.args)
+    usrp = session.device
     usrp_info = usrp.get_usrp_rx_info()
     # print("RX USRP info:")
     # print(usrp_info)
     # rx_args.usrp_mboard_serial = usrp_info["mboard_serial"]
     # rx_args.usrp_mboard_id = usrp_info["mboard_id"]
 
+    # Settings applied to the device by previous variations, only changed settings are pushed
+    applied_settings = session.applied_settings
+
     # Set clock reference
-    usrp.set_clock_source(rx_args.clock_reference)
+    if applied_settings.is_changed("clock_source", rx_args.clock_reference):
+        usrp.set_clock_source(rx_args.clock_reference)
+        # RF settings are applied again after changing the clock reference
+        applied_settings.clear()
+        applied_settings.update("clock_source", rx_args.clock_reference)
 
     # Set up the stream
     print("Setup the stream ...")
-    cpu_format = "fc32"
+    if rx_args.rx_recorded_data_type not in RX_RECORDED_DATA_TYPES:
+        raise Exception(
+            "ERROR: Unknown or not supported Rx recorded data type", rx_args.rx_recorded_data_type
+        )
+    cpu_format, rx_data_dtype = RX_RECORDED_DATA_TYPES[rx_args.rx_recorded_data_type]
     wire_format = "sc16"
-    st_args = uhd.usrp.StreamArgs(cpu_format, wire_format)
-    st_args.channels = rx_args.channels  # If you're only using one channel, then this is simply [0]
-    rx_streamer = usrp.get_rx_stream(st_args)
+    # If you're only using one channel, then channels is simply [0]
+    rx_streamer = session_pool.get_rx_streamer(session, cpu_format, wire_format, rx_args.channels)
 
     # Set receive port (TX/RX or RX2)
+    tuning_changed = False
     for index in rx_args.channels:
-        usrp.set_rx_antenna(rx_args.antenna, index)
+        if applied_settings.is_changed(("rx_antenna", index), rx_args.antenna):
+            usrp.set_rx_antenna(rx_args.antenna, index)
+            applied_settings.update(("rx_antenna", index), rx_args.antenna)
+            tuning_changed = True
         # set the IF filter bandwidth
-        if not isX4xx:
+        if not isX4xx and applied_settings.is_changed(("rx_bandwidth", index), rx_args.bandwidth):
             usrp.set_rx_bandwidth(rx_args.bandwidth, index)
-    # set RF Configure and capture zero sample for RF Settling time
-    usrp.recv_num_samps(
-        0,
-        rx_args.freq,
-        rx_args.rate,
-        rx_args.channels,
-        rx_args.gain,
-        streamer=rx_streamer,
+            applied_settings.update(("rx_bandwidth", index), rx_args.bandwidth)
+            tuning_changed = True
+    # Set RF Configure once for all records and wait for RF Settling time if tuning changed
+    capture_engine = RxCaptureEngine(
+        session_pool.uhd, usrp, rx_streamer, rx_args.channels, rx_data_dtype
     )
-    # Wait to get a command to start RX data acquisition if TX is on TX mode already
-    while sync_settings.start_rx_data_acquisition_called == False:
-        time.sleep(0.1)  # sleep for 100ms
+    if capture_engine.configure(rx_args.freq, rx_args.rate, rx_args.gain, applied_settings):
+        tuning_changed = True
+    tracer = instrumentation.get_tracer()
+    if tuning_changed:
+        with tracer.span("settle", station=rx_args.args):
+            capture_engine.wait_for_lo_locked()
+    # Get USRP coerced values only once, they are part of the meta-data
+    read_coerced_rx_values(usrp, rx_args)
+
+    # Check the writing format before starting the data acquisition
+    if rx_args.rx_recorded_data_saving_format != "SigMF":
+        # Report error.
+        raise Exception("ERROR: selected writing Rx recorded data format is not supported")
+
+    # SigMF metadata is created and validated once per variation, records only patch their fields
+    # It is created while the TX stations start their signals
+    with tracer.span("metadata", station=rx_args.args):
+        metadata_template = write_rx_recorded_data_in_sigmf.SigMFMetadataTemplate(
+            rx_args, txs_args, general_config
+        )
+
+    # Wait until all TX signals are on the air
+    variation_sync.wait_for_rx_start()
+
+    # Write data into files with the given format in the writer thread
+    # Multi-record file: all records of the variation are appended to a single SigMF dataset
+    multi_record_writer = []
+
+    def write_rx_record(rx_data, record_idx, capture_time, rx_record_status):
+        if rx_args.enable_multi_record_file:
+            if not multi_record_writer:
+                multi_record_writer.append(
+                    write_rx_recorded_data_in_sigmf.SigMFMultiRecordWriter(
+                        rx_args, txs_args, general_config, capture_time, metadata_template
+                    )
+                )
+            multi_record_writer[0].append(rx_data, record_idx, capture_time, rx_record_status)
+        else:
+            write_rx_recorded_data_in_sigmf.write_rx_recorded_data_in_sigmf(
+                rx_data,
+                rx_args,
+                txs_args,
+                general_config,
+                record_idx,
+                capture_time,
+                metadata_template,
+                rx_record_status,
+            )
+
+    # Double buffering: capture the next record while the previous one is written to disk
+    buffer_pool = rx_data_writer.RxRecordBufferPool(
+        NUM_RX_RECORD_BUFFERS,
+        (len(rx_args.channels), rx_args.num_rx_samps),
+        rx_data_dtype,
+        record_memory,
+    )
+    rx_writer = rx_data_writer.RxDataWriter(buffer_pool, write_rx_record)
 
     # Run data recording loop over specified number of iterations
     print("Start fetching RX data from USRP...")
 
     rx_data_nbytes = 0.0
+    recording_start_time = time.time()
+
+    try:
+        for i in range(rx_args.nrecords):
+            rx_data_nbytes = rx_data_nbytes + capture_rx_record(
+                capture_engine, rx_writer, i, rx_args.args, rx_args.rx_record_max_retries
+            )
+    finally:
+        # TX stops data transmission when the last RX data acquisition is done
+        variation_sync.rx_data_acquisition_done()
+        with tracer.span("record_flush", station=rx_args.args):
+            # Wait until all records are written
+            rx_writer.close()
+            # Write meta-data of multi-record file once at the end of the variation
+            if multi_record_writer:
+                multi_record_writer[0].close()
+
+    rx_writer.print_stage_timings(time.time() - recording_start_time)
+    capture_engine.print_stream_errors()
+    rx_data_nbytes_que.put(rx_data_nbytes)
+
+    if close_session_pool:
+        session_pool.close_all()
 
-    for i in range(rx_args.nrecords):
-        print("")
+
+## Capture a single record into a free buffer and hand it over to the writer thread
+# A record with RX stream errors is corrupted, it is captured again up to max_retries times
+# A record still corrupted after all retries is written and marked as corrupted, missing samples
+# of a short record (i.e. after an overflow) are filled with zeros
+# The RX stream is stopped after each corrupted capture, samples in flight of its stream command
+# are dropped and do not leak into the next record
+# station: device args of the RX station, label of the instrumentation counters
+def capture_rx_record(capture_engine, rx_writer, i, station=None, max_retries=0):
+    print("")
+    buffer_idx, rx_data = rx_writer.acquire_buffer()
+    tracer = instrumentation.get_tracer()
+    # Errors of all captures of this record
+    record_errors = dict.fromkeys(RX_STREAM_ERRORS, 0)
+    retries = 0
+    while True:
         # Fetch data from usrp device
         start_time = time.time()
-        rx_data = usrp.recv_num_samps(
-            rx_args.num_rx_samps,
-            rx_args.freq,
-            rx_args.rate,
-            rx_args.channels,
-            rx_args.gain,
-            streamer=rx_streamer,
+        with tracer.span("capture", station=station, record=i, retry=retries):
+            num_received_samps = capture_engine.capture(rx_data)
+        capture_duration = time.time() - start_time
+        for stream_error, count in capture_engine.record_errors.items():
+            record_errors[stream_error] = record_errors[stream_error] + count
+        corrupted = any(capture_engine.record_errors.values())
+        if corrupted:
+            capture_engine.stop_stream()
+        if not corrupted or retries >= max_retries:
+            break
+        retries = retries + 1
+        print(
+            colored("Warning: Rx record #" + str(i) + " is corrupted, retry", "red"),
+            retries,
+            "of",
+            max_retries,
         )
+    capture_engine.num_record_retries = capture_engine.num_record_retries + retries
+    tracer.add("rx_bytes", rx_data.nbytes, station=station)
+    tracer.add("rx_records", 1, station=station)
+    if retries:
+        tracer.add("rx_record_retries", retries, station=station)
+    for stream_error, count in record_errors.items():
+        if count:
+            tracer.add(RX_STREAM_ERROR_COUNTERS[stream_error], count, station=station)
+    if num_received_samps == 0:
+        raise Exception("ERROR: Rx timeout, no samples received for record ", i)
+    if num_received_samps < rx_data.shape[-1]:
+        rx_data[:, num_received_samps:] = 0
+    if corrupted:
+        tracer.add("rx_corrupted_records", 1, station=station)
         print(
-            "Received ",
-            colored(rx_data.size, "green"),
-            " samples - record number #",
-            colored(i, "green"),
+            colored("Warning: Rx record #" + str(i) + " is written with stream errors,", "red"),
+            "received",
+            num_received_samps,
+            "of",
+            rx_data.shape[-1],
+            "samples",
         )
-        rx_data_nbytes = rx_data_nbytes + rx_data.nbytes
-
-        # Get USRP coerced values only once
-        # To reduce latency, the number of records is executed per each configuration
-        if i == 0:
-            # In the future, if we are going to extend the code to capture from multiple channels, we should update the meta-data also. We can read those coerced values in a loop based on the channels order.
-            print(f"Requesting RX Freq: {(rx_args.freq / 1e6)} MHz...")
-            rx_args.coerced_rx_freq = usrp.get_rx_freq(rx_args.channels[0])
-            print(f"Actual RX Freq: {rx_args.coerced_rx_freq / 1e6}  MHz...")
-            print(
-                f"** RX Carrier Frequency Offset: {rx_args.coerced_rx_freq - rx_args.freq}  Hz..."
-            )
+    print(
+        "Received ",
+        colored(rx_data.size, "green"),
+        " samples - record number #",
+        colored(i, "green"),
+    )
+    print(
+        "Elapsed time of getting Rx samples:",
+        colored(int(capture_duration * 1000), "yellow"),
+        "ms",
+    )
+    # Write data into files in the writer thread, the RX stream status is part of the meta-data
+    rx_record_status = {
+        "errors": record_errors,
+        "retries": retries,
+        "corrupted": corrupted,
+        "num_received_samps": num_received_samps,
+    }
+    rx_writer.submit(buffer_idx, i, start_time, capture_duration, rx_record_status)
 
-            print(f"Requesting RX Rate: {(rx_args.rate / 1e6) } Msps...")
-            rx_args.coerced_rx_rate = usrp.get_rx_rate(rx_args.channels[0])
-            print(f"Actual RX Rate: {(rx_args.coerced_rx_rate / 1e6)} Msps...")
-            print(
-                f"** RX Sampling Rate Offset: {rx_args.coerced_rx_rate - rx_args.rate}  Sample per second..."
-            )
+    return rx_data.nbytes
 
-            print(f"Requesting RX Gain: {rx_args.gain} dB...")
-            rx_args.coerced_rx_gain = usrp.get_rx_gain(rx_args.channels[0])
-            print(f"Actual RX Gain: {rx_args.coerced_rx_gain} dB...")
 
-            print(f"Requesting RX Bandwidth: {(rx_args.bandwidth / 1e6)} MHz...")
-            rx_args.coerced_rx_bandwidth = usrp.get_rx_bandwidth(rx_args.channels[0])
-            print(f"Actual RX Bandwidth: {rx_args.coerced_rx_bandwidth / 1e6} MHz...")
-            print("Note: Not all doughterboards support variable analog bandwidth")
+## Read USRP coerced values
+# In the future, if we are going to extend the code to capture from multiple channels, we should update the meta-data also. We can read those coerced values in a loop based on the channels order.
+def read_coerced_rx_values(usrp, rx_args):
+    print(f"Requesting RX Freq: {(rx_args.freq / 1e6)} MHz...")
+    rx_args.coerced_rx_freq = usrp.get_rx_freq(rx_args.channels[0])
+    print(f"Actual RX Freq: {rx_args.coerced_rx_freq / 1e6}  MHz...")
+    print(f"** RX Carrier Frequency Offset: {rx_args.coerced_rx_freq - rx_args.freq}  Hz...")
 
-            # rx_args.coerced_rx_lo_source = usrp.get_rx_lo_source()  # Not part of meta data yet
+    print(f"Requesting RX Rate: {(rx_args.rate / 1e6) } Msps...")
+    rx_args.coerced_rx_rate = usrp.get_rx_rate(rx_args.channels[0])
+    print(f"Actual RX Rate: {(rx_args.coerced_rx_rate / 1e6)} Msps...")
+    print(
+        f"** RX Sampling Rate Offset: {rx_args.coerced_rx_rate - rx_args.rate}  Sample per second..."
+    )
 
-        # Write data into files with the given format
-        if rx_args.rx_recorded_data_saving_format == "SigMF":
-            write_rx_recorded_data_in_sigmf.write_rx_recorded_data_in_sigmf(
-                rx_data, rx_args, txs_args, general_config, i
-            )
-        else:
-            # Report error.
-            raise Exception("ERROR: selected writing Rx recorded data format is not supported")
+    print(f"Requesting RX Gain: {rx_args.gain} dB...")
+    rx_args.coerced_rx_gain = usrp.get_rx_gain(rx_args.channels[0])
+    print(f"Actual RX Gain: {rx_args.coerced_rx_gain} dB...")
 
-        end_time = time.time()
-        time_elapsed = end_time - start_time
-        time_elapsed_ms = int(time_elapsed * 1000)
-        print(
-            "Elapsed time of getting Rx samples and writing data and meta data files:",
-            colored(time_elapsed_ms, "yellow"),
-            "ms",
-        )
-    rx_data_nbytes_que.put(rx_data_nbytes)
+    print(f"Requesting RX Bandwidth: {(rx_args.bandwidth / 1e6)} MHz...")
+    rx_args.coerced_rx_bandwidth = usrp.get_rx_bandwidth(rx_args.channels[0])
+    print(f"Actual RX Bandwidth: {rx_args.coerced_rx_bandwidth / 1e6} MHz...")
+    print("Note: Not all doughterboards support variable analog bandwidth")
 
-    # Send command to TX thread to stop data transmission
-    sync_settings.stop_tx_signal_called = True
+    # rx_args.coerced_rx_lo_source = usrp.get_rx_lo_source()  # Not part of meta data yet
@@ -19,13 +19,14 @@ import signal
 import time
 import argparse
 import numpy as np
-import uhd
 from nptdms import TdmsFile
 import scipy.io
 
 # import other functions
-from lib import read_waveform_data_interface
-from lib import sync_settings
+from lib import waveform_cache
+from lib import replay_memory_manager
+from lib import usrp_session_pool
+from lib import instrumentation
 
 # string to boolean
 def str2bool(v):
@@ -39,23 +40,20 @@ def str2bool(v):
         raise argparse.ArgumentTypeError("Boolean value expected.")
 
 
-def rf_replay_data_transmitter(args):
-    """
-    Run Tx waveform playback
-    """
+class TxGraphChain:
+    """RFNoC blocks and TX streamer of the Replay -> DUC -> Radio chain"""
 
-    # Print help message
-    print("UHD/RFNoC Replay samples from file ")
-    print("This application uses the Replay block to playback data from a file to a radio")
+    def __init__(self, radio_ctrl, replay_ctrl, duc_ctrl, tx_streamer):
+        self.radio_ctrl = radio_ctrl
+        self.replay_ctrl = replay_ctrl
+        self.duc_ctrl = duc_ctrl
+        self.tx_streamer = tx_streamer
 
-    # Check if motherboard type is x4xx
-    isX4xx = bool(args.hw_type.find("x4xx"))
 
-    # ************************************************************************
-    # Create device and block controls
-    # ************************************************************************
-    print("Creating the RFNoC graph with args: ", args.args)
-    graph = uhd.rfnoc.RfnocGraph(args.args)
+## Create the block controls, connect the blocks and commit the graph
+# This is done only once per RFNoC graph session, the chain is reused for the next variations
+# uhd: UHD python module of the session pool
+def setup_tx_graph_chain(graph, args, uhd, num_ports):
     # print("USRP Static connections:")
     # for edge in graph.enumerate_static_connections():
     #    print(edge.to_string())
@@ -71,8 +69,8 @@ def rf_replay_data_transmitter(args):
     # Check if the replay block exists on this device
     replay_ctrl_id = uhd.rfnoc.BlockID(0, "Replay", args.replay_id)
     if graph.has_block(replay_ctrl_id) == False:
-        print('Unable to find block "' + replay_ctrl_id + '"')
-        return
+        # Raise error, so the variation is aborted and the RX stations do not wait for the signal
+        raise Exception('ERROR: Replay block not found: "' + str(replay_ctrl_id) + '"')
     replay_ctrl = uhd.rfnoc.ReplayBlockControl(graph.get_block(replay_ctrl_id))
 
     # Check for a DUC connected to the radio
@@ -96,10 +94,8 @@ def rf_replay_data_transmitter(args):
     # ************************************************************************
     replay_ctrl.set_play_type("sc16", 0)
     replay_ctrl.set_record_type("sc16", 0)
-    tx_md = uhd.types.TXMetadata()
     cpu_format = "fc32"
     wire_format = "sc16"
-    num_ports = 1
 
     print("Setting up graph...")
     stream_args = uhd.usrp.StreamArgs(cpu_format, wire_format)
@@ -107,20 +103,311 @@ def rf_replay_data_transmitter(args):
     graph.connect(tx_streamer, 0, replay_ctrl.get_unique_id(), args.replay_chan)
     graph.commit()
 
+    return TxGraphChain(radio_ctrl, replay_ctrl, duc_ctrl, tx_streamer)
+
+
+## Write waveform to the on-board memory of the replay block
+def upload_waveform_to_replay_memory(
+    replay_ctrl,
+    tx_streamer,
+    tx_md,
+    tx_data,
+    replay_buff_addr,
+    replay_buff_size,
+    words_to_replay,
+    samples_to_replay,
+    replay_chan,
+):
+    replay_ctrl.record(replay_buff_addr, replay_buff_size, replay_chan)
+
+    # Display replay configuration
+    print(
+        f"Replay file size:      {replay_buff_size} bytes ({ words_to_replay} qwords, {samples_to_replay} samples)"
+    )
+    print(f"Record base address:0x {replay_ctrl.get_record_offset(replay_chan)}")
+    print(f"Record buffer size:    {replay_ctrl.get_record_size(replay_chan)}  bytes")
+    print(f"Record fullness:       {replay_ctrl.get_record_fullness(replay_chan)} bytes")
+
+    # Restart record buffer repeatedly until no new data appears on the Replay
+    # block's input. This will flush any data that was buffered on the input.
+    print("Emptying record buffer...")
+    fullness = 1
+    while fullness > 0:
+        replay_ctrl.record_restart(replay_chan)
+        # Make sure the record buffer doesn't start to fill again
+        start_time = time.time()
+        seconds_elapsed = 0
+        while seconds_elapsed < 0.250:
+            fullness = replay_ctrl.get_record_fullness(replay_chan)
+            end_time = time.time()
+            seconds_elapsed = end_time - start_time
+            if fullness != 0:
+                break
+
+    print(f"Record fullness:     {replay_ctrl.get_record_fullness(replay_chan)}  bytes")
+
+    # ************************************************************************
+    # * Send data to replay (== record the data)
+    # ************************************************************************
+    print("")
+    print("Sending data to be recorded...")
+
+    tx_md.start_of_burst = True
+    tx_md.end_of_burst = True
+
+    # We use a very big timeout here, any network buffering issue etc. is not
+    # a problem for this application, and we want to upload all the data in one
+    # send() call.
+    # num_tx_samps = tx_streamer.send(tx_data, samples_to_replay, tx_md, 5.0)
+    # Note: if samples_to_replay is used in the above function, we got error
+    print(tx_data.size)
+    num_tx_samps = tx_streamer.send(tx_data, tx_md, 5.0)
+    if num_tx_samps != samples_to_replay:
+        print(f"ERROR: Unable to send {samples_to_replay} samples (sent {num_tx_samps} )")
+
+    # ************************************************************************
+    # * Wait for data to be stored in on-board memory
+    # ************************************************************************
+    print("Waiting for recording to complete...")
+    while replay_ctrl.get_record_fullness(replay_chan) < replay_buff_size:
+        print(f"Record fullness: {replay_ctrl.get_record_fullness(replay_chan)}")
+        time.sleep(0.05)  # sleep for 50ms
+
+    print(f"Record fullness: {replay_ctrl.get_record_fullness(replay_chan)} bytes")
+
+
+# Number of streamer ports of a TX station
+NUM_TX_PORTS = 1
+
+
+## Read waveform samples to replay as complex64 array of shape (num_ports, num_samples)
+def read_tx_waveform(
+    waveform_cache_path, waveform_path, waveform_file_name, waveform_format, num_ports
+):
+    # Read waveform based on waveform format
+    if waveform_cache_path:
+        # Converted complex64 samples are memory-mapped from the waveform cache
+        cache = waveform_cache.get_waveform_cache(waveform_cache_path)
+        tx_data_complex, waveform_IQ_rate = cache.load(
+            waveform_path, waveform_file_name, waveform_format
+        )
+    else:
+        tx_data_complex, waveform_IQ_rate = waveform_cache.read_waveform_data(
+            waveform_path, waveform_file_name, waveform_format
+        )
+        tx_data_complex = np.asarray(tx_data_complex, dtype=np.complex64)
+
+    # Read data into np buffer
+    if num_ports == 1:
+        # Single port: send the waveform samples without copying them
+        tx_data = tx_data_complex.reshape(1, -1)
+    else:
+        tx_data = np.tile(tx_data_complex, (num_ports, 1))
+    return tx_data, waveform_IQ_rate
+
+
+## Get key of a TX waveform held in replay memory: key of the waveform file as used by the waveform
+# cache (path, modification time and size) and number of ports, the samples are not read
+def get_tx_waveform_key(waveform_path, waveform_file_name, waveform_format, num_ports):
+    source_file = waveform_cache.get_waveform_source_file(
+        waveform_path, waveform_file_name, waveform_format
+    )
+    return waveform_cache.get_file_key(source_file) + "-" + str(num_ports)
+
+
+## Get replay memory manager of the replay block, memory content is kept across variations
+def get_replay_memory(session, replay_id, replay_ctrl):
+    replay_memory_key = ("replay_memory", replay_id)
+    replay_memory = session.cache.get(replay_memory_key)
+    if replay_memory is None:
+        replay_memory = replay_memory_manager.ReplayMemoryManager(
+            replay_ctrl.get_mem_size(), replay_ctrl.get_word_size()
+        )
+        session.cache[replay_memory_key] = replay_memory
+    return replay_memory
+
+
+## Make sure the waveform is held in replay memory, upload it to its own region if needed
+# waveform_key: key of the waveform, see get_tx_waveform_key
+# load_tx_waveform: function returning the waveform samples, only called if they are uploaded
+# Return address and size of the memory region in bytes
+def get_replay_memory_region(
+    replay_memory,
+    replay_ctrl,
+    tx_streamer,
+    tx_md,
+    waveform_key,
+    load_tx_waveform,
+    replay_chan,
+    sample_size,
+):
+    # Skip the upload if the same waveform is already held in the replay memory
+    region = replay_memory.get_region(waveform_key)
+    if region is not None:
+        print("Waveform is already in replay memory at address", region[0], ", skip uploading it")
+        return region
+
+    # Calculate the number of words and samples to replay
+    # The replay block records and plays whole words, the waveform is padded with zero samples
+    # up to the next word boundary
+    tx_data = load_tx_waveform()
+    replay_buff_size = replay_memory.align(tx_data.shape[-1] * sample_size)
+    words_to_replay = replay_buff_size // replay_memory.word_size
+    samples_to_replay = replay_buff_size // sample_size
+    if samples_to_replay > tx_data.shape[-1]:
+        padding = samples_to_replay - tx_data.shape[-1]
+        print("Pad waveform with", padding, "zero samples to a whole number of replay words")
+        tx_data = np.pad(tx_data, [(0, 0)] * (tx_data.ndim - 1) + [(0, padding)])
+
+    replay_buff_addr = replay_memory.allocate(waveform_key, replay_buff_size)
+    tracer = instrumentation.get_tracer()
+    try:
+        with tracer.span("waveform_upload", nbytes=replay_buff_size):
+            upload_waveform_to_replay_memory(
+                replay_ctrl,
+                tx_streamer,
+                tx_md,
+                tx_data,
+                replay_buff_addr,
+                replay_buff_size,
+                words_to_replay,
+                samples_to_replay,
+                replay_chan,
+            )
+        tracer.add("tx_upload_bytes", replay_buff_size)
+    except Exception:
+        # Memory region content is unknown
+        replay_memory.free(waveform_key)
+        raise
+    return replay_buff_addr, replay_buff_size
+
+
+## Upload all waveforms of the campaign once, as far as they fit into replay memory
+# Next variations only switch the play address
+def upload_campaign_waveforms(
+    args, replay_memory, replay_ctrl, tx_streamer, tx_md, num_ports, sample_size
+):
+    if replay_memory.campaign_waveforms_uploaded:
+        return
+    replay_memory.campaign_waveforms_uploaded = True
+    print("Uploading", len(args.campaign_waveforms), "campaign waveforms to replay memory...")
+    for waveform_path, waveform_file_name, waveform_format in args.campaign_waveforms:
+        waveform_key = get_tx_waveform_key(
+            waveform_path, waveform_file_name, waveform_format, num_ports
+        )
+        if replay_memory.get_region(waveform_key) is not None:
+            continue
+        with instrumentation.get_tracer().span("waveform_parse", station=args.args):
+            tx_data, waveform_IQ_rate = read_tx_waveform(
+                args.waveform_cache_path,
+                waveform_path,
+                waveform_file_name,
+                waveform_format,
+                num_ports,
+            )
+        if not replay_memory.has_free_space(tx_data.shape[-1] * sample_size):
+            print("Replay memory is full, waveform is uploaded on first use:", waveform_file_name)
+            continue
+        get_replay_memory_region(
+            replay_memory,
+            replay_ctrl,
+            tx_streamer,
+            tx_md,
+            waveform_key,
+            lambda: tx_data,
+            args.replay_chan,
+            sample_size,
+        )
+
+
+def rf_replay_data_transmitter(args, variation_sync, session_pool=None):
+    """
+    Run Tx waveform playback
+    """
+
+    # Print help message
+    print("UHD/RFNoC Replay samples from file ")
+    print("This application uses the Replay block to playback data from a file to a radio")
+
+    # Check if motherboard type is x4xx
+    isX4xx = bool(args.hw_type.find("x4xx"))
+
+    # Use a local session pool if no campaign session pool is given
+    close_session_pool = session_pool is None
+    if close_session_pool:
+        session_pool = usrp_session_pool.USRPSessionPool()
+
+    # ************************************************************************
+    # Create device and block controls
+    # ************************************************************************
+    # Reuse the open RFNoC graph of the campaign if possible
+    print("Creating the RFNoC graph with args: ", args.args)
+    session = session_pool.get_rfnoc_graph(args.args)
+    graph = session.device
+
+    # ************************************************************************
+    # * Set up streamer to Replay block and commit graph
+    # ************************************************************************
+    num_ports = NUM_TX_PORTS
+    chain_key = (
+        "tx_graph_chain",
+        args.radio_id,
+        args.radio_chan,
+        args.replay_id,
+        args.replay_chan,
+        args.duc_id,
+        args.duc_chan,
+    )
+    tx_graph_chain = session.cache.get(chain_key)
+    if tx_graph_chain is None:
+        tx_graph_chain = setup_tx_graph_chain(graph, args, session_pool.uhd, num_ports)
+        session.cache[chain_key] = tx_graph_chain
+    radio_ctrl = tx_graph_chain.radio_ctrl
+    replay_ctrl = tx_graph_chain.replay_ctrl
+    duc_ctrl = tx_graph_chain.duc_ctrl
+    tx_streamer = tx_graph_chain.tx_streamer
+    tx_md = session_pool.uhd.types.TXMetadata()
+
     # ************************************************************************
     # * Set up radio
     # ************************************************************************
     print("")
     print("Setting up radio ...")
 
+    # Settings applied to the device by previous variations, only changed settings are pushed
+    applied_settings = session.applied_settings
+    tuning_changed = False
+
     # Set clock reference
     num_mboards = graph.get_num_mboards()
     print(f"Number of mboards: {num_mboards}")
-    graph.get_mb_controller(0).set_clock_source(args.clock_reference)
+    if applied_settings.is_changed("clock_source", args.clock_reference):
+        graph.get_mb_controller(0).set_clock_source(args.clock_reference)
+        # RF settings are applied again after changing the clock reference
+        applied_settings.clear()
+        applied_settings.update("clock_source", args.clock_reference)
+        tuning_changed = True
+
+    # Set the sample rate before the frequency, the DUC frequency depends on the rate
+    rate_key = ("tx_rate", args.duc_id, args.duc_chan)
+    print(f"Requesting TX Rate: {(args.rate / 1e6) } Msps...")
+    if applied_settings.is_changed(rate_key, args.rate):
+        duc_ctrl.set_input_rate(args.rate, args.duc_chan)
+        applied_settings.update(rate_key, args.rate)
+        applied_settings.invalidate(("tx_freq", args.radio_id, args.radio_chan))
+        tuning_changed = True
+    coerced_tx_rate = duc_ctrl.get_input_rate(args.duc_chan)
+    print(f"Actual TX Rate: {(coerced_tx_rate / 1e6)} Msps...")
+    print(f"** TX Sampling Rate Offset: {coerced_tx_rate - args.rate}  Sample per second...")
 
     # Set the center frequency
+    freq_key = ("tx_freq", args.radio_id, args.radio_chan)
+    freq_setting = (args.freq, str2bool(args.enable_lo_offset), args.lo_offset)
+    freq_changed = applied_settings.is_changed(freq_key, freq_setting)
     print(f"Requesting TX Freq: {(args.freq / 1e6)} MHz...")
-    if str2bool(args.enable_lo_offset):
+    if not freq_changed:
+        print("TX Freq already applied")
+    elif str2bool(args.enable_lo_offset):
         if abs(args.lo_offset) > args.bandwidth / 2 and abs(args.lo_offset) < (
             (args.max_RF_bandwidth - args.bandwidth) / 2
         ):
@@ -137,38 +424,51 @@ def rf_replay_data_transmitter(args):
             )
     else:
         radio_ctrl.set_tx_frequency(args.freq, args.radio_chan)
+        # The graph chain is reused, reset DUC frequency shift of a previous LO offset variation
+        duc_ctrl.set_freq(0.0, args.duc_chan)
+    if freq_changed:
+        applied_settings.update(freq_key, freq_setting)
+        tuning_changed = True
+        # Gain tables can depend on the frequency band, set gain again
+        applied_settings.invalidate(("tx_gain", args.radio_id, args.radio_chan))
     coerced_tx_freq = radio_ctrl.get_tx_frequency(args.radio_chan)
     print(f"Actual TX Freq: {coerced_tx_freq/ 1e6}  MHz...")
     print(f"** TX Carrier Frequency Offset: {coerced_tx_freq - args.freq}  Hz...")
 
-    # Set the sample rate
-    print(f"Requesting TX Rate: {(args.rate / 1e6) } Msps...")
-    duc_ctrl.set_input_rate(args.rate, args.duc_chan)
-    coerced_tx_rate = duc_ctrl.get_input_rate(args.duc_chan)
-    print(f"Actual TX Rate: {(coerced_tx_rate / 1e6)} Msps...")
-    print(f"** TX Sampling Rate Offset: {coerced_tx_rate - args.rate}  Sample per second...")
-
     # Set the RF gain
     print(f"Requesting TX Gain: {args.gain} dB...")
-    radio_ctrl.set_tx_gain(args.gain, args.radio_chan)
+    gain_key = ("tx_gain", args.radio_id, args.radio_chan)
+    if applied_settings.is_changed(gain_key, args.gain):
+        radio_ctrl.set_tx_gain(args.gain, args.radio_chan)
+        applied_settings.update(gain_key, args.gain)
     coerced_tx_gain = radio_ctrl.get_tx_gain(args.radio_chan)
     print(f"Actual TX Gain: {coerced_tx_gain} dB...")
 
     # Set the analog front-end filter bandwidth
     print(f"Requesting TX Bandwidth: {(args.bandwidth / 1e6)} MHz...")
-    if not isX4xx:
+    bandwidth_key = ("tx_bandwidth", args.radio_id, args.radio_chan)
+    if not isX4xx and applied_settings.is_changed(bandwidth_key, args.bandwidth):
         radio_ctrl.set_tx_bandwidth(args.bandwidth, args.radio_chan)
+        applied_settings.update(bandwidth_key, args.bandwidth)
+        tuning_changed = True
     coerced_tx_bandwidth = radio_ctrl.get_tx_bandwidth(args.radio_chan)
     print(f"Actual TX Bandwidth: {coerced_tx_bandwidth / 1e6} MHz...")
     print("Note: Not all doughterboards support variable analog bandwidth")
 
     # Set the antenna
     print(f"Requesting TX Antenna: {(args.antenna)}")
-    radio_ctrl.set_tx_antenna(args.antenna, args.radio_chan)
+    antenna_key = ("tx_antenna", args.radio_id, args.radio_chan)
+    if applied_settings.is_changed(antenna_key, args.antenna):
+        radio_ctrl.set_tx_antenna(args.antenna, args.radio_chan)
+        applied_settings.update(antenna_key, args.antenna)
+        tuning_changed = True
     print(f"Actual TX Antenna: {radio_ctrl.get_tx_antenna(args.radio_chan)}")
 
-    # Allow for some setup time
-    time.sleep(100e-3)
+    tracer = instrumentation.get_tracer()
+    # Allow for some setup time if RF tuning changed
+    if tuning_changed:
+        with tracer.span("settle", station=args.args):
+            time.sleep(100e-3)
 
     # ************************************************************************
     # * Read the data to replay
@@ -182,104 +482,54 @@ def rf_replay_data_transmitter(args):
     # UHD do the job and set the sample size from Complex signed 64-bit is 32 bits per sample
     sample_size = 4
 
-    # Read waveform based on waveform format
-    if args.waveform_format == "tdms":  # args.file.endswith(".tdms"):
-        tx_data_complex, waveform_IQ_rate = read_waveform_data_interface.read_waveform_data_tdms(
-            args.waveform_path, args.waveform_file_name
-        )
-        if args.rate != waveform_IQ_rate:
+    # The waveform samples are only read if the waveform is not held in replay memory yet
+    # Use the waveform loaded while the previous variation was on air, if any
+    def load_tx_waveform():
+        if args.tx_waveform is not None:
+            tx_data, waveform_IQ_rate = args.tx_waveform
+        else:
+            with tracer.span("waveform_parse", station=args.args):
+                tx_data, waveform_IQ_rate = read_tx_waveform(
+                    args.waveform_cache_path,
+                    args.waveform_path,
+                    args.waveform_file_name,
+                    args.waveform_format,
+                    num_ports,
+                )
+        if waveform_IQ_rate is not None and args.rate != waveform_IQ_rate:
             print("Note:The IQ Rate based on TDMS Waveform property should be: ", waveform_IQ_rate)
-    elif args.waveform_format == "matlab_ieee":
-        tx_data_complex = read_waveform_data_interface.read_waveform_data_matlab_ieee(
-            args.waveform_path, args.waveform_file_name
-        )
-    elif args.waveform_format == "matlab":
-        tx_data_complex = read_waveform_data_interface.read_waveform_data_matlab(
-            args.waveform_path, args.waveform_file_name
-        )
-    else:
-        raise Exception("ERROR: Unknown or not supported tx waveform format.")
-
-    # Get the file size
-    file_size = len(tx_data_complex) * sample_size
+        return tx_data
 
-    # Calculate the number of 64-bit words and samples to replay
-    words_to_replay = int(file_size / replay_word_size)  # bytes
-    samples_to_replay = int(file_size / sample_size)  # bytes
-    print("Max number of samples: ", tx_streamer.get_max_num_samps())
-    print("Samples to replay: ", samples_to_replay)
-
-    # Read data into np buffer, rounded down to number of words
-    tx_data = np.tile(np.array(tx_data_complex, dtype=np.complex64), (num_ports, 1))
+    waveform_key = get_tx_waveform_key(
+        args.waveform_path, args.waveform_file_name, args.waveform_format, num_ports
+    )
 
     # ************************************************************************
     # * Configure replay block
     # ***********************************************************************
-    # Configure a buffer in the on-board memory at address 0 that's equal in
-    # size to the file we want to play back (rounded down to a multiple of
-    # 64-bit words). Note that it is allowed to playback a different size or
-    # location from what was recorded.
+    # Each waveform of the campaign is held in its own word-aligned region of the on-board memory.
+    # The waveforms are uploaded once, the variation plays the region of its waveform.
+    # Note that it is allowed to playback a different size or location from what was recorded.
     print("")
     print("Configuring replay block....")
 
-    replay_buff_addr = 0
-    replay_buff_size = int(samples_to_replay * sample_size)
-    replay_ctrl.record(replay_buff_addr, replay_buff_size, args.replay_chan)
-
-    # Display replay configuration
-    print(
-        f"Replay file size:      {replay_buff_size} bytes ({ words_to_replay} qwords, {samples_to_replay} samples)"
+    replay_memory = get_replay_memory(session, args.replay_id, replay_ctrl)
+    upload_campaign_waveforms(
+        args, replay_memory, replay_ctrl, tx_streamer, tx_md, num_ports, sample_size
     )
-    print(f"Record base address:0x {replay_ctrl.get_record_offset(args.replay_chan)}")
-    print(f"Record buffer size:    {replay_ctrl.get_record_size(args.replay_chan)}  bytes")
-    print(f"Record fullness:       {replay_ctrl.get_record_fullness(args.replay_chan)} bytes")
-
-    # Restart record buffer repeatedly until no new data appears on the Replay
-    # block's input. This will flush any data that was buffered on the input.
-    print("Emptying record buffer...")
-    fullness = 1
-    while fullness > 0:
-        replay_ctrl.record_restart(args.replay_chan)
-        # Make sure the record buffer doesn't start to fill again
-        start_time = time.time()
-        seconds_elapsed = 0
-        while seconds_elapsed < 0.250:
-            fullness = replay_ctrl.get_record_fullness(args.replay_chan)
-            end_time = time.time()
-            seconds_elapsed = end_time - start_time
-            if fullness != 0:
-                break
-
-    print(f"Record fullness:     {replay_ctrl.get_record_fullness(args.replay_chan)}  bytes")
-
-    # ************************************************************************
-    # * Send data to replay (== record the data)
-    # ************************************************************************
-    print("")
-    print("Sending data to be recorded...")
-
-    tx_md.start_of_burst = True
-    tx_md.end_of_burst = True
-
-    # We use a very big timeout here, any network buffering issue etc. is not
-    # a problem for this application, and we want to upload all the data in one
-    # send() call.
-    # num_tx_samps = tx_streamer.send(tx_data, samples_to_replay, tx_md, 5.0)
-    # Note: if samples_to_replay is used in the above function, we got error
-    print(tx_data.size)
-    num_tx_samps = tx_streamer.send(tx_data, tx_md, 5.0)
-    if num_tx_samps != samples_to_replay:
-        print(f"ERROR: Unable to send {samples_to_replay} samples (sent {num_tx_samps} )")
-
-    # ************************************************************************
-    # * Wait for data to be stored in on-board memory
-    # ************************************************************************
-    print("Waiting for recording to complete...")
-    while replay_ctrl.get_record_fullness(args.replay_chan) < replay_buff_size:
-        print(f"Record fullness: {replay_ctrl.get_record_fullness(args.replay_chan)}")
-        time.sleep(0.05)  # sleep for 50ms
-
-    print(f"Record fullness: {replay_ctrl.get_record_fullness(args.replay_chan)} bytes")
+    replay_buff_addr, replay_buff_size = get_replay_memory_region(
+        replay_memory,
+        replay_ctrl,
+        tx_streamer,
+        tx_md,
+        waveform_key,
+        load_tx_waveform,
+        args.replay_chan,
+        sample_size,
+    )
+    samples_to_replay = replay_buff_size // sample_size
+    print("Max number of samples: ", tx_streamer.get_max_num_samps())
+    print("Samples to replay: ", samples_to_replay)
 
     # ************************************************************************
     # * Start replay of data
@@ -290,15 +540,20 @@ def rf_replay_data_transmitter(args):
     # Replay the entire buffer over and over
     repeat = True
     print(f"Issuing replay command for {samples_to_replay} samples in continuous mode...")
-    time_spec = uhd.types.TimeSpec(0.0)
+    time_spec = session_pool.uhd.types.TimeSpec(0.0)
     replay_ctrl.play(replay_buff_addr, replay_buff_size, args.replay_chan, time_spec, repeat)
 
-    # Send a command to start RX data acquisition
-    sync_settings.start_rx_data_acquisition_called = True
-    while sync_settings.stop_tx_signal_called == False:
-        time.sleep(0.05)  # sleep for 50ms
+    # Signal is on the air, RX data acquisition starts when all TX signals are on the air
+    variation_sync.tx_signal_started()
+    # Wait until the last RX data acquisition is done
+    variation_sync.wait_for_tx_stop()
 
     print("Stopping replay...")
-    replay_ctrl.stop(args.replay_chan)
+    with tracer.span("teardown", station=args.args):
+        replay_ctrl.stop(args.replay_chan)
     print("Letting device settle...")
-    time.sleep(0.05)  # sleep for 50ms
+    with tracer.span("settle", station=args.args):
+        time.sleep(0.05)  # sleep for 50ms
+
+    if close_session_pool:
+        session_pool.close_all()
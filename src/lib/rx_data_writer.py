@@ -0,0 +1,135 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+RX Data Writer
+"""
+# Description:
+#   Writer stage of the RF data recorder. The RX records are written to files in a separate thread,
+#   so the next record is captured while the previous one is flushed to disk.
+#       - Record buffers are preallocated once per variation and reused for all records
+#       - Record buffers can live in a given memory, i.e. reused across variations by an RX worker
+#       - The bounded queue between capture and writer stage stops the capture if the disk is too slow
+#       - Per-stage timings are collected to show the overlap between capture and writing
+#
+import threading
+import time
+from queue import Queue
+import numpy as np
+
+# To print colours
+from termcolor import colored
+
+
+## Get size in bytes of all record buffers of a pool
+def get_record_buffers_nbytes(num_buffers, shape, dtype):
+    return num_buffers * int(np.prod(shape)) * np.dtype(dtype).itemsize
+
+
+class RxRecordBufferPool:
+    """Preallocated RX record buffers shared between capture and writer stage"""
+
+    # record_memory: uint8 numpy array holding the buffers, i.e. kept by an RX worker process across
+    # variations, the buffers are allocated for this pool if None
+    def __init__(self, num_buffers, shape, dtype, record_memory=None):
+        if record_memory is None:
+            self.buffers = [np.empty(shape, dtype=dtype) for idx in range(num_buffers)]
+        else:
+            buffer_nbytes = get_record_buffers_nbytes(1, shape, dtype)
+            if record_memory.nbytes < num_buffers * buffer_nbytes:
+                raise Exception("ERROR: Record memory is too small for the Rx record buffers")
+            self.buffers = [
+                np.ndarray(shape, dtype=dtype, buffer=record_memory, offset=idx * buffer_nbytes)
+                for idx in range(num_buffers)
+            ]
+        # Indices of free buffers, capture stage waits here if all buffers are in use
+        self.free_buffers = Queue(maxsize=num_buffers)
+        for idx in range(num_buffers):
+            self.free_buffers.put(idx)
+
+    ## Get a free buffer, wait until the writer stage releases one
+    def acquire(self):
+        idx = self.free_buffers.get()
+        return idx, self.buffers[idx]
+
+    ## Give buffer back after writing
+    def release(self, idx):
+        self.free_buffers.put(idx)
+
+
+class RxDataWriter:
+    """Write RX records to files in a separate thread"""
+
+    def __init__(self, buffer_pool, write_function):
+        # Pool of record buffers
+        self.buffer_pool = buffer_pool
+        # write_function(rx_data, record_idx, capture_time, rx_record_status)
+        self.write_function = write_function
+        # Bounded queue: The writer cannot be behind by more records than available buffers
+        self.queue = Queue(maxsize=len(buffer_pool.buffers))
+        # Per-stage timings in seconds
+        self.stage_timings = {"wait_for_buffer": [], "capture": [], "write": []}
+        # Error of writer thread, raised by the capture stage
+        self.error = None
+        self.thread = threading.Thread(target=self.run)
+        self.thread.start()
+
+    ## Writer thread
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            buffer_idx, record_idx, capture_time, rx_record_status = item
+            try:
+                if self.error is None:
+                    start_time = time.time()
+                    self.write_function(
+                        self.buffer_pool.buffers[buffer_idx],
+                        record_idx,
+                        capture_time,
+                        rx_record_status,
+                    )
+                    self.stage_timings["write"].append(time.time() - start_time)
+            except Exception as error:
+                self.error = error
+            finally:
+                self.buffer_pool.release(buffer_idx)
+
+    ## Get a free record buffer for the next capture
+    def acquire_buffer(self):
+        self.check_error()
+        start_time = time.time()
+        buffer_idx, rx_data = self.buffer_pool.acquire()
+        self.stage_timings["wait_for_buffer"].append(time.time() - start_time)
+        return buffer_idx, rx_data
+
+    ## Hand over a captured record to the writer thread
+    # rx_record_status: RX stream status of the record, written to the meta-data
+    def submit(self, buffer_idx, record_idx, capture_time, capture_duration, rx_record_status=None):
+        self.stage_timings["capture"].append(capture_duration)
+        self.queue.put((buffer_idx, record_idx, capture_time, rx_record_status))
+
+    ## Wait until all records are written
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.check_error()
+
+    def check_error(self):
+        if self.error is not None:
+            raise Exception("ERROR: Writing Rx recorded data failed") from self.error
+
+    ## Print per-stage timings
+    def print_stage_timings(self, time_elapsed):
+        total = {key: sum(values) for key, values in self.stage_timings.items()}
+        # time where capture and writing were running in parallel
+        overlap = max(total["capture"] + total["write"] - time_elapsed, 0.0)
+        print("Rx stage timings:")
+        for key, value in total.items():
+            print("   ", key, ":", colored(int(value * 1000), "yellow"), "ms")
+        print("    total:", colored(int(time_elapsed * 1000), "yellow"), "ms")
+        print("    overlap of capture and writing:", colored(int(overlap * 1000), "yellow"), "ms")
+
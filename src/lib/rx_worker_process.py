@@ -0,0 +1,211 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+RX Worker Process
+"""
+# Description:
+#   Run the RF data recorder of a RX station in its own process for the whole campaign.
+#   In a thread, the GIL-bound parts of a recorder (SigMF meta-data, numpy conversion, printing,
+#   file writes) stall the other RX stations. Each RX worker process has its own GIL:
+#       - The worker keeps its own USRP session of the RX device open across variations
+#       - The device backend and the simulation settings are taken from the general config of
+#         each variation. The simulated air is not shared between processes: a simulated RX station
+#         in a worker process receives noise only, the Replay-to-RX loopback needs RX threads
+#       - Record buffers are allocated in the worker process, where they are captured and written,
+#         they are reused across variations and only reallocated if a variation needs larger buffers
+#       - Byte counts, acquisition status, errors and instrumentation events are sent through a
+#         process-safe status queue
+#   In the main process, the RX station is represented by RxWorkerProcess.record. It has the same
+#   arguments as rf_data_recorder and forwards the TX/RX sync of the variation to the worker.
+#
+import copy
+import multiprocessing
+import queue
+import traceback
+import numpy as np
+
+from lib import run_rf_data_recorder
+from lib import rx_data_writer
+from lib import usrp_session_pool
+from lib import device_backend
+from lib import instrumentation
+
+# RX worker types: RX stations run as threads of the main process or in their own process
+RX_WORKER_TYPES = ["thread", "process"]
+
+# Status messages of a RX worker
+RX_DATA_NBYTES = "rx_data_nbytes"
+RX_DATA_ACQUISITION_DONE = "rx_data_acquisition_done"
+RECORDING_DONE = "recording_done"
+TRACE_EVENTS = "trace_events"
+
+# Period to check if the worker process is alive while waiting for its status, in seconds
+STATUS_POLL_PERIOD = 1.0
+
+
+class RxWorkerStatusQueue:
+    """Recorder side of the status queue: used as rx_data_nbytes_que by the recorder"""
+
+    def __init__(self, status_queue):
+        self.status_queue = status_queue
+
+    def put(self, rx_data_nbytes):
+        self.status_queue.put((RX_DATA_NBYTES, rx_data_nbytes))
+
+
+class RxWorkerSync:
+    """Recorder side of the variation sync: RX start is triggered by the main process"""
+
+    def __init__(self, status_queue, start_event, abort_event):
+        self.status_queue = status_queue
+        self.start_event = start_event
+        self.abort_event = abort_event
+
+    ## Wait until all TX signals are on the air, raise an exception if the variation is aborted
+    def wait_for_rx_start(self):
+        self.start_event.wait()
+        if self.abort_event.is_set():
+            raise Exception("ERROR: TX station failed, RX data acquisition is aborted")
+
+    def rx_data_acquisition_done(self):
+        self.status_queue.put((RX_DATA_ACQUISITION_DONE, None))
+
+
+## Get memory for the record buffers of a variation, reallocate it if it is too small
+def get_record_memory(record_memory, rx_args):
+    shape, dtype = run_rf_data_recorder.get_rx_record_layout(rx_args)
+    nbytes = rx_data_writer.get_record_buffers_nbytes(
+        run_rf_data_recorder.NUM_RX_RECORD_BUFFERS, shape, dtype
+    )
+    if record_memory is None or record_memory.nbytes < nbytes:
+        record_memory = np.empty(nbytes, dtype=np.uint8)
+    return record_memory
+
+
+## Main loop of a RX worker process: record one variation per job
+def run_rx_worker(job_queue, status_queue, start_event, abort_event, recorder_function):
+    session_pool = usrp_session_pool.USRPSessionPool()
+    rx_worker_sync = RxWorkerSync(status_queue, start_event, abort_event)
+    rx_worker_status_queue = RxWorkerStatusQueue(status_queue)
+    # Memory of the record buffers, kept until a variation needs larger buffers
+    record_memory = None
+    while True:
+        job = job_queue.get()
+        if job is None:
+            break
+        rx_args, txs_args, general_config = job
+        # Instrumentation events are collected and merged by the main process
+        tracer = instrumentation.get_tracer()
+        if tracer.enabled != instrumentation.is_enabled(general_config):
+            tracer = instrumentation.configure_tracer(general_config, collect_events=True)
+        error = None
+        try:
+            # Device backend of the variation, simulated devices are set by the general config
+            uhd_module = device_backend.get_uhd_module(general_config)
+            if uhd_module is not None:
+                session_pool.uhd_module = uhd_module
+            record_memory = get_record_memory(record_memory, rx_args)
+            recorder_function(
+                rx_args,
+                txs_args,
+                general_config,
+                rx_worker_status_queue,
+                rx_worker_sync,
+                session_pool,
+                record_memory,
+            )
+        except BaseException:
+            error = traceback.format_exc()
+        if tracer.enabled:
+            status_queue.put((TRACE_EVENTS, tracer.drain_events()))
+        status_queue.put((RECORDING_DONE, error))
+    session_pool.close_all()
+
+
+class RxWorkerProcess:
+    """RX station running in its own process for the whole campaign"""
+
+    # recorder_function: RX station function, same arguments as rf_data_recorder
+    # The UHD python module of the worker is given by the device backend of the general config
+    def __init__(self, recorder_function=run_rf_data_recorder.rf_data_recorder):
+        # Spawn a fresh process: the main process has open UHD sessions and running threads
+        mp_context = multiprocessing.get_context("spawn")
+        self.job_queue = mp_context.Queue()
+        self.status_queue = mp_context.Queue()
+        self.start_event = mp_context.Event()
+        self.abort_event = mp_context.Event()
+        self.process = mp_context.Process(
+            target=run_rx_worker,
+            args=(
+                self.job_queue,
+                self.status_queue,
+                self.start_event,
+                self.abort_event,
+                recorder_function,
+            ),
+            daemon=True,
+        )
+        self.process.start()
+
+    ## Record a variation in the worker process, same arguments as rf_data_recorder
+    # The session pool of the main process is not used, the worker has its own USRP session
+    def record(
+        self,
+        rx_args,
+        txs_args,
+        general_config,
+        rx_data_nbytes_que,
+        variation_sync,
+        session_pool=None,
+    ):
+        # Waveform samples of the TX stations are not needed for the meta-data
+        txs_args = [copy.copy(tx_args) for tx_args in txs_args]
+        for tx_args in txs_args:
+            tx_args.tx_waveform = None
+        self.start_event.clear()
+        self.abort_event.clear()
+        self.job_queue.put((rx_args, txs_args, general_config))
+
+        # Forward the RX start of the variation to the worker
+        aborted = False
+        try:
+            variation_sync.wait_for_rx_start()
+        except Exception:
+            aborted = True
+            self.abort_event.set()
+        self.start_event.set()
+
+        error = self.wait_for_recording(rx_data_nbytes_que, variation_sync)
+        if aborted:
+            raise Exception("ERROR: TX station failed, RX data acquisition is aborted")
+        if error is not None:
+            raise Exception("ERROR: RX worker process failed", rx_args.args, error)
+
+    ## Forward status messages of the worker until the recording of the variation is done
+    def wait_for_recording(self, rx_data_nbytes_que, variation_sync):
+        while True:
+            try:
+                message, value = self.status_queue.get(timeout=STATUS_POLL_PERIOD)
+            except queue.Empty:
+                if not self.process.is_alive():
+                    raise Exception(
+                        "ERROR: RX worker process terminated, exit code", self.process.exitcode
+                    )
+                continue
+            if message == RX_DATA_NBYTES:
+                rx_data_nbytes_que.put(value)
+            elif message == RX_DATA_ACQUISITION_DONE:
+                variation_sync.rx_data_acquisition_done()
+            elif message == TRACE_EVENTS:
+                instrumentation.get_tracer().merge_events(value)
+            elif message == RECORDING_DONE:
+                return value
+
+    ## Stop the worker process at the end of the campaign
+    def close(self):
+        if self.process.is_alive():
+            self.job_queue.put(None)
+            self.process.join()
@@ -0,0 +1,646 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Simulated UHD Device Backend
+"""
+# Description:
+#   Stand-in for the UHD python module, used as device backend if no USRP is available.
+#   It implements the part of the UHD API used by the RF Data Recording API:
+#       - usrp: MultiUSRP with RX streamer, HW info, tuning, coerced values and sensors
+#       - rfnoc: RFNoC graph with Radio, DUC and Replay block controls and TX streamer
+#       - types: stream commands, TX/RX metadata, tune requests and time specs
+#   Replay-to-RX loopback: waveforms uploaded to a simulated Replay block are played on the
+#   simulated air, RX streams receive all signals played in their band plus noise.
+#   The simulation is shared by all devices of the process, RX worker processes only receive noise.
+#
+#   Simulation settings, set by configure(), i.e. from the general config "simulated_device_<name>":
+#       - realtime_factor: RX samples are delivered at realtime_factor x sample rate, 0: no pacing
+#       - open_latency: time to open a device session in seconds
+#       - stream_latency: time from stream command to the first RX sample in seconds
+#       - overflow_probability: probability of an overflow per RX recv call, samples are dropped
+#       - sequence_error_probability: probability of lost packets per RX recv call
+#       - freq_resolution: tuning step of the coerced frequency in Hz
+#       - gain_step: step of the coerced gain in dB
+#       - noise_level: RMS amplitude of the RX noise
+#       - loopback_attenuation_db: attenuation between TX and RX in dB
+#
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+import numpy as np
+
+from lib import master_clock_rate_planner
+from lib import usrp_session_pool
+
+# Default simulation settings
+DEFAULT_SETTINGS = {
+    "realtime_factor": 1.0,
+    "open_latency": 0.0,
+    "stream_latency": 0.0,
+    "overflow_probability": 0.0,
+    "sequence_error_probability": 0.0,
+    "freq_resolution": 1.0,
+    "gain_step": 1.0,
+    "noise_level": 1e-3,
+    "loopback_attenuation_db": 60.0,
+}
+settings = dict(DEFAULT_SETTINGS)
+
+# Simulated device types: mboard ID, daughterboard ID, RF bandwidth, default master clock rate
+DEVICE_TYPES = {
+    "x4xx": ("x410", "ZBX", 400e6, 245.76e6),
+    "x300": ("X310", "UBX-160", 160e6, 200e6),
+}
+DEFAULT_DEVICE_TYPE = "x4xx"
+
+# Simulated hardware limits
+MAX_GAIN = 60.0
+MAX_NUM_SAMPS = 2000
+REPLAY_MEM_SIZE = 2**30
+REPLAY_WORD_SIZE = 8
+SC16_SAMPLE_SIZE = 4
+
+
+## Change simulation settings, unknown settings raise an exception
+def configure(**simulation_settings):
+    for key, value in simulation_settings.items():
+        if key not in DEFAULT_SETTINGS:
+            raise Exception("ERROR: Unknown simulated device setting", key)
+        settings[key] = float(value)
+
+
+## Reset simulation settings and simulated air
+def reset():
+    settings.clear()
+    settings.update(DEFAULT_SETTINGS)
+    simulated_air.clear()
+
+
+## Coerce a value to the given step
+def coerce_to_step(value, step):
+    if step <= 0:
+        return value
+    return round(value / step) * step
+
+
+## Coerce a gain to the gain range and step
+def coerce_gain(gain):
+    return min(max(coerce_to_step(gain, settings["gain_step"]), 0.0), MAX_GAIN)
+
+
+class SimulatedDevice:
+    """Device type, serial number and master clock rate given by the device args"""
+
+    def __init__(self, args):
+        device_args = usrp_session_pool.parse_device_args(args)
+        device_type = device_args.get("type", DEFAULT_DEVICE_TYPE)
+        if device_type not in DEVICE_TYPES:
+            raise Exception("ERROR: Simulated device type is not supported", device_type)
+        (
+            self.mboard_id,
+            self.daughterboard_id,
+            self.rf_bandwidth,
+            default_master_clock_rate,
+        ) = DEVICE_TYPES[device_type]
+        self.address = usrp_session_pool.get_device_address(args)
+        self.serial = format(zlib.crc32(self.address.encode()), "X")
+        self.master_clock_rate = float(
+            device_args.get(usrp_session_pool.MASTER_CLOCK_RATE_ARG, default_master_clock_rate)
+        )
+        self.clock_source = "internal"
+        time.sleep(settings["open_latency"])
+
+    ## Get achievable rate: master clock rate divided by an even decimation factor
+    def coerce_rate(self, rate):
+        decimation = master_clock_rate_planner.get_decimation(self.master_clock_rate, rate)
+        if decimation == 0:
+            return self.master_clock_rate
+        return self.master_clock_rate / decimation
+
+    def coerce_freq(self, freq):
+        return coerce_to_step(freq, settings["freq_resolution"])
+
+
+class SimulatedAir:
+    """Signals played by the simulated Replay blocks, received by all simulated RX streams"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # emission per (device address, radio ID, radio channel): (freq, rate, gain, samples)
+        self.emissions = {}
+
+    def play(self, key, freq, rate, gain, samples):
+        with self.lock:
+            self.emissions[key] = (freq, rate, gain, samples)
+
+    def stop(self, key):
+        with self.lock:
+            self.emissions.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.emissions = {}
+
+    ## Get received signal of a RX channel for the samples [sample_start, sample_start + num_samps)
+    def receive(self, freq, rate, gain, sample_start, num_samps):
+        t = (sample_start + np.arange(num_samps)) / rate
+        noise_level = settings["noise_level"] / np.sqrt(2)
+        signal = noise_level * (
+            np.random.standard_normal(num_samps) + 1j * np.random.standard_normal(num_samps)
+        )
+        with self.lock:
+            emissions = list(self.emissions.values())
+        for tx_freq, tx_rate, tx_gain, samples in emissions:
+            freq_offset = tx_freq - freq
+            if abs(freq_offset) >= rate / 2 or len(samples) == 0:
+                continue
+            amplitude = 10 ** ((tx_gain + gain - settings["loopback_attenuation_db"]) / 20)
+            # Play the waveform in a loop at the TX rate
+            indices = (t * tx_rate).astype(np.int64) % len(samples)
+            signal = signal + amplitude * samples[indices] * np.exp(2j * np.pi * freq_offset * t)
+        return signal
+
+
+# Simulated air of this process
+simulated_air = SimulatedAir()
+
+
+# ============= types =============
+class RXMetadataErrorCode:
+    none = 0
+    timeout = 1
+    late = 2
+    broken_chain = 4
+    overflow = 8
+    alignment = 12
+    bad_packet = 15
+
+
+class RXMetadata:
+    def __init__(self):
+        self.error_code = RXMetadataErrorCode.none
+        self.out_of_sequence = False
+
+    def strerror(self):
+        if self.error_code == RXMetadataErrorCode.overflow and self.out_of_sequence:
+            return "ERROR_CODE_OVERFLOW (out of sequence error): Packets were lost"
+        if self.error_code == RXMetadataErrorCode.overflow:
+            return "ERROR_CODE_OVERFLOW: An internal receive buffer has filled"
+        if self.error_code == RXMetadataErrorCode.timeout:
+            return "ERROR_CODE_TIMEOUT: No packet received, implementation timed-out"
+        return "ERROR_CODE_NONE"
+
+
+class TXMetadata:
+    def __init__(self):
+        self.start_of_burst = False
+        self.end_of_burst = False
+
+
+class StreamMode:
+    start_cont = "start_cont"
+    stop_cont = "stop_cont"
+    num_done = "num_done"
+    num_more = "num_more"
+
+
+class StreamCMD:
+    def __init__(self, stream_mode):
+        self.stream_mode = stream_mode
+        self.num_samps = 0
+        self.stream_now = True
+
+
+class TuneRequest:
+    def __init__(self, target_freq, lo_off=0.0):
+        self.target_freq = target_freq
+        self.lo_off = lo_off
+
+
+class TimeSpec:
+    def __init__(self, secs=0.0):
+        self.secs = secs
+
+
+class SensorValue:
+    def __init__(self, value):
+        self.value = value
+
+    def to_bool(self):
+        return bool(self.value)
+
+
+types = SimpleNamespace(
+    RXMetadata=RXMetadata,
+    RXMetadataErrorCode=RXMetadataErrorCode,
+    TXMetadata=TXMetadata,
+    StreamMode=StreamMode,
+    StreamCMD=StreamCMD,
+    TuneRequest=TuneRequest,
+    TimeSpec=TimeSpec,
+    SensorValue=SensorValue,
+)
+
+
+# ============= usrp =============
+class StreamArgs:
+    def __init__(self, cpu_format, wire_format):
+        self.cpu_format = cpu_format
+        self.wire_format = wire_format
+        self.channels = []
+
+
+class RxStreamer:
+    """RX streamer: delivers the received signal of the simulated air at the RX rate"""
+
+    def __init__(self, multi_usrp, stream_args):
+        self.multi_usrp = multi_usrp
+        self.cpu_format = stream_args.cpu_format
+        self.channels = list(stream_args.channels) or [0]
+        self.num_samps_to_receive = 0
+        # sample counter of the stream and start time of the current stream command
+        self.sample_start = 0
+        self.num_received_samps = 0
+        self.stream_start_time = 0.0
+
+    def get_max_num_samps(self):
+        return MAX_NUM_SAMPS
+
+    def issue_stream_cmd(self, stream_cmd):
+        if stream_cmd.stream_mode == StreamMode.stop_cont:
+            self.num_samps_to_receive = 0
+            return
+        self.num_samps_to_receive = stream_cmd.num_samps
+        self.num_received_samps = 0
+        self.stream_start_time = time.time() + settings["stream_latency"]
+
+    def recv(self, buffer, metadata, timeout=0.1):
+        num_samps = min(self.num_samps_to_receive, buffer.shape[-1], MAX_NUM_SAMPS)
+        metadata.out_of_sequence = False
+        if num_samps == 0:
+            metadata.error_code = RXMetadataErrorCode.timeout
+            return 0
+        if np.random.random_sample() < settings["overflow_probability"]:
+            metadata.error_code = RXMetadataErrorCode.overflow
+            self.drop_samples(num_samps)
+            return 0
+        if np.random.random_sample() < settings["sequence_error_probability"]:
+            metadata.error_code = RXMetadataErrorCode.overflow
+            metadata.out_of_sequence = True
+            self.drop_samples(num_samps)
+            return 0
+        rate = self.multi_usrp.get_rx_rate(self.channels[0])
+        # Pacing: samples are not available before they are received at the RX rate
+        if settings["realtime_factor"] > 0:
+            available_time = self.stream_start_time + (self.num_received_samps + num_samps) / (
+                rate * settings["realtime_factor"]
+            )
+            wait_time = available_time - time.time()
+            if wait_time > timeout:
+                metadata.error_code = RXMetadataErrorCode.timeout
+                return 0
+            if wait_time > 0:
+                time.sleep(wait_time)
+        rows = buffer.reshape(1, -1) if buffer.ndim == 1 else buffer
+        for row, chan in zip(rows, self.channels):
+            signal = simulated_air.receive(
+                self.multi_usrp.get_rx_freq(chan),
+                rate,
+                self.multi_usrp.get_rx_gain(chan),
+                self.sample_start,
+                num_samps,
+            )
+            if buffer.dtype.names:
+                # sc16: I/Q int16 pairs, full scale is 32767
+                row[:num_samps]["re"] = np.clip(signal.real * 32767, -32768, 32767)
+                row[:num_samps]["im"] = np.clip(signal.imag * 32767, -32768, 32767)
+            else:
+                row[:num_samps] = signal
+        self.sample_start = self.sample_start + num_samps
+        self.num_received_samps = self.num_received_samps + num_samps
+        self.num_samps_to_receive = self.num_samps_to_receive - num_samps
+        metadata.error_code = RXMetadataErrorCode.none
+        return num_samps
+
+    ## Drop samples of the stream, i.e. the samples of an overflow are never received
+    def drop_samples(self, num_samps):
+        self.sample_start = self.sample_start + num_samps
+        self.num_received_samps = self.num_received_samps + num_samps
+        self.num_samps_to_receive = self.num_samps_to_receive - num_samps
+
+
+class MultiUSRP:
+    """Simulated MultiUSRP session"""
+
+    def __init__(self, args):
+        self.device = SimulatedDevice(args)
+        self.rx_settings = {}
+
+    def get_rx_setting(self, key, chan, default):
+        return self.rx_settings.get((key, chan), default)
+
+    def get_master_clock_rate(self):
+        return self.device.master_clock_rate
+
+    def get_usrp_rx_info(self, chan=0):
+        return {
+            "mboard_id": self.device.mboard_id,
+            "mboard_serial": self.device.serial,
+            "rx_id": self.device.daughterboard_id + " (simulated)",
+            "rx_serial": self.device.serial,
+        }
+
+    def get_usrp_tx_info(self, chan=0):
+        return {
+            "mboard_id": self.device.mboard_id,
+            "mboard_serial": self.device.serial,
+            "tx_id": self.device.daughterboard_id + " (simulated)",
+            "tx_serial": self.device.serial,
+        }
+
+    def set_clock_source(self, clock_source, mboard=0):
+        self.device.clock_source = clock_source
+
+    def get_rx_stream(self, stream_args):
+        return RxStreamer(self, stream_args)
+
+    def set_rx_antenna(self, antenna, chan=0):
+        self.rx_settings[("antenna", chan)] = antenna
+
+    def set_rx_bandwidth(self, bandwidth, chan=0):
+        self.rx_settings[("bandwidth", chan)] = min(bandwidth, self.device.rf_bandwidth)
+
+    def get_rx_bandwidth(self, chan=0):
+        return self.get_rx_setting("bandwidth", chan, self.device.rf_bandwidth)
+
+    def get_tx_bandwidth(self, chan=0):
+        return self.device.rf_bandwidth
+
+    def set_rx_rate(self, rate, chan=0):
+        self.rx_settings[("rate", chan)] = self.device.coerce_rate(rate)
+
+    def get_rx_rate(self, chan=0):
+        return self.get_rx_setting("rate", chan, self.device.master_clock_rate / 2)
+
+    def set_rx_freq(self, tune_request, chan=0):
+        self.rx_settings[("freq", chan)] = self.device.coerce_freq(tune_request.target_freq)
+
+    def get_rx_freq(self, chan=0):
+        return self.get_rx_setting("freq", chan, 1e9)
+
+    def set_rx_gain(self, gain, chan=0):
+        self.rx_settings[("gain", chan)] = coerce_gain(gain)
+
+    def get_rx_gain(self, chan=0):
+        return self.get_rx_setting("gain", chan, 0.0)
+
+    def get_rx_sensor_names(self, chan=0):
+        return ["lo_locked"]
+
+    def get_rx_sensor(self, name, chan=0):
+        return SensorValue(True)
+
+
+usrp = SimpleNamespace(MultiUSRP=MultiUSRP, StreamArgs=StreamArgs)
+
+
+# ============= rfnoc =============
+class BlockID:
+    def __init__(self, device_no, block_name, block_count):
+        self.block_name = block_name
+        self.block_count = block_count
+        self.id = f"{device_no}/{block_name}#{block_count}"
+
+    def __str__(self):
+        return self.id
+
+
+class RadioBlock:
+    def __init__(self, block_id):
+        self.block_id = block_id
+        self.tx_settings = {}
+
+    def get_unique_id(self):
+        return self.block_id
+
+    def set_tx_frequency(self, freq, chan=0):
+        self.tx_settings[("freq", chan)] = coerce_to_step(freq, settings["freq_resolution"])
+
+    def get_tx_frequency(self, chan=0):
+        return self.tx_settings.get(("freq", chan), 1e9)
+
+    def set_tx_gain(self, gain, chan=0):
+        self.tx_settings[("gain", chan)] = coerce_gain(gain)
+
+    def get_tx_gain(self, chan=0):
+        return self.tx_settings.get(("gain", chan), 0.0)
+
+    def set_tx_bandwidth(self, bandwidth, chan=0):
+        self.tx_settings[("bandwidth", chan)] = bandwidth
+
+    def get_tx_bandwidth(self, chan=0):
+        return self.tx_settings.get(("bandwidth", chan), 0.0)
+
+    def set_tx_antenna(self, antenna, chan=0):
+        self.tx_settings[("antenna", chan)] = antenna
+
+    def get_tx_antenna(self, chan=0):
+        return self.tx_settings.get(("antenna", chan), "TX/RX")
+
+
+class DucBlock:
+    def __init__(self, block_id, device):
+        self.block_id = block_id
+        self.device = device
+        self.input_rates = {}
+        self.freqs = {}
+
+    def get_unique_id(self):
+        return self.block_id
+
+    def set_input_rate(self, rate, chan=0):
+        self.input_rates[chan] = self.device.coerce_rate(rate)
+        return self.input_rates[chan]
+
+    def get_input_rate(self, chan=0):
+        return self.input_rates.get(chan, self.device.master_clock_rate)
+
+    def set_freq(self, freq, chan=0):
+        self.freqs[chan] = freq
+        return freq
+
+    def get_freq(self, chan=0):
+        return self.freqs.get(chan, 0.0)
+
+
+class ReplayBlock:
+    """Replay block: uploaded samples are stored per record address"""
+
+    def __init__(self, block_id, graph):
+        self.block_id = block_id
+        self.graph = graph
+        # Uploaded waveforms: record address -> complex64 samples
+        self.memory = {}
+        # Record region and fullness per channel
+        self.record_regions = {}
+        self.record_fullness = {}
+
+    def get_unique_id(self):
+        return self.block_id
+
+    def get_mem_size(self):
+        return REPLAY_MEM_SIZE
+
+    def get_word_size(self):
+        return REPLAY_WORD_SIZE
+
+    def set_play_type(self, play_type, chan=0):
+        pass
+
+    def set_record_type(self, record_type, chan=0):
+        pass
+
+    def record(self, offset, size, chan=0):
+        self.record_regions[chan] = (offset, size)
+        self.record_fullness[chan] = 0
+
+    def record_restart(self, chan=0):
+        self.record_fullness[chan] = 0
+
+    def get_record_offset(self, chan=0):
+        return self.record_regions[chan][0]
+
+    def get_record_size(self, chan=0):
+        return self.record_regions[chan][1]
+
+    def get_record_fullness(self, chan=0):
+        return self.record_fullness.get(chan, 0)
+
+    ## Store samples sent by the TX streamer in the record region, as sc16 on the wire
+    def write(self, tx_data, chan=0):
+        offset, size = self.record_regions[chan]
+        samples = np.asarray(tx_data, dtype=np.complex64).reshape(-1)[: size // SC16_SAMPLE_SIZE]
+        quantized = np.round(np.clip(samples.real, -1, 1) * 32767) + 1j * np.round(
+            np.clip(samples.imag, -1, 1) * 32767
+        )
+        self.memory[offset] = (quantized / 32767).astype(np.complex64)
+        self.record_fullness[chan] = len(samples) * SC16_SAMPLE_SIZE
+
+    def play(self, offset, size, chan=0, time_spec=None, repeat=False):
+        if offset not in self.memory:
+            raise Exception("ERROR: Simulated replay memory region is empty", offset)
+        samples = self.memory[offset][: size // SC16_SAMPLE_SIZE]
+        radio, radio_chan, duc, duc_chan = self.graph.get_tx_chain(self.block_id, chan)
+        simulated_air.play(
+            (self.graph.device.address, str(radio.block_id), radio_chan),
+            radio.get_tx_frequency(radio_chan) + duc.get_freq(duc_chan),
+            duc.get_input_rate(duc_chan),
+            radio.get_tx_gain(radio_chan),
+            samples,
+        )
+
+    def stop(self, chan=0):
+        radio, radio_chan, duc, duc_chan = self.graph.get_tx_chain(self.block_id, chan)
+        simulated_air.stop((self.graph.device.address, str(radio.block_id), radio_chan))
+
+
+class TxStreamer:
+    """TX streamer connected to a Replay block: send records the samples in replay memory"""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.replay_block = None
+        self.replay_chan = 0
+
+    def get_max_num_samps(self):
+        return MAX_NUM_SAMPS
+
+    def send(self, tx_data, metadata, timeout=0.1):
+        self.replay_block.write(tx_data, self.replay_chan)
+        return tx_data.shape[-1]
+
+
+class MbController:
+    def __init__(self, device):
+        self.device = device
+
+    def set_clock_source(self, clock_source):
+        self.device.clock_source = clock_source
+
+
+class RfnocGraph:
+    """Simulated RFNoC graph with one Radio, DUC and Replay block per radio ID"""
+
+    def __init__(self, args, num_blocks=2):
+        self.device = SimulatedDevice(args)
+        self.blocks = {}
+        for idx in range(num_blocks):
+            self.blocks[f"0/Radio#{idx}"] = RadioBlock(f"0/Radio#{idx}")
+            self.blocks[f"0/DUC#{idx}"] = DucBlock(f"0/DUC#{idx}", self.device)
+            self.blocks[f"0/Replay#{idx}"] = ReplayBlock(f"0/Replay#{idx}", self)
+        # Connections: (source block ID, source port) -> (destination block ID, destination port)
+        self.connections = {}
+
+    def find_blocks(self, block_name):
+        return [block_id for block_id in self.blocks if f"/{block_name}#" in block_id]
+
+    def has_block(self, block_id):
+        return str(block_id) in self.blocks
+
+    def get_block(self, block_id):
+        if not self.has_block(block_id):
+            raise Exception("ERROR: Simulated RFNoC block not found", str(block_id))
+        return self.blocks[str(block_id)]
+
+    def connect(self, source, source_port, destination, destination_port, skip_property=False):
+        if isinstance(source, TxStreamer):
+            source.replay_block = self.get_block(destination)
+            source.replay_chan = destination_port
+            return
+        self.connections[(str(source), source_port)] = (str(destination), destination_port)
+
+    def create_tx_streamer(self, num_ports, stream_args):
+        return TxStreamer(self)
+
+    def commit(self):
+        pass
+
+    def get_num_mboards(self):
+        return 1
+
+    def get_mb_controller(self, mboard=0):
+        return MbController(self.device)
+
+    ## Get Radio and DUC of the TX chain of a Replay block, the DUC is connected to the Radio
+    def get_tx_chain(self, replay_block_id, replay_chan=0):
+        radio_id, radio_chan = self.connections.get((str(replay_block_id), replay_chan), (None, 0))
+        if radio_id is None:
+            raise Exception("ERROR: Simulated Replay block is not connected", replay_block_id)
+        for (source_id, source_port), destination in self.connections.items():
+            if destination == (radio_id, radio_chan) and "/DUC#" in source_id:
+                return self.blocks[radio_id], radio_chan, self.blocks[source_id], source_port
+        raise Exception("ERROR: Simulated DUC is not connected to", radio_id)
+
+
+## Connect blocks through the static connections, here: Replay -> Radio directly
+def connect_through_blocks(
+    graph, source_block_id, source_port, destination_block_id, destination_port, skip_property=False
+):
+    graph.connections[(str(source_block_id), source_port)] = (
+        str(destination_block_id),
+        destination_port,
+    )
+
+
+rfnoc = SimpleNamespace(
+    BlockID=BlockID,
+    RfnocGraph=RfnocGraph,
+    RadioControl=lambda block: block,
+    DucBlockControl=lambda block: block,
+    ReplayBlockControl=lambda block: block,
+    connect_through_blocks=connect_through_blocks,
+)
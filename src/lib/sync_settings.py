@@ -7,16 +7,69 @@
 TX and Rx Data Acquisition Sync
 """
 # Description:
-#   define global variables to sync between Tx and Rx start and stop execution
+#   Sync between Tx and Rx start and stop execution of a variation
+#       - RX data acquisition starts as soon as all TX signals are on the air
+#       - TX data transmission stops as soon as the last RX data acquisition is done
+#       - If a TX or RX station fails, all stations of the variation are released
 #
+import threading
 
 
-def init():
-    # start Rx data acquisition if TX signal is on the air
-    global start_rx_data_acquisition_called
-    # stop TX data transmission if RX data acquisition is done
-    global stop_tx_signal_called
-    # TX USRP Serial Number
-    global tx_usrp_serial_number
-    stop_tx_signal_called = False
-    start_rx_data_acquisition_called = False
+class VariationSync:
+    """Sync of the TX and RX stations of a variation"""
+
+    def __init__(self, num_txs, num_rxs):
+        # start Rx data acquisition if all TX signals are on the air
+        self.start_rx_data_acquisition = threading.Event()
+        # stop TX data transmission if all RX data acquisitions are done
+        self.stop_tx_signal = threading.Event()
+        # set if a station failed, the variation is aborted
+        self.aborted = False
+        self.num_txs_to_start = num_txs
+        self.num_rxs_to_finish = num_rxs
+        self.lock = threading.Lock()
+        # No TX: i.e. Rx-only mode, RX data acquisition starts immediately
+        if num_txs == 0:
+            self.start_rx_data_acquisition.set()
+
+    ## Called by each TX station when its signal is on the air
+    def tx_signal_started(self):
+        with self.lock:
+            self.num_txs_to_start = self.num_txs_to_start - 1
+            if self.num_txs_to_start <= 0:
+                self.start_rx_data_acquisition.set()
+
+    ## Called by each RX station when its data acquisition is done
+    def rx_data_acquisition_done(self):
+        with self.lock:
+            self.num_rxs_to_finish = self.num_rxs_to_finish - 1
+            if self.num_rxs_to_finish <= 0:
+                self.stop_tx_signal.set()
+
+    ## Wait until all TX signals are on the air, raise an exception if the variation is aborted
+    def wait_for_rx_start(self):
+        self.start_rx_data_acquisition.wait()
+        if self.aborted:
+            raise Exception("ERROR: TX station failed, RX data acquisition is aborted")
+
+    ## Wait until all RX data acquisitions are done or TX is stopped by the user
+    def wait_for_tx_stop(self):
+        self.stop_tx_signal.wait()
+
+    ## Stop TX data transmission, i.e. by Ctrl+C in Tx-only mode
+    def stop_tx(self):
+        self.stop_tx_signal.set()
+
+    ## Release all waiting stations of the variation
+    def abort(self):
+        self.aborted = True
+        self.start_rx_data_acquisition.set()
+        self.stop_tx_signal.set()
+
+    ## Run a TX or RX station, abort the variation if the station fails
+    def run_station(self, station_function, *args):
+        try:
+            station_function(*args)
+        except BaseException:
+            self.abort()
+            raise
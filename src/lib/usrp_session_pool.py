@@ -0,0 +1,205 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+USRP Device Session Pool
+"""
+# Description:
+#   Keep one open UHD session per device address for the whole data recording campaign.
+#   Opening a USRP session (MultiUSRP or RFNoC graph) costs several seconds, so the TX and RX
+#   stations ask the pool for their session instead of creating a new one for every variation.
+#   A session is only reopened if:
+#       - the master clock rate has to be changed (UHD does not support changing it on an open session)
+#       - the session type changes (i.e. MultiUSRP is used to get the HW info, RFNoC graph is used for TX)
+#   Streamers and RFNoC block controls are stored in the session cache to be reused as well.
+#   The settings applied to the device are tracked per session, so only changed settings are pushed.
+#
+# Pre-requests: Install UHD with Python API enabled
+#
+import threading
+
+# Session types
+MULTI_USRP = "multi_usrp"
+RFNOC_GRAPH = "rfnoc_graph"
+
+# Device arg used by the API to set the master clock rate
+MASTER_CLOCK_RATE_ARG = "master_clock_rate"
+
+
+# Split UHD device args "type=x4xx,addr=192.168.40.2,master_clock_rate=245.76e6" into a dict
+def parse_device_args(args):
+    device_args = {}
+    for item in args.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        key, _, value = item.partition("=")
+        device_args[key.strip()] = value.strip()
+    return device_args
+
+
+# Get the device address: device args without master clock rate
+# All sessions opened with the same address refer to the same physical device
+def get_device_address(args):
+    device_args = parse_device_args(args)
+    device_args.pop(MASTER_CLOCK_RATE_ARG, None)
+    return ",".join(key + "=" + value for key, value in device_args.items())
+
+
+# Get requested master clock rate from device args, None if not given
+def get_requested_master_clock_rate(args):
+    device_args = parse_device_args(args)
+    if MASTER_CLOCK_RATE_ARG in device_args:
+        return float(device_args[MASTER_CLOCK_RATE_ARG])
+    return None
+
+
+class AppliedSettings:
+    """Settings already applied to a device, i.e. frequency, rate and gain per channel"""
+
+    def __init__(self):
+        # applied value per setting key, i.e. ("rx_freq", channel)
+        self.values = {}
+
+    ## Check if the setting has to be pushed to the device
+    def is_changed(self, key, value):
+        return key not in self.values or self.values[key] != value
+
+    ## Store the setting after it is applied to the device
+    def update(self, key, value):
+        self.values[key] = value
+
+    ## Forget a setting, it is applied again on next use, i.e. frequency after rate change
+    def invalidate(self, key):
+        self.values.pop(key, None)
+
+    def clear(self):
+        self.values.clear()
+
+
+class USRPSession:
+    """Open UHD session of a single device"""
+
+    def __init__(self, device, session_type, args, master_clock_rate):
+        # UHD session: uhd.usrp.MultiUSRP or uhd.rfnoc.RfnocGraph
+        self.device = device
+        # session type: MULTI_USRP or RFNOC_GRAPH
+        self.session_type = session_type
+        # device args used to open the session
+        self.args = args
+        # master clock rate of the open session, None if unknown
+        self.master_clock_rate = master_clock_rate
+        # cache of streamers and block controls created on this session
+        self.cache = {}
+        # settings applied to the device during this session
+        self.applied_settings = AppliedSettings()
+
+
+class USRPSessionPool:
+    """Pool of open UHD sessions, one session per device address"""
+
+    def __init__(self, uhd_module=None, enable_console_logging=False):
+        # UHD python module, can be replaced by a fake module for testing
+        # The installed UHD is imported on first use if not given
+        self.uhd_module = uhd_module
+        self.enable_console_logging = enable_console_logging
+        # open sessions per device address
+        self.sessions = {}
+        # Statistics: number of opened sessions (UHD device initialization)
+        self.num_session_constructions = 0
+        # TX and RX threads request their sessions in parallel
+        self.lock = threading.Lock()
+
+    ## Get UHD python module
+    @property
+    def uhd(self):
+        if self.uhd_module is None:
+            import uhd
+
+            self.uhd_module = uhd
+        return self.uhd_module
+
+    ## Get MultiUSRP session
+    def get_multi_usrp(self, args):
+        return self.get_session(args, MULTI_USRP)
+
+    ## Get RFNoC graph session
+    def get_rfnoc_graph(self, args):
+        return self.get_session(args, RFNOC_GRAPH)
+
+    ## Get open session of the given device, open or reopen it if needed
+    def get_session(self, args, session_type):
+        address = get_device_address(args)
+        requested_master_clock_rate = get_requested_master_clock_rate(args)
+
+        with self.lock:
+            session = self.sessions.get(address)
+            if session is not None:
+                if session.session_type != session_type:
+                    reason = "session type changed to " + session_type
+                elif requested_master_clock_rate is not None and (
+                    session.master_clock_rate != requested_master_clock_rate
+                ):
+                    reason = "master clock rate changed to " + str(requested_master_clock_rate)
+                else:
+                    return session
+                print("Reopen USRP session of", address, ":", reason)
+                self.release_session(session)
+                del self.sessions[address]
+
+            session = self.open_session(args, session_type, requested_master_clock_rate)
+            self.sessions[address] = session
+            return session
+
+    ## Open a new UHD session
+    def open_session(self, args, session_type, requested_master_clock_rate):
+        if self.enable_console_logging:
+            print("Open USRP session with args:", args)
+        if session_type == MULTI_USRP:
+            device = self.uhd.usrp.MultiUSRP(args)
+            # Master clock rate is not given (i.e. HW info), read the default one from device
+            if requested_master_clock_rate is None:
+                requested_master_clock_rate = device.get_master_clock_rate()
+        elif session_type == RFNOC_GRAPH:
+            device = self.uhd.rfnoc.RfnocGraph(args)
+        else:
+            raise Exception("ERROR: Unknown USRP session type", session_type)
+        self.num_session_constructions = self.num_session_constructions + 1
+
+        return USRPSession(device, session_type, args, requested_master_clock_rate)
+
+    ## Release UHD session, all streamers and block controls should be released before the device
+    def release_session(self, session):
+        session.cache.clear()
+        session.applied_settings.clear()
+        session.device = None
+
+    ## Close the open session of a device, i.e. before the device is used by another process
+    def close_session(self, args):
+        with self.lock:
+            session = self.sessions.pop(get_device_address(args), None)
+            if session is not None:
+                self.release_session(session)
+
+    ## Get RX streamer of a MultiUSRP session, create it only once
+    def get_rx_streamer(self, session, cpu_format, wire_format, channels):
+        key = ("rx_streamer", cpu_format, wire_format, tuple(channels))
+        rx_streamer = session.cache.get(key)
+        if rx_streamer is None:
+            # Only one RX streamer per channel is allowed, release the old one first
+            for cache_key in [k for k in session.cache if k[0] == "rx_streamer"]:
+                del session.cache[cache_key]
+            st_args = self.uhd.usrp.StreamArgs(cpu_format, wire_format)
+            st_args.channels = channels
+            rx_streamer = session.device.get_rx_stream(st_args)
+            session.cache[key] = rx_streamer
+        return rx_streamer
+
+    ## Close all open sessions, at the end of the campaign
+    def close_all(self):
+        with self.lock:
+            for session in self.sessions.values():
+                self.release_session(session)
+            self.sessions = {}
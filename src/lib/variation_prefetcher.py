@@ -0,0 +1,86 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Variation Prefetcher
+"""
+# Description:
+#   Prepare the next variation on a worker thread while the current variation is on air.
+#   The host-side preparation of a variation is independent of the hardware:
+#       - TX and RX configs, waveform config, rate and master clock rate resolution
+#       - TX waveform samples loaded from the waveform file or the waveform cache
+#   The main thread only waits for the worker if the preparation takes longer than the recording
+#   of the current variation. A single worker keeps the preparation in execution order.
+#
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class VariationPrefetcher:
+    """Prepare variations ahead of their execution on a single worker thread"""
+
+    def __init__(self, prepare_variation, enable_prefetch=True):
+        # prepare_variation(variation_idx, iteration_config): returns the prepared variation
+        self.prepare_variation = prepare_variation
+        self.enable_prefetch = enable_prefetch
+        self.executor = ThreadPoolExecutor(max_workers=1) if enable_prefetch else None
+        # (variation index, future) of the prefetched variation
+        self.prefetched = None
+        # Statistics: prepared variations in the background and main thread waiting time
+        self.num_prefetched_variations = 0
+        self.num_prepared_variations = 0
+        self.wait_time = 0.0
+
+    ## Start preparing a variation in the background, only one variation is prefetched
+    def prefetch(self, variation_idx, iteration_config):
+        if not self.enable_prefetch:
+            return
+        if self.prefetched is not None:
+            raise Exception("ERROR: Variation is already prefetched", self.prefetched[0])
+        future = self.executor.submit(self.prepare_variation, variation_idx, iteration_config)
+        self.prefetched = (variation_idx, future)
+
+    ## Get prepared variation, wait for the prefetched variation or prepare it in this thread
+    # Errors of the preparation are raised here, in execution order
+    def get(self, variation_idx, iteration_config):
+        if self.prefetched is not None:
+            prefetched_idx, future = self.prefetched
+            self.prefetched = None
+            if prefetched_idx == variation_idx:
+                wait_start_time = time.time()
+                prepared_variation = future.result()
+                self.wait_time = self.wait_time + time.time() - wait_start_time
+                self.num_prefetched_variations = self.num_prefetched_variations + 1
+                return prepared_variation
+            # Different variation requested: drop the prefetched one
+            future.cancel()
+        self.num_prepared_variations = self.num_prepared_variations + 1
+        return self.prepare_variation(variation_idx, iteration_config)
+
+    ## Stop the worker thread, a pending preparation is dropped
+    def close(self):
+        if self.prefetched is not None:
+            self.prefetched[1].cancel()
+            self.prefetched = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def print_report(self):
+        print(
+            "Prefetched variations: ",
+            self.num_prefetched_variations,
+            ", prepared on demand: ",
+            self.num_prepared_variations,
+            ", waiting time for prefetched variations: ",
+            round(self.wait_time, 3),
+            "s",
+        )
@@ -0,0 +1,118 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Variations Normalizer
+"""
+# Description:
+#   Find variations with the same effective hardware configuration after rate resolution.
+#   If the rate source is "waveform_config", the user-defined rate and bandwidth are replaced by the
+#   waveform rate and bandwidth, so all listed rate and bandwidth values give the same effective config.
+#   Duplicate variations are handled based on the "duplicate_variations" option:
+#       - record: record all variations (default)
+#       - skip: record only the first variation of each effective config
+#       - link: record only the first variation, the duplicates are linked in its meta-data
+#   Effective configs are kept as hash only, the memory per distinct variation is constant.
+#
+import hashlib
+
+DUPLICATE_VARIATIONS_MODES = ["skip", "link", "record"]
+
+# Station config attributes that do not change the hardware config or the recorded data
+IGNORED_ATTRIBUTES = ["campaign_waveforms", "tx_waveform", "variation_index", "linked_variations"]
+
+
+## Get effective config of a TX or RX station as a hashable key
+def get_effective_station_config(station_config):
+    return tuple(
+        (key, repr(value))
+        for key, value in sorted(vars(station_config).items())
+        if key not in IGNORED_ATTRIBUTES
+    )
+
+
+## Get effective config of a variation: all TX and RX stations
+def get_effective_variation_config(txs_data_recording_api_config, rxs_data_recording_api_config):
+    return (
+        tuple(get_effective_station_config(config) for config in txs_data_recording_api_config),
+        tuple(get_effective_station_config(config) for config in rxs_data_recording_api_config),
+    )
+
+
+## Get key of the effective config of a variation: SHA-1 digest of the effective config
+def get_effective_variation_key(txs_data_recording_api_config, rxs_data_recording_api_config):
+    effective_config = get_effective_variation_config(
+        txs_data_recording_api_config, rxs_data_recording_api_config
+    )
+    return hashlib.sha1(repr(effective_config).encode()).digest()
+
+
+class VariationsNormalizer:
+    """Map of duplicate variations to the variation with the same effective config"""
+
+    def __init__(self, duplicate_variations="record"):
+        if duplicate_variations not in DUPLICATE_VARIATIONS_MODES:
+            raise Exception("ERROR: Unknown duplicate variations mode", duplicate_variations)
+        self.duplicate_variations = duplicate_variations
+        # index of the first variation per effective config key
+        self.effective_variations = {}
+        # index of the recorded variation per duplicate variation index
+        self.duplicates = {}
+        # indices of the duplicate variations per recorded variation index
+        self.linked_variations = {}
+        self.num_variations = 0
+        # Statistics: measured time of the recorded variations
+        self.num_recorded_variations = 0
+        self.recorded_variations_time = 0.0
+
+    ## Add variation in execution order, the first variation of an effective config is recorded
+    def add_variation(
+        self, variation_idx, txs_data_recording_api_config, rxs_data_recording_api_config
+    ):
+        self.num_variations = self.num_variations + 1
+        effective_key = get_effective_variation_key(
+            txs_data_recording_api_config, rxs_data_recording_api_config
+        )
+        recorded_idx = self.effective_variations.setdefault(effective_key, variation_idx)
+        if recorded_idx != variation_idx:
+            self.duplicates[variation_idx] = recorded_idx
+            self.linked_variations.setdefault(recorded_idx, []).append(variation_idx)
+
+    ## Check if a variation is skipped, it has the same effective config as a recorded variation
+    def is_skipped(self, variation_idx):
+        return self.duplicate_variations != "record" and variation_idx in self.duplicates
+
+    def get_num_skipped_variations(self):
+        if self.duplicate_variations == "record":
+            return 0
+        return len(self.duplicates)
+
+    ## Get duplicate variations linked in the meta-data of a recorded variation
+    def get_linked_variations(self, variation_idx):
+        if self.duplicate_variations != "link":
+            return []
+        return self.linked_variations.get(variation_idx, [])
+
+    ## Add measured time of a recorded variation
+    def add_recorded_variation_time(self, time_elapsed):
+        self.num_recorded_variations = self.num_recorded_variations + 1
+        self.recorded_variations_time = self.recorded_variations_time + time_elapsed
+
+    ## Estimate saved hardware time in hours: mean time of recorded variations per skipped variation
+    def get_saved_hardware_hours(self):
+        if self.num_recorded_variations == 0:
+            return 0.0
+        mean_variation_time = self.recorded_variations_time / self.num_recorded_variations
+        return self.get_num_skipped_variations() * mean_variation_time / 3600
+
+    def print_report(self):
+        print("Number of variations: ", self.num_variations)
+        print("Number of unique effective variations: ", len(self.effective_variations))
+        print(
+            "Number of duplicate variations: ",
+            len(self.duplicates),
+            ", duplicate variations mode: ",
+            self.duplicate_variations,
+        )
@@ -0,0 +1,145 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Variations Scheduler
+"""
+# Description:
+#   Reorder the variations to minimize the reconfiguration cost between consecutive variations.
+#   The set of recorded variations is not changed, only their execution order.
+#       - Parameters are grouped by reconfiguration cost class:
+#         master clock rate (device reopen) > waveform (replay upload) > tuning (retune) > gain
+#       - The most expensive parameters change slowest
+#       - Snake order (reflected mixed-radix Gray code): consecutive variations differ in a single
+#         parameter only, i.e. a frequency sweep runs forward and backward instead of restarting
+#
+import itertools
+
+# Reconfiguration cost classes and their relative cost, ordered from most to least expensive
+COST_CLASSES = ["master_clock_rate", "waveform", "tuning", "gain"]
+RECONFIGURATION_COSTS = {"master_clock_rate": 1000, "waveform": 100, "tuning": 10, "gain": 1}
+
+# Parameter name suffixes per cost class, the rate defines the master clock rate
+COST_CLASS_PARAMETERS = {
+    "master_clock_rate": ["_args", "_rate", "_rate_source", "clock_reference"],
+    "waveform": [
+        "_waveform_generator",
+        "_waveform_file_name",
+        "_waveform_path",
+        "_waveform_path_type",
+        "_waveform_format",
+    ],
+    "tuning": ["_freq", "_lo_offset", "_enable_lo_offset", "_bandwidth", "_antenna", "_channels"],
+}
+
+
+## Get reconfiguration cost class of a parameter, all other parameters are cheap as a gain change
+def get_cost_class(parameter):
+    for cost_class, suffixes in COST_CLASS_PARAMETERS.items():
+        for suffix in suffixes:
+            if parameter.endswith(suffix):
+                return cost_class
+    return "gain"
+
+
+class VariationsScheduler:
+    """Execution order of the variations of a variations product"""
+
+    def __init__(self, variations_product, enable_scheduling=True):
+        self.variations_product = variations_product
+        self.enable_scheduling = enable_scheduling
+        self.radices = [len(values) for values in variations_product.values]
+        self.cost_classes = [
+            get_cost_class(parameter) for parameter in variations_product.parameters
+        ]
+        # Parameter positions from slowest to fastest changing parameter
+        if enable_scheduling:
+            self.order = sorted(
+                range(len(self.radices)),
+                key=lambda position: COST_CLASSES.index(self.cost_classes[position]),
+            )
+        else:
+            self.order = list(range(len(self.radices)))
+
+    def __len__(self):
+        return len(self.variations_product)
+
+    ## Get index of the variation in the variations product for the given execution step
+    def get_variation_index(self, step):
+        if not self.enable_scheduling:
+            return step
+        # Decode the step in the scheduled parameter order, fastest parameter first
+        digits = {}
+        remaining = step
+        for position in reversed(self.order):
+            remaining, digits[position] = divmod(remaining, self.radices[position])
+        # Snake order: a parameter runs backward if the run number of all slower parameters is odd
+        prefix_value = 0
+        for position in self.order:
+            digit = digits[position]
+            if prefix_value % 2 == 1:
+                digits[position] = self.radices[position] - 1 - digit
+            prefix_value = prefix_value * self.radices[position] + digit
+        # Encode the digits in the parameter order of the variations product
+        variation_index = 0
+        for position in range(len(self.radices)):
+            variation_index = variation_index * self.radices[position] + digits[position]
+        return variation_index
+
+    ## Iterate over (variation index, variation) in execution order
+    def __iter__(self):
+        for step in range(len(self)):
+            variation_index = self.get_variation_index(step)
+            yield variation_index, self.variations_product[variation_index]
+
+    ## Count the reconfigurations per cost class of the naive (config) order, without running it
+    # A class is reconfigured if any of its parameters changes between consecutive variations
+    def count_naive_reconfigurations(self):
+        return self.count_reconfigurations(list(range(len(self.radices))), snake_order=False)
+
+    ## Count the reconfigurations per cost class of the execution order
+    def count_scheduled_reconfigurations(self):
+        return self.count_reconfigurations(self.order, snake_order=self.enable_scheduling)
+
+    ## Count reconfigurations per cost class for the given parameter order
+    # In odometer order, the parameter at position k and all faster parameters change at once
+    # In snake order, only a single parameter changes per step
+    def count_reconfigurations(self, order, snake_order):
+        radices = [self.radices[position] for position in order]
+        cost_classes = [self.cost_classes[position] for position in order]
+        # number of runs of the slowest k + 1 parameters
+        num_runs = list(itertools.accumulate(radices, lambda x, y: x * y))
+        reconfigurations = {}
+        for cost_class in COST_CLASSES:
+            positions = [
+                k for k in range(len(order)) if cost_classes[k] == cost_class and radices[k] > 1
+            ]
+            count = 0
+            if snake_order:
+                for k in positions:
+                    count = count + num_runs[k] - (num_runs[k - 1] if k > 0 else 1)
+            elif positions:
+                count = num_runs[max(positions)] - 1
+            reconfigurations[cost_class] = count
+        return reconfigurations
+
+    ## Get weighted reconfiguration cost
+    def get_reconfiguration_cost(self, reconfigurations):
+        return sum(RECONFIGURATION_COSTS[key] * value for key, value in reconfigurations.items())
+
+    ## Print estimated reconfigurations of naive and scheduled order
+    def print_report(self):
+        naive = self.count_naive_reconfigurations()
+        scheduled = self.count_scheduled_reconfigurations()
+        print("Number of variations: ", len(self))
+        print("Estimated reconfigurations (config order -> execution order):")
+        for cost_class in COST_CLASSES:
+            print("   ", cost_class, ":", naive[cost_class], "->", scheduled[cost_class])
+        print(
+            "    weighted cost:",
+            self.get_reconfiguration_cost(naive),
+            "->",
+            self.get_reconfiguration_cost(scheduled),
+        )
@@ -0,0 +1,204 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Waveform Cache
+"""
+# Description:
+#   On-disk cache of converted TX waveforms. Parsing TDMS / MATLAB waveforms and converting them
+#   to complex64 is done only once, all further loads memory-map the cached samples.
+#       - Cache entries are keyed by waveform file path, modification time and size,
+#         a changed waveform file gets a new entry
+#       - Samples are stored as complex64 (cf32) in .npy files, the IQ rate is stored in a json file
+#       - Samples quantized as int16 I/Q pairs (sc16) are only stored once they are requested,
+#         they are converted from the cached cf32 samples
+#       - Loaded waveforms are memory-mapped copy-on-write, no copy is made when loading
+#       - Waveform configs extracted from the waveform config files (i.e. RFWS) are stored in json files
+#
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+
+from lib import read_waveform_data_interface
+
+# Cached sample types
+CF32 = "cf32"
+SC16 = "sc16"
+# full scale of sc16 samples, the same scaling is used by UHD to convert fc32 to sc16
+SC16_FULL_SCALE = 32767
+
+
+## Get the waveform file that is read for the given waveform format
+def get_waveform_source_file(waveform_path, waveform_file_name, waveform_format):
+    if waveform_format == "tdms":
+        return os.path.join(waveform_path, waveform_file_name + ".tdms")
+    elif waveform_format == "matlab_ieee":
+        return os.path.join(waveform_path, waveform_file_name, "sbb_str.mat")
+    elif waveform_format == "matlab":
+        return os.path.join(waveform_path, waveform_file_name + ".mat")
+    else:
+        raise Exception("ERROR: Unknown or not supported tx waveform format.")
+
+
+## Read waveform samples and IQ rate, IQ rate is None if not given by the waveform format
+def read_waveform_data(waveform_path, waveform_file_name, waveform_format):
+    waveform_IQ_rate = None
+    if waveform_format == "tdms":
+        tx_data_complex, waveform_IQ_rate = read_waveform_data_interface.read_waveform_data_tdms(
+            waveform_path, waveform_file_name
+        )
+    elif waveform_format == "matlab_ieee":
+        tx_data_complex = read_waveform_data_interface.read_waveform_data_matlab_ieee(
+            waveform_path, waveform_file_name
+        )
+    elif waveform_format == "matlab":
+        tx_data_complex = read_waveform_data_interface.read_waveform_data_matlab(
+            waveform_path, waveform_file_name
+        )
+    else:
+        raise Exception("ERROR: Unknown or not supported tx waveform format.")
+    return np.ravel(tx_data_complex), waveform_IQ_rate
+
+
+## Get key of a waveform file: hash of absolute path, modification time and size
+# A changed waveform file gets a new key, the waveform samples are not read
+def get_file_key(source_file):
+    if not os.path.exists(source_file):
+        raise Exception("ERROR: Waveform file is not exist", source_file)
+    file_stat = os.stat(source_file)
+    key_string = "|".join(
+        [os.path.abspath(source_file), str(file_stat.st_mtime_ns), str(file_stat.st_size)]
+    )
+    return hashlib.sha1(key_string.encode()).hexdigest()
+
+
+## Quantize complex samples to int16 I/Q pairs
+def convert_to_sc16(tx_data_complex):
+    tx_data_sc16 = np.empty((len(tx_data_complex), 2), dtype=np.int16)
+    tx_data_sc16[:, 0] = np.round(np.clip(tx_data_complex.real, -1.0, 1.0) * SC16_FULL_SCALE)
+    tx_data_sc16[:, 1] = np.round(np.clip(tx_data_complex.imag, -1.0, 1.0) * SC16_FULL_SCALE)
+    return tx_data_sc16
+
+
+class WaveformCache:
+    """Content-addressed on-disk cache of converted TX waveforms"""
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        # Loaded waveforms per cache key and sample type
+        self.loaded_waveforms = {}
+        # Statistics: number of parsed waveform files (cache misses)
+        self.num_waveform_conversions = 0
+        # Statistics: number of extracted waveform configs (cache misses)
+        self.num_waveform_config_extractions = 0
+        # TX threads load their waveforms in parallel
+        self.lock = threading.Lock()
+
+    ## Get cache key of a waveform file: hash of absolute path, modification time and size
+    def get_cache_key(self, source_file):
+        return get_file_key(source_file)
+
+    ## Get path of a cache entry file
+    def get_entry_file(self, cache_key, extension):
+        return os.path.join(self.cache_path, cache_key + extension)
+
+    ## Load waveform samples and IQ rate
+    # data_type: CF32 (complex64 samples) or SC16 (int16 I/Q pairs, shape (num_samples, 2))
+    def load(self, waveform_path, waveform_file_name, waveform_format, data_type=CF32):
+        if data_type not in (CF32, SC16):
+            raise Exception("ERROR: Unknown or not supported cached waveform data type", data_type)
+        source_file = get_waveform_source_file(waveform_path, waveform_file_name, waveform_format)
+        cache_key = self.get_cache_key(source_file)
+
+        with self.lock:
+            loaded_waveform = self.loaded_waveforms.get((cache_key, data_type))
+            if loaded_waveform is None:
+                info_file = self.get_entry_file(cache_key, ".json")
+                cf32_file = self.get_entry_file(cache_key, ".cf32.npy")
+                data_file = self.get_entry_file(cache_key, "." + data_type + ".npy")
+                if not (os.path.exists(info_file) and os.path.exists(cf32_file)):
+                    self.add_entry(
+                        cache_key, source_file, waveform_path, waveform_file_name, waveform_format
+                    )
+                if not os.path.exists(data_file):
+                    # sc16 samples are quantized on first request, the waveform is not read again
+                    self.write_entry_file(data_file, convert_to_sc16(np.load(cf32_file)))
+                with open(info_file, "r") as file:
+                    waveform_info = json.load(file)
+                # Copy-on-write memory map: writeable for UHD, but pages are only read from disk
+                tx_data = np.load(data_file, mmap_mode="c")
+                loaded_waveform = (tx_data, waveform_info["waveform_IQ_rate"])
+                self.loaded_waveforms[(cache_key, data_type)] = loaded_waveform
+        return loaded_waveform
+
+    ## Read and convert the waveform once, store it in the cache
+    def add_entry(self, cache_key, source_file, waveform_path, waveform_file_name, waveform_format):
+        print("Add waveform to cache:", source_file)
+        tx_data_complex, waveform_IQ_rate = read_waveform_data(
+            waveform_path, waveform_file_name, waveform_format
+        )
+        tx_data_cf32 = np.ascontiguousarray(tx_data_complex, dtype=np.complex64)
+        self.num_waveform_conversions = self.num_waveform_conversions + 1
+
+        self.create_cache_folder()
+        # Write to temporary files first, a cache entry is complete once the info file exists
+        self.write_entry_file(self.get_entry_file(cache_key, ".cf32.npy"), tx_data_cf32)
+        waveform_info = {
+            "source_file": os.path.abspath(source_file),
+            "waveform_IQ_rate": waveform_IQ_rate,
+            "num_samples": len(tx_data_cf32),
+        }
+        info_file = self.get_entry_file(cache_key, ".json")
+        with open(info_file + ".tmp", "w") as file:
+            json.dump(waveform_info, file, indent=4)
+        os.replace(info_file + ".tmp", info_file)
+
+    ## Load waveform config extracted from the waveform config files, extract it only once
+    # source_files: files the waveform config is read from, i.e. RFWS config and TDMS waveform (IQ rate)
+    # extract_waveform_config: function returning the waveform config as dict
+    def load_waveform_config(self, source_files, extract_waveform_config):
+        key_string = "|".join(self.get_cache_key(source_file) for source_file in source_files)
+        cache_key = hashlib.sha1(key_string.encode()).hexdigest()
+        config_file = self.get_entry_file(cache_key, ".config.json")
+
+        with self.lock:
+            if os.path.exists(config_file):
+                with open(config_file, "r") as file:
+                    return json.load(file)
+            waveform_config_src = extract_waveform_config()
+            self.num_waveform_config_extractions = self.num_waveform_config_extractions + 1
+            self.create_cache_folder()
+            with open(config_file + ".tmp", "w") as file:
+                json.dump(waveform_config_src, file, indent=4)
+            os.replace(config_file + ".tmp", config_file)
+        return waveform_config_src
+
+    def create_cache_folder(self):
+        if not os.path.isdir(self.cache_path):
+            print("Create new folder for waveform cache: " + str(self.cache_path))
+            os.makedirs(self.cache_path)
+
+    ## Write numpy array to file via a temporary file
+    def write_entry_file(self, entry_file, data):
+        with open(entry_file + ".tmp", "wb") as file:
+            np.save(file, data)
+        os.replace(entry_file + ".tmp", entry_file)
+
+
+# Waveform caches of the process, one per cache path
+waveform_caches = {}
+waveform_caches_lock = threading.Lock()
+
+
+## Get the shared waveform cache of the given cache path
+def get_waveform_cache(cache_path):
+    with waveform_caches_lock:
+        cache = waveform_caches.get(cache_path)
+        if cache is None:
+            cache = WaveformCache(cache_path)
+            waveform_caches[cache_path] = cache
+        return cache
@@ -17,42 +17,52 @@ import datetime as dt
 from sigmf import SigMFFile
 from sigmf.utils import get_data_type_str
 import numpy as np
+import time
+import json
+import hashlib
 from lib import data_format_conversion_lib
+from lib import instrumentation
 
 # To use data time
 from datetime import datetime
 
 
-def write_rx_recorded_data_in_sigmf(rx_data, rx_args, txs_args, general_config, idx):
-    # Check the receive target path is valid, else create folder
-    if not os.path.isdir(rx_args.rx_recorded_data_path):
-        print("Create new folder for recorded data: " + str(rx_args.rx_recorded_data_path))
-        os.makedirs(rx_args.rx_recorded_data_path)
-
-    # Write recorded data to file
+# Get file name of recorded data without extension
+# record_idx: record number, None for multi-record files
+# Files of all variations and RX stations can share the time stamp, i.e. all RX stations start on
+# the same event or with use_tx_timestamp, so their name has the RX station and variation index
+def get_rx_data_file_name(rx_args, txs_args, general_config, record_idx, capture_time):
     # Get time stamp
-    print(general_config["use_tx_timestamp"])
     if data_format_conversion_lib.str2bool(general_config["use_tx_timestamp"]):
         prefix_length = len("tx_waveform_")
         time_stamp_milli_sec = txs_args[0].waveform_file_name[prefix_length:]
     else:
-        time_stamp_micro_sec = datetime.now().strftime("%Y_%m_%d-%H_%M_%S_%f")
+        time_stamp_micro_sec = datetime.fromtimestamp(capture_time).strftime(
+            "%Y_%m_%d-%H_%M_%S_%f"
+        )
         time_stamp_milli_sec = time_stamp_micro_sec[:-3]
 
-    rx_data_file_name = rx_args.captured_data_file_name + str(idx) + "-" + time_stamp_milli_sec
-    dataset_filename = rx_data_file_name + ".sigmf-data"
-    dataset_file_path = os.path.join(rx_args.rx_recorded_data_path, dataset_filename)
-    print(dataset_file_path)
-    rx_data.tofile(dataset_file_path)
+    rx_data_file_name = rx_args.captured_data_file_name + rx_args.station_id + "-"
+    if rx_args.variation_index is not None:
+        rx_data_file_name = rx_data_file_name + "var" + str(rx_args.variation_index) + "-"
+    if record_idx is not None:
+        rx_data_file_name = rx_data_file_name + str(record_idx) + "-"
+    return rx_data_file_name + time_stamp_milli_sec
+
+
+# Check the receive target path is valid, else create folder
+def check_rx_recorded_data_path(rx_args):
+    if not os.path.isdir(rx_args.rx_recorded_data_path):
+        print("Create new folder for recorded data: " + str(rx_args.rx_recorded_data_path))
+        os.makedirs(rx_args.rx_recorded_data_path)
 
-    # Create sigmf metadata
-    # ----------------------
-    # Add global parameters to SigMF metadata
-    # ----------------------
+
+# Create SigMF file with global parameters
+def create_sigmf_file(rx_args, general_config):
+    # The data file is not given, the hash is calculated while writing the data
     meta = SigMFFile(
-        data_file=dataset_file_path,  # extension is optional
         global_info={
-            SigMFFile.DATATYPE_KEY: "cf32_le",  # get_data_type_str(rx_data) - 'cf64_le' is not supported yet
+            SigMFFile.DATATYPE_KEY: rx_args.rx_recorded_data_type,  # "cf32_le" or "ci16_le"
             SigMFFile.SAMPLE_RATE_KEY: rx_args.coerced_rx_rate,  # args.rate,
             SigMFFile.NUM_CHANNELS_KEY: len(rx_args.channels),
             SigMFFile.AUTHOR_KEY: general_config["author"],
@@ -66,18 +76,26 @@ def write_rx_recorded_data_in_sigmf(rx_data, rx_args, txs_args, general_config,
             SigMFFile.VERSION_KEY: sigmf.__version__,
         },
     )
+    return meta
 
-    # ----------------------
-    # Add capture parameters to SigMF metadata
-    # ----------------------
-    meta.add_capture(
-        0,  # Sample Start
-        metadata={
-            SigMFFile.FREQUENCY_KEY: rx_args.coerced_rx_freq,
-            SigMFFile.DATETIME_KEY: dt.datetime.utcnow().isoformat() + "Z",
-        },
-    )
 
+# Get capture date time in ISO 8601 format (UTC)
+def get_capture_datetime(capture_time):
+    capture_datetime = dt.datetime.fromtimestamp(capture_time, dt.timezone.utc)
+    return capture_datetime.isoformat().replace("+00:00", "Z")
+
+
+# Get capture parameters of a record
+def get_capture_metadata(rx_args, capture_time):
+    capture_metadata = {
+        SigMFFile.FREQUENCY_KEY: rx_args.coerced_rx_freq,
+        SigMFFile.DATETIME_KEY: get_capture_datetime(capture_time),
+    }
+    return capture_metadata
+
+
+# Get annotation parameters: Tx waveform config, channel and rx info
+def get_annotation_metadata(rx_args, txs_args, general_config):
     # Get tx waveform config
     txs_info = [{} for sub in range(len(txs_args))]
     channel_info = [{} for sub in range(len(txs_args))]
@@ -134,37 +152,223 @@ def write_rx_recorded_data_in_sigmf(rx_data, rx_args, txs_args, general_config,
         "gain": rx_args.coerced_rx_gain,
     }
 
-    # ----------------------
-    # Add annotation parameters to SigMF metadata
-    # ----------------------
-    meta.add_annotation(
-        0,  # Sample Start
-        rx_args.num_rx_samps,  # Sample count
-        metadata={
-            SigMFFile.FLO_KEY: rx_args.coerced_rx_freq
-            - rx_args.coerced_rx_rate / 2,  # args.freq - args.rate / 2,
-            SigMFFile.FHI_KEY: rx_args.coerced_rx_freq
-            + rx_args.coerced_rx_rate / 2,  # args.freq + args.rate / 2,
-            SigMFFile.LABEL_KEY: label,
-            SigMFFile.COMMENT_KEY: general_config["comment"],
-            "num_transmitters": len(txs_args),
-            "system_components:transmitter": txs_info,
-            "system_components:channel": channel_info,
-            "system_components:receiver": rx_info,
-        },
-    )
+    annotation_metadata = {
+        SigMFFile.FLO_KEY: rx_args.coerced_rx_freq
+        - rx_args.coerced_rx_rate / 2,  # args.freq - args.rate / 2,
+        SigMFFile.FHI_KEY: rx_args.coerced_rx_freq
+        + rx_args.coerced_rx_rate / 2,  # args.freq + args.rate / 2,
+        SigMFFile.LABEL_KEY: label,
+        SigMFFile.COMMENT_KEY: general_config["comment"],
+        "num_transmitters": len(txs_args),
+        "system_components:transmitter": txs_info,
+        "system_components:channel": channel_info,
+        "system_components:receiver": rx_info,
+    }
+    # Duplicate variations with the same effective config are linked to this recording
+    if rx_args.linked_variations:
+        annotation_metadata["variation_index"] = rx_args.variation_index
+        annotation_metadata["linked_variations"] = rx_args.linked_variations
+    return annotation_metadata
+
+
+# Placeholders of the per-record fields in the metadata template
+DATETIME_PLACEHOLDER = "datetime_placeholder"
+SHA512_PLACEHOLDER = "sha512_placeholder"
+RX_RECORD_STATUS_PLACEHOLDER = "rx_record_status_placeholder"
+
+# Annotation field of the RX stream status of a record: errors reported by the RX stream,
+# number of retries and if the written record is corrupted, null if not known
+RX_RECORD_STATUS_KEY = "rx_record_status"
 
-    # Check for mistakes
-    assert meta.validate()
+
+class SigMFMetadataTemplate:
+    """SigMF metadata of a variation: validated once, only per-record fields are patched"""
+
+    def __init__(self, rx_args, txs_args, general_config):
+        # ----------------------
+        # Add global parameters to SigMF metadata
+        # ----------------------
+        meta = create_sigmf_file(rx_args, general_config)
+        meta.set_global_field(SigMFFile.HASH_KEY, SHA512_PLACEHOLDER)
+
+        # ----------------------
+        # Add capture parameters to SigMF metadata
+        # ----------------------
+        capture_metadata = get_capture_metadata(rx_args, 0.0)
+        capture_metadata[SigMFFile.DATETIME_KEY] = DATETIME_PLACEHOLDER
+        meta.add_capture(
+            0,  # Sample Start
+            metadata=capture_metadata,
+        )
+
+        # ----------------------
+        # Add annotation parameters to SigMF metadata
+        # ----------------------
+        annotation_metadata = get_annotation_metadata(rx_args, txs_args, general_config)
+        annotation_metadata[RX_RECORD_STATUS_KEY] = RX_RECORD_STATUS_PLACEHOLDER
+        meta.add_annotation(
+            0,  # Sample Start
+            rx_args.num_rx_samps,  # Sample count
+            metadata=annotation_metadata,
+        )
+
+        # Check for mistakes, only once per variation
+        assert meta.validate()
+
+        # Metadata with sorted keys as written by SigMF
+        self.metadata = meta.ordered_metadata()
+        # Serialized metadata of a single record file
+        self.record_metadata_text = self.dumps(self.metadata)
+        # Indentation of the RX record status field, the patched status keeps the layout of SigMF
+        status_line = next(
+            line
+            for line in self.record_metadata_text.splitlines()
+            if RX_RECORD_STATUS_PLACEHOLDER in line
+        )
+        self.rx_record_status_indent = len(status_line) - len(status_line.lstrip())
+
+    ## Serialize metadata in the same layout as SigMFFile.tofile
+    @staticmethod
+    def dumps(metadata):
+        return json.dumps(metadata, indent=4, separators=(",", ": "))
+
+    ## Serialize RX record status in the layout of SigMFFile.tofile: sorted keys and indented at
+    # the position of its field in the metadata of a single record file
+    def dumps_rx_record_status(self, rx_record_status):
+        rx_record_status_text = json.dumps(
+            rx_record_status, indent=4, separators=(",", ": "), sort_keys=True
+        )
+        return rx_record_status_text.replace("\n", "\n" + " " * self.rx_record_status_indent)
+
+    ## Get metadata of a single record file: patch datetime, hash and RX record status only
+    # rx_record_status: RX stream status of the record, see capture_rx_record of the recorder
+    def get_record_metadata(self, capture_time, sha512, rx_record_status=None):
+        record_metadata_text = self.record_metadata_text.replace(
+            DATETIME_PLACEHOLDER, get_capture_datetime(capture_time)
+        )
+        record_metadata_text = record_metadata_text.replace(
+            json.dumps(RX_RECORD_STATUS_PLACEHOLDER), self.dumps_rx_record_status(rx_record_status)
+        )
+        return record_metadata_text.replace(SHA512_PLACEHOLDER, sha512)
+
+    ## Get metadata of a multi-record file: one capture and annotation segment per record
+    # records: list of (sample start, sample count, capture time, RX record status)
+    def get_multi_record_metadata(self, records, sha512):
+        metadata = {"global": dict(self.metadata["global"]), "captures": [], "annotations": []}
+        metadata["global"][SigMFFile.HASH_KEY] = sha512
+        for sample_start, sample_count, capture_time, rx_record_status in records:
+            capture_metadata = dict(self.metadata["captures"][0])
+            capture_metadata[SigMFFile.DATETIME_KEY] = get_capture_datetime(capture_time)
+            capture_metadata[SigMFFile.START_INDEX_KEY] = sample_start
+            metadata["captures"].append(capture_metadata)
+            annotation_metadata = dict(self.metadata["annotations"][0])
+            annotation_metadata[SigMFFile.START_INDEX_KEY] = sample_start
+            annotation_metadata[SigMFFile.LENGTH_INDEX_KEY] = sample_count
+            # Sorted keys as written by SigMF
+            annotation_metadata[RX_RECORD_STATUS_KEY] = json.loads(
+                json.dumps(rx_record_status, sort_keys=True)
+            )
+            metadata["annotations"].append(annotation_metadata)
+        return self.dumps(metadata)
+
+
+# capture_time: time stamp of the record in seconds since epoch, current time is used if not given
+# metadata_template: SigMF metadata template of the variation, created if not given
+# rx_record_status: RX stream status of the record written to the annotation, null if not given
+def write_rx_recorded_data_in_sigmf(
+    rx_data,
+    rx_args,
+    txs_args,
+    general_config,
+    idx,
+    capture_time=None,
+    metadata_template=None,
+    rx_record_status=None,
+):
+    if capture_time is None:
+        capture_time = time.time()
+    if metadata_template is None:
+        metadata_template = SigMFMetadataTemplate(rx_args, txs_args, general_config)
+
+    # Check the receive target path is valid, else create folder
+    check_rx_recorded_data_path(rx_args)
+
+    # Write recorded data to file
+    rx_data_file_name = get_rx_data_file_name(rx_args, txs_args, general_config, idx, capture_time)
+    dataset_filename = rx_data_file_name + ".sigmf-data"
+    dataset_file_path = os.path.join(rx_args.rx_recorded_data_path, dataset_filename)
+    print(dataset_file_path)
+    tracer = instrumentation.get_tracer()
+    with tracer.span("write", station=rx_args.args, record=idx):
+        rx_data.tofile(dataset_file_path)
+        # Hash of the written data, calculated from memory instead of reading the file again
+        sha512 = hashlib.sha512(np.ascontiguousarray(rx_data)).hexdigest()
 
     ## Write Meta Data to file
     dataset_meta_filename = rx_data_file_name + ".sigmf-meta"
     dataset_meta_file_path = os.path.join(rx_args.rx_recorded_data_path, dataset_meta_filename)
-    meta.tofile(dataset_meta_file_path)  # extension is optional
+    with tracer.span("metadata", station=rx_args.args, record=idx):
+        with open(dataset_meta_file_path, "w") as meta_file:
+            meta_file.write(
+                metadata_template.get_record_metadata(capture_time, sha512, rx_record_status)
+            )
 
     print(dataset_meta_file_path)
 
 
+class SigMFMultiRecordWriter:
+    """Write all records of a variation into a single SigMF dataset"""
+
+    def __init__(self, rx_args, txs_args, general_config, capture_time, metadata_template=None):
+        self.rx_args = rx_args
+        if metadata_template is None:
+            metadata_template = SigMFMetadataTemplate(rx_args, txs_args, general_config)
+        self.metadata_template = metadata_template
+
+        # Check the receive target path is valid, else create folder
+        check_rx_recorded_data_path(rx_args)
+
+        # Open data file once, all records are appended
+        self.rx_data_file_name = get_rx_data_file_name(
+            rx_args, txs_args, general_config, None, capture_time
+        )
+        self.dataset_file_path = os.path.join(
+            rx_args.rx_recorded_data_path, self.rx_data_file_name + ".sigmf-data"
+        )
+        print(self.dataset_file_path)
+        self.data_file = open(self.dataset_file_path, "wb")
+        self.data_hash = hashlib.sha512()
+        # Sample start, sample count, capture time and RX record status of each record
+        self.records = []
+        self.sample_start = 0
+
+    ## Append record to data file
+    def append(self, rx_data, idx, capture_time, rx_record_status=None):
+        with instrumentation.get_tracer().span("write", station=self.rx_args.args, record=idx):
+            rx_data.tofile(self.data_file)
+            self.data_hash.update(np.ascontiguousarray(rx_data))
+        self.records.append((self.sample_start, rx_data.shape[-1], capture_time, rx_record_status))
+        self.sample_start = self.sample_start + rx_data.shape[-1]
+
+    ## Close data file and write meta-data with one capture and annotation per record
+    def close(self):
+        self.data_file.close()
+
+        ## Write Meta Data to file
+        dataset_meta_file_path = os.path.join(
+            self.rx_args.rx_recorded_data_path, self.rx_data_file_name + ".sigmf-meta"
+        )
+        with instrumentation.get_tracer().span("metadata", station=self.rx_args.args):
+            with open(dataset_meta_file_path, "w") as meta_file:
+                meta_file.write(
+                    self.metadata_template.get_multi_record_metadata(
+                        self.records, self.data_hash.hexdigest()
+                    )
+                )
+
+        print(dataset_meta_file_path)
+
+
 # Get tx waveform config from file name
 # example:
 #         waveform name: ["NR_FR1_DL_FDD_SISO_BW-20MHz_CC-1_SCS-30kHz_Mod-64QAM_OFDM_TM3.1.tdms"]},
@@ -24,11 +24,154 @@ from termcolor import colored
 
 # import related functions
 from lib import rf_data_recording_api_def
-from lib import sync_settings
 from lib import read_waveform_config_interface
 from lib import data_format_conversion_lib
+from lib import variations_scheduler
+from lib import variations_normalizer
+from lib import master_clock_rate_planner
+from lib import variation_prefetcher
+from lib import run_rf_replay_data_transmitter
+from lib import instrumentation
 
 
+## Create TX and RX configs of a variation, rate and master clock rate are resolved
+# resolve_master_clock_rate: add master clock rate to device args, disabled to plan the master clock rate
+def create_variation_config(
+    rf_data_recording_api,
+    iteration_config,
+    general_config,
+    campaign_tx_waveforms,
+    resolve_master_clock_rate=True,
+):
+    # get default waveform config
+    wireless_link_parameter_map = general_config["wireless_link_parameter_map"]
+
+    ## Create class list for all TX USRPs, each class has the TX config of related TX signal emitter
+    # initialize the list
+    txs_data_recording_api_config = []
+    for idx in range(1, general_config["num_tx_usrps"] + 1):
+        tx_data_recording_api_config = rf_data_recording_api.TxRFDataRecorderConfig(
+            iteration_config, general_config, idx
+        )
+        tx_data_recording_api_config.campaign_waveforms = campaign_tx_waveforms[idx - 1]
+        txs_data_recording_api_config.append(tx_data_recording_api_config)
+
+    ## Create class list for all RX USRPs, each class has the RX config of related RX signal acquisition
+    # initialize the list
+    rxs_data_recording_api_config = []
+    for idx in range(1, general_config["num_rx_usrps"] + 1):
+        rx_data_recording_api_config = rf_data_recording_api.RxRFDataRecorderConfig(
+            iteration_config, general_config, idx
+        )
+        rxs_data_recording_api_config.append(rx_data_recording_api_config)
+
+    ## Get Tx Waveform config
+    for idx, tx_data_recording_api_config in enumerate(txs_data_recording_api_config):
+        txs_data_recording_api_config[idx] = read_waveform_config_interface.read_tx_waveform_config(
+            tx_data_recording_api_config,
+            wireless_link_parameter_map,
+        )
+
+    ## Update rate of Tx and RX USRPs based on selected rate source
+    (
+        txs_data_recording_api_config,
+        rxs_data_recording_api_config,
+    ) = rf_data_recording_api.update_rate(
+        txs_data_recording_api_config, rxs_data_recording_api_config
+    )
+
+    ## Calculate USRP master clockrate based on given rate
+    if resolve_master_clock_rate:
+        (
+            txs_data_recording_api_config,
+            rxs_data_recording_api_config,
+        ) = rf_data_recording_api.find_proper_master_clock_rate(
+            txs_data_recording_api_config, rxs_data_recording_api_config
+        )
+
+    return txs_data_recording_api_config, rxs_data_recording_api_config
+
+
+## Prepare a variation for execution: configs, linked variations and TX waveform samples
+# It is called on the prefetch worker while the previous variation is on air
+def prepare_variation(
+    rf_data_recording_api,
+    variation_idx,
+    iteration_config,
+    general_config,
+    campaign_tx_waveforms,
+    duplicates_map,
+):
+    tracer = instrumentation.get_tracer()
+    with tracer.span("config_build", variation_idx):
+        txs_data_recording_api_config, rxs_data_recording_api_config = create_variation_config(
+            rf_data_recording_api, iteration_config, general_config, campaign_tx_waveforms
+        )
+        # Link duplicate variations in the meta-data of this recording
+        for rx_data_recording_api_config in rxs_data_recording_api_config:
+            rx_data_recording_api_config.variation_index = variation_idx
+            rx_data_recording_api_config.linked_variations = duplicates_map.get_linked_variations(
+                variation_idx
+            )
+    # Load TX waveform samples from the waveform cache, a new waveform is converted while the
+    # previous variation is on air. Loading a cached waveform only memory-maps it, the samples are
+    # read by the TX station only if the waveform is not held in replay memory yet. Without the
+    # waveform cache, the TX station reads the waveform file only if it uploads it.
+    if general_config["API_operation_mode"] != rf_data_recording_api.API_operation_modes[1]:
+        for tx_data_recording_api_config in txs_data_recording_api_config:
+            if not tx_data_recording_api_config.waveform_cache_path:
+                continue
+            with tracer.span(
+                "waveform_parse", variation_idx, station=tx_data_recording_api_config.args
+            ):
+                tx_data_recording_api_config.tx_waveform = (
+                    run_rf_replay_data_transmitter.read_tx_waveform(
+                        tx_data_recording_api_config.waveform_cache_path,
+                        tx_data_recording_api_config.waveform_path,
+                        tx_data_recording_api_config.waveform_file_name,
+                        tx_data_recording_api_config.waveform_format,
+                        run_rf_replay_data_transmitter.NUM_TX_PORTS,
+                    )
+                )
+    return txs_data_recording_api_config, rxs_data_recording_api_config
+
+
+## Iterate over the scheduled variations, each recorded variation is given with the next recorded
+# variation to prefetch it. The schedule is read one recorded variation ahead, skipped duplicates
+# in between are kept by their index only, so the campaign is not held in memory.
+# Yields (variation_idx, iteration_config, next recorded (variation_idx, iteration_config) or None),
+# the iteration config of a skipped variation is None
+def iterate_variations_with_next_recorded(variations_schedule, is_skipped):
+    recorded_variation = None
+    skipped_variations = []
+    for variation_idx, iteration_config in variations_schedule:
+        if is_skipped(variation_idx):
+            if recorded_variation is None:
+                yield variation_idx, None, None
+            else:
+                skipped_variations.append(variation_idx)
+            continue
+        if recorded_variation is not None:
+            yield recorded_variation[0], recorded_variation[1], (variation_idx, iteration_config)
+            for skipped_variation_idx in skipped_variations:
+                yield skipped_variation_idx, None, None
+            skipped_variations = []
+        recorded_variation = (variation_idx, iteration_config)
+    if recorded_variation is not None:
+        yield recorded_variation[0], recorded_variation[1], None
+    for skipped_variation_idx in skipped_variations:
+        yield skipped_variation_idx, None, None
+
+
+## Record the elapsed time of a campaign stage, returns the start time of the next stage
+def record_stage_time(stage_times, stage, stage_start_time):
+    stage_end_time = time.time()
+    stage_times[stage] = stage_end_time - stage_start_time
+    return stage_end_time
+
+
+## Run the campaign of the given config file
+# Returns the campaign statistics: elapsed time of each stage and recorded variation, rx data size
 def main(rf_data_acq_config_file):
 
     ## Get RF Data Collection API Configuration
@@ -36,6 +179,7 @@ def main(rf_data_acq_config_file):
 
     # Get Time Stamp for statistics
     start_time = time.time()
+    stage_times = {}
     # Create RF data recording API class and load Config
     ## Create all configuration variations - cross product
     print("Load RF Data recorder config ...")
@@ -43,17 +187,19 @@ def main(rf_data_acq_config_file):
     rf_data_recording_api = rf_data_recording_api_def.RFDataRecorderAPI(rf_data_acq_config_file)
     variations_map = rf_data_recording_api.variations_map
     print("")
+    stage_start_time = record_stage_time(stage_times, "load_config", start_time)
 
     # Read general config, it has only a single list
     general_config = variations_map.general_config.iloc[0]
 
-    # get default waveform config
-    wireless_link_parameter_map = general_config["wireless_link_parameter_map"]
     # get enabel console logging flag
     enable_console_logging = data_format_conversion_lib.str2bool(
         general_config["enable_console_logging"]
     )
 
+    # Stage timing spans and counters, exported as JSON-lines trace and Prometheus textfile
+    tracer = instrumentation.configure_tracer(general_config)
+
     ## Get Hw type, subtype and HW ID of TX and RX stations
     # For USRP:
     # HW type = USRP type, mboard ID, i.e. USRP X310, or ....
@@ -64,72 +210,106 @@ def main(rf_data_acq_config_file):
     # We need to know mBoard ID to select the proper master clock rate in advance
     # For TX based on RFNoc graph: Getting USRP SN is supported in Multi-USRP but not on RFNoC graph
     print("Get Tx and RX stations HW info ...")
-    variations_map = rf_data_recording_api.get_hardware_info(variations_map, enable_console_logging)
+    with tracer.span("hardware_discovery"):
+        variations_map = rf_data_recording_api.get_hardware_info(
+            variations_map, enable_console_logging
+        )
     print("")
+    stage_start_time = record_stage_time(stage_times, "hardware_info", stage_start_time)
+
+    # Get waveforms of each TX station, they are uploaded once to the replay memory
+    campaign_tx_waveforms = rf_data_recording_api.get_campaign_tx_waveforms(variations_map)
+    stage_start_time = record_stage_time(stage_times, "tx_waveforms", stage_start_time)
 
     # Create que to store rx data in bytes
     # User will know the data size written to the memory
     rx_data_nbytes_que = Queue()
 
-    for i in range(len(variations_map.variations_product)):
-        print("Variation Number: ", i)
+    ## Reorder variations to minimize the reconfiguration cost between consecutive variations
+    # "config": cross product order of the config file (default), "scheduled": reorder variations
+    variations_order = general_config.get("variations_order", "config")
+    if variations_order not in ("scheduled", "config"):
+        raise Exception("ERROR: Unknown variations order", variations_order)
+    variations_schedule = variations_scheduler.VariationsScheduler(
+        variations_map.variations_product, variations_order == "scheduled"
+    )
+    variations_schedule.print_report()
+    print("")
 
-        ##  Initlize sync settings
-        sync_settings.init()
-        # print sync status
-        if enable_console_logging:
-            print(
-                "Sync Status: Start Data Acquisition called = ",
-                sync_settings.start_rx_data_acquisition_called,
-                " Stop Tx Signal called = ",
-                sync_settings.stop_tx_signal_called,
+    ## Planning pass over all variations in execution order, the configs are created once for:
+    # - duplicate variations with the same effective config after rate resolution, "skip": record
+    #   first variation only, "link": link duplicates in its meta-data, "record": record all
+    # - master clock rate of each device for the whole campaign, a single master clock rate per
+    #   device is used if it gives all requested rates within the tolerance
+    # The master clock rate is not part of the effective config, it is given by the device and rate
+    print("Find duplicate variations and plan master clock rates ...")
+    duplicate_variations = general_config.get("duplicate_variations", "record")
+    duplicates_map = variations_normalizer.VariationsNormalizer(duplicate_variations)
+    master_clock_rate_plan = master_clock_rate_planner.MasterClockRatePlanner(
+        general_config.get("master_clock_rate_tolerance_ppm", 1.0)
+    )
+    for variation_idx, iteration_config in variations_schedule:
+        txs_data_recording_api_config, rxs_data_recording_api_config = create_variation_config(
+            rf_data_recording_api,
+            iteration_config,
+            general_config,
+            campaign_tx_waveforms,
+            resolve_master_clock_rate=False,
+        )
+        if duplicate_variations != "record":
+            duplicates_map.add_variation(
+                variation_idx, txs_data_recording_api_config, rxs_data_recording_api_config
             )
+            if duplicates_map.is_skipped(variation_idx):
+                continue
+        master_clock_rate_plan.add_variation(
+            txs_data_recording_api_config + rxs_data_recording_api_config
+        )
+    master_clock_rate_plan.create_plan()
+    rf_data_recording_api.master_clock_rate_plan = master_clock_rate_plan
+    if duplicate_variations != "record":
+        duplicates_map.print_report()
+    master_clock_rate_plan.print_report()
+    print("")
+    stage_start_time = record_stage_time(stage_times, "planning", stage_start_time)
 
-        ## Get TX and RX RF Data Recorder Config
-        iteration_config = variations_map.variations_product.iloc[i]
+    ## Prepare the next recorded variation while the current variation is on air
+    enable_variation_prefetch = data_format_conversion_lib.str2bool(
+        general_config.get("enable_variation_prefetch", "True")
+    )
+    prefetcher = variation_prefetcher.VariationPrefetcher(
+        lambda variation_idx, iteration_config: prepare_variation(
+            rf_data_recording_api,
+            variation_idx,
+            iteration_config,
+            general_config,
+            campaign_tx_waveforms,
+            duplicates_map,
+        ),
+        enable_variation_prefetch,
+    )
+    # elapsed time of each recorded variation
+    variation_times = {}
 
-        ## Create class list for all TX USRPs, each class has the TX config of related TX signal emitter
-        # initialize the list
-        txs_data_recording_api_config = []
-        for idx in range(1, general_config["num_tx_usrps"] + 1):
-            tx_data_recording_api_config = rf_data_recording_api.TxRFDataRecorderConfig(
-                iteration_config, general_config, idx
-            )
-            txs_data_recording_api_config.append(tx_data_recording_api_config)
-
-        ## Create class list for all RX USRPs, each class has the RX config of related RX signal acquisition
-        # initialize the list
-        rxs_data_recording_api_config = []
-        for idx in range(1, general_config["num_rx_usrps"] + 1):
-            rx_data_recording_api_config = rf_data_recording_api.RxRFDataRecorderConfig(
-                iteration_config, general_config, idx
-            )
-            rxs_data_recording_api_config.append(rx_data_recording_api_config)
-
-        ## Get Tx Waveform config
-        for idx, tx_data_recording_api_config in enumerate(txs_data_recording_api_config):
-            txs_data_recording_api_config[
-                idx
-            ] = read_waveform_config_interface.read_tx_waveform_config(
-                tx_data_recording_api_config,
-                wireless_link_parameter_map,
+    for i, (variation_idx, iteration_config, next_recorded_variation) in enumerate(
+        iterate_variations_with_next_recorded(variations_schedule, duplicates_map.is_skipped)
+    ):
+        print("Variation Number: ", i, ", variation index in config cross product: ", variation_idx)
+        if duplicates_map.is_skipped(variation_idx):
+            print(
+                "Skip variation, same effective config as variation ",
+                duplicates_map.duplicates[variation_idx],
             )
+            continue
+        variation_start_time = time.time()
+        tracer.set_variation(variation_idx)
 
-        ## Update rate of Tx and RX USRPs based on selected rate source
-        (
-            txs_data_recording_api_config,
-            rxs_data_recording_api_config,
-        ) = rf_data_recording_api.update_rate(
-            txs_data_recording_api_config, rxs_data_recording_api_config
-        )
-
-        ## Calculate USRP master clockrate based on given rate
-        (
-            txs_data_recording_api_config,
-            rxs_data_recording_api_config,
-        ) = rf_data_recording_api.find_proper_master_clock_rate(
-            txs_data_recording_api_config, rxs_data_recording_api_config
+        ## Get TX and RX configs of this variation, prepared while the previous variation was on air
+        txs_data_recording_api_config, rxs_data_recording_api_config = prefetcher.get(
+            variation_idx, iteration_config
         )
+        if next_recorded_variation is not None:
+            prefetcher.prefetch(*next_recorded_variation)
 
         ## print iteration config
         if enable_console_logging:
@@ -177,6 +357,19 @@ def main(rf_data_acq_config_file):
                 )
             else:
                 raise Exception("Error: Unknow tx emitters execution order")
+        variation_times[variation_idx] = time.time() - variation_start_time
+        duplicates_map.add_recorded_variation_time(variation_times[variation_idx])
+        tracer.add("variations")
+        tracer.write_metrics()
+    prefetcher.close()
+    tracer.set_variation(None)
+    stage_start_time = record_stage_time(stage_times, "variations", stage_start_time)
+
+    # Close USRP sessions opened during the campaign
+    with tracer.span("teardown"):
+        rf_data_recording_api.close_sessions()
+    instrumentation.close_tracer()
+    record_stage_time(stage_times, "close_sessions", stage_start_time)
 
     # Get end time
     end_time = time.time()
@@ -199,6 +392,29 @@ def main(rf_data_acq_config_file):
         colored(total_rx_data_nbytes / 1e6, "yellow"),
         "MByte",
     )
+    print(
+        "Skipped duplicate variations: ",
+        duplicates_map.get_num_skipped_variations(),
+        ", estimated saved hardware time: ",
+        colored(round(duplicates_map.get_saved_hardware_hours(), 4), "yellow"),
+        "hours",
+    )
+    prefetcher.print_report()
+    print(
+        "Campaign stage times:",
+        ", ".join(
+            stage + ": " + str(round(stage_time, 3)) + " s"
+            for stage, stage_time in stage_times.items()
+        ),
+    )
+
+    return {
+        "num_variations": i + 1,
+        "variation_times": variation_times,
+        "stage_times": stage_times,
+        "total_rx_data_nbytes": total_rx_data_nbytes,
+        "time_elapsed": time_elapsed,
+    }
 
 
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Test - Campaign Benchmarks
+"""
+# Description:
+#   The campaign benchmarks run the shipped config files on simulated USRPs and compare the results
+#   with stored baselines. The test runs the Rx-only scenario and a TX+RX scenario with repeated
+#   waveforms, it checks the per-variation stage times and the regression flags.
+#   No USRP is required.
+#
+import os
+import sys
+import copy
+
+dir_path = os.path.dirname(__file__)
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+from benchmarks import benchmark_campaigns
+
+
+def test_rx_only_scenario():
+    results = benchmark_campaigns.benchmark_scenario(
+        "rx_only", benchmark_campaigns.BENCHMARK_GENERAL_CONFIG
+    )
+    assert results["num_recorded_variations"] == results["num_variations"] > 0
+    assert list(results["stage_times"]) == [
+        "load_config",
+        "hardware_info",
+        "tx_waveforms",
+        "planning",
+        "variations",
+        "close_sessions",
+    ]
+    assert results["rx_data_nbytes"] > 0 and results["rx_data_bytes_per_second"] > 0
+    assert results["peak_rss_mbytes"] > 0
+    assert list(results["variation_stage_times"]) == ["0"]
+    assert results["variation_stage_times"]["0"]["capture"] > 0
+    # Same results are not a regression
+    assert benchmark_campaigns.compare_with_baseline(results, results, 0.25) == []
+
+
+def test_repeated_waveforms_scenario():
+    results = benchmark_campaigns.benchmark_scenario(
+        "1Tx1Rx_waveform_gain_sweep", benchmark_campaigns.BENCHMARK_GENERAL_CONFIG
+    )
+    # 2 TX waveforms x 3 RX gains
+    assert results["num_recorded_variations"] == results["num_variations"] == 6
+    variation_stage_times = results["variation_stage_times"]
+    assert list(variation_stage_times) == [str(idx) for idx in range(6)]
+    assert all(stage_times["capture"] > 0 for stage_times in variation_stage_times.values())
+    # Waveforms of the campaign are uploaded by the first variation only
+    assert [
+        variation
+        for variation, stage_times in variation_stage_times.items()
+        if "waveform_upload" in stage_times
+    ] == ["0"]
+
+
+def test_regressions_beyond_tolerance():
+    baseline = {
+        "variation_time_mean": 1.0,
+        "variation_time_max": 1.0,
+        "total_time": 2.0,
+        "stage_times": {"load_config": 0.01, "variations": 1.0},
+        "variation_stage_times": {"0": {"waveform_upload": 0.5, "capture": 0.4}},
+        "rx_data_bytes_per_second": 100e6,
+        "peak_rss_mbytes": 200.0,
+    }
+    results = copy.deepcopy(baseline)
+    # within tolerance or too small to be compared
+    results["variation_time_mean"] = 1.2
+    results["stage_times"]["load_config"] = 0.05
+    assert benchmark_campaigns.compare_with_baseline(results, baseline, 0.25) == []
+
+    # slower variations, lower throughput and higher memory
+    results["stage_times"]["variations"] = 1.5
+    results["rx_data_bytes_per_second"] = 50e6
+    results["peak_rss_mbytes"] = 300.0
+    results["variation_stage_times"]["0"]["waveform_upload"] = 1.0
+    regressions = benchmark_campaigns.compare_with_baseline(results, baseline, 0.25)
+    assert [metric for metric, _, _ in regressions] == [
+        "rx_data_bytes_per_second",
+        "peak_rss_mbytes",
+        "stage_times.variations",
+        "variation_stage_times.0.waveform_upload",
+    ]
+
+
+if __name__ == "__main__":
+    test_rx_only_scenario()
+    test_repeated_waveforms_scenario()
+    test_regressions_beyond_tolerance()
+    print("Campaign benchmark tests passed")
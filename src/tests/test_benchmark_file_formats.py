@@ -0,0 +1,62 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Test - File Format Benchmarks
+"""
+# Description:
+#   The file format micro-benchmarks measure ops/s, MB/s and allocations of the load, parse and
+#   write paths. The test runs the benchmarks with small records and checks the regression flags,
+#   no USRP is required.
+#
+import os
+import sys
+import numpy as np
+
+dir_path = os.path.dirname(__file__)
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+from benchmarks import benchmark_file_formats
+
+
+def test_time_and_allocations():
+    results = benchmark_file_formats.run_benchmark(
+        lambda size: np.ones(size, dtype=np.complex64), lambda: (1000000,), 8000000
+    )
+    assert results["rounds"] >= benchmark_file_formats.MIN_ROUNDS
+    assert results["min_time"] <= results["median_time"]
+    assert results["ops_per_second"] > 0
+    assert results["mbytes_per_second"] > 0
+    # The array is allocated in the traced call and released after it
+    assert results["alloc_peak_mbytes"] >= 8.0
+    assert results["alloc_retained_mbytes"] < 1.0
+
+
+def test_write_sigmf_and_rfws():
+    results = benchmark_file_formats.benchmark_write_sigmf([1e4])
+    assert list(results) == ["write_rx_recorded_data_in_sigmf[cf32, 0.01 MS]"]
+    assert results["write_rx_recorded_data_in_sigmf[cf32, 0.01 MS]"]["mbytes_per_second"] > 0
+
+    results = benchmark_file_formats.benchmark_rfws()
+    assert all(x["ops_per_second"] > 0 and x["alloc_peak_mbytes"] > 0 for x in results.values())
+
+
+def test_regressions_beyond_tolerance():
+    baseline = {"min_time": 0.01, "alloc_peak_mbytes": 10.0}
+    assert benchmark_file_formats.compare_with_baseline(
+        {"min_time": 0.015, "alloc_peak_mbytes": 10.5}, baseline, 1.0, 0.1
+    ) == []
+    regressions = benchmark_file_formats.compare_with_baseline(
+        {"min_time": 0.03, "alloc_peak_mbytes": 12.0}, baseline, 1.0, 0.1
+    )
+    assert [metric for metric, _, _ in regressions] == ["min_time", "alloc_peak_mbytes"]
+
+
+if __name__ == "__main__":
+    test_time_and_allocations()
+    test_write_sigmf_and_rfws()
+    test_regressions_beyond_tolerance()
+    print("File format benchmark tests passed")
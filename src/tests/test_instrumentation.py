@@ -0,0 +1,119 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Test - Instrumentation
+"""
+# Description:
+#   Stage spans and counters of a campaign are exported as JSON-lines trace and Prometheus textfile.
+#   The test runs a campaign on simulated USRPs and checks the trace, the metrics and the events
+#   merged from a RX worker process, no USRP is required.
+#
+import os
+import sys
+import json
+import tempfile
+import yaml
+
+dir_path = os.path.dirname(__file__)
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+import main_rf_data_recording_api
+from lib import instrumentation
+from lib import simulated_uhd
+from tests import test_simulated_uhd
+
+
+## Run a campaign on simulated USRPs with instrumentation, returns trace events and metrics text
+# rx_parameters_update: variations of the RX station parameters, i.e. {"gain": [10, 20]}
+def run_instrumented_campaign(campaign_path, general_config_update, rx_parameters_update={}):
+    config_file, _ = test_simulated_uhd.create_simulated_campaign_config(
+        os.path.join(src_path, "config", "config_rf_data_recording_api.yaml"), campaign_path
+    )
+    with open(config_file, "r") as file:
+        rf_data_acq_config = yaml.safe_load(file)
+    trace_file = os.path.join(campaign_path, "instrumentation", "trace.jsonl")
+    metrics_file = os.path.join(campaign_path, "instrumentation", "rf_data_recording.prom")
+    rf_data_acq_config["general_config"].update(general_config_update)
+    rf_data_acq_config["general_config"]["instrumentation_trace_file"] = trace_file
+    rf_data_acq_config["general_config"]["instrumentation_metrics_file"] = metrics_file
+    for parameter, values in rx_parameters_update.items():
+        rf_data_acq_config["receivers_config"][0]["Parameters"][parameter]["Values"] = values
+    with open(config_file, "w") as file:
+        yaml.safe_dump(rf_data_acq_config, file, sort_keys=False)
+    try:
+        main_rf_data_recording_api.main(config_file)
+    finally:
+        simulated_uhd.reset()
+    with open(trace_file, "r") as file:
+        events = [json.loads(line) for line in file]
+    with open(metrics_file, "r") as file:
+        metrics_text = file.read()
+    return events, metrics_text
+
+
+def test_campaign_trace_and_metrics():
+    with tempfile.TemporaryDirectory() as campaign_path:
+        events, metrics_text = run_instrumented_campaign(campaign_path, {})
+    assert not instrumentation.get_tracer().enabled
+
+    # All stages of the variation are traced
+    stages = set(event["stage"] for event in events if event["type"] == "span")
+    assert stages == set(instrumentation.STAGES)
+    capture_spans = [event for event in events if event.get("stage") == "capture"]
+    assert [event["record"] for event in capture_spans] == [0, 1]
+    assert all(event["variation"] == 0 and event["duration"] > 0 for event in capture_spans)
+
+    # Counters: 2 records of 1 RX station
+    counters = {}
+    for event in events:
+        if event["type"] == "counter":
+            counters[event["name"]] = counters.get(event["name"], 0) + event["value"]
+    assert counters["rx_records"] == 2
+    assert counters["rx_bytes"] > 0 and counters["tx_upload_bytes"] > 0
+    assert counters["variations"] == 1
+
+    # Prometheus textfile
+    assert "# TYPE rf_data_recording_stage_seconds summary" in metrics_text
+    assert 'rf_data_recording_stage_seconds_count{stage="capture"} 2' in metrics_text
+    assert "rf_data_recording_variations_total 1" in metrics_text
+    assert 'rf_data_recording_rx_records_total{station="' in metrics_text
+
+
+def test_events_merged_from_rx_worker_process():
+    with tempfile.TemporaryDirectory() as campaign_path:
+        events, metrics_text = run_instrumented_campaign(
+            campaign_path, {"rx_worker_type": "process"}
+        )
+    capture_spans = [event for event in events if event.get("stage") == "capture"]
+    assert len(capture_spans) == 2
+    # Events of the worker process are assigned to the current variation of the campaign
+    assert all(event["variation"] == 0 for event in capture_spans)
+    assert capture_spans[0]["thread"] == "MainThread"
+    assert 'rf_data_recording_stage_seconds_count{stage="write"} 2' in metrics_text
+
+
+def test_disabled_tracer_and_labels():
+    tracer = instrumentation.Tracer()
+    with tracer.span("capture"):
+        pass
+    tracer.add("rx_records")
+    assert tracer.stage_times == {} and tracer.counters == {}
+
+    tracer = instrumentation.Tracer(collect_events=True)
+    tracer.add("rx_bytes", 8, station='addr="192.168.100.2"')
+    assert (
+        'rf_data_recording_rx_bytes_total{station="addr=\\"192.168.100.2\\""} 8'
+        in tracer.get_metrics_text()
+    )
+    assert len(tracer.drain_events()) == 1 and tracer.drain_events() == []
+
+
+if __name__ == "__main__":
+    test_campaign_trace_and_metrics()
+    test_events_merged_from_rx_worker_process()
+    test_disabled_tracer_and_labels()
+    print("Instrumentation tests passed")
@@ -0,0 +1,83 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Test - Master Clock Rate Planner
+"""
+# Description:
+#   The master clock rate of each device is planned for the whole campaign to avoid device reopenings.
+#   No USRP is required.
+#
+import os
+import sys
+from types import SimpleNamespace
+
+dir_path = os.path.dirname(__file__)
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+from lib import master_clock_rate_planner
+from lib import rf_data_recording_api_def
+
+x410_args = "type=x4xx,addr=192.168.40.2"
+x310_args = "type=x300,addr=192.168.50.2"
+
+
+# Add variations with the given rates of a single device in execution order
+def create_plan(args, hw_type, rates):
+    master_clock_rate_plan = master_clock_rate_planner.MasterClockRatePlanner(1.0)
+    for rate in rates:
+        station_config = SimpleNamespace(args=args, hw_type=hw_type, rate=rate)
+        master_clock_rate_plan.add_variation([station_config])
+    master_clock_rate_plan.create_plan()
+    return master_clock_rate_plan
+
+
+def test_per_variation_master_clock_rate_unchanged():
+    # MCR with the lowest decimation error, as selected per variation
+    assert master_clock_rate_planner.select_master_clock_rate(30.72e6, "X410") == 245.76e6
+    assert master_clock_rate_planner.select_master_clock_rate(25e6, "X410") == 250e6
+    assert master_clock_rate_planner.select_master_clock_rate(30.72e6, "X310") == 184.32e6
+    assert master_clock_rate_planner.select_master_clock_rate(30.72e6, "B210") is None
+    assert (
+        rf_data_recording_api_def.RFDataRecorderAPI.calculate_master_clock_rate(
+            20e6, "X310", x310_args
+        )
+        == x310_args + ",master_clock_rate=200e6"
+    )
+
+
+def test_single_master_clock_rate_for_all_rates():
+    # All rates are given by even decimation factors of 245.76 MHz
+    rates = [15.36e6, 30.72e6, 61.44e6, 15.36e6]
+    master_clock_rate_plan = create_plan(x410_args, "X410", rates)
+
+    assert set(master_clock_rate_plan.plan[x410_args].values()) == {245.76e6}
+    assert master_clock_rate_plan.count_device_reopenings() == 0
+
+
+def test_rates_grouped_by_master_clock_rate():
+    # 25 MHz and 125 MHz need 250 MHz, 30.72 MHz needs 245.76 MHz
+    rates = [25e6, 30.72e6, 125e6, 30.72e6]
+    master_clock_rate_plan = create_plan(x410_args, "X410", rates)
+
+    assert master_clock_rate_plan.get_master_clock_rate(x410_args, 25e6) == 250e6
+    assert master_clock_rate_plan.get_master_clock_rate(x410_args, 125e6) == 250e6
+    assert master_clock_rate_plan.get_master_clock_rate(x410_args, 30.72e6) == 245.76e6
+    assert master_clock_rate_plan.count_device_reopenings() == 3
+    # Only rate changes are kept, not the variations
+    assert master_clock_rate_plan.requested_rates[x410_args] == {25e6, 30.72e6, 125e6}
+    assert sum(master_clock_rate_plan.rate_changes[x410_args].values()) == 3
+
+    # Variation 2 is not executed, i.e. skipped as duplicate, it is not added
+    master_clock_rate_plan = create_plan(x410_args, "X410", [25e6, 30.72e6, 30.72e6])
+    assert master_clock_rate_plan.count_device_reopenings() == 1
+
+
+if __name__ == "__main__":
+    test_per_variation_master_clock_rate_unchanged()
+    test_single_master_clock_rate_for_all_rates()
+    test_rates_grouped_by_master_clock_rate()
+    print("Master clock rate planner tests passed")
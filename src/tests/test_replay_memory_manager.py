@@ -0,0 +1,183 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Test - Replay Memory Manager
+"""
+# Description:
+#   The replay memory manager packs several waveforms into word-aligned regions of the replay memory.
+#   Waveforms are identified by their file, the samples of a resident waveform are not read and
+#   the next variation with the same waveform does not upload it again. No USRP is required.
+#
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+import numpy as np
+
+dir_path = os.path.dirname(__file__)
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+from lib import replay_memory_manager
+from lib import run_rf_replay_data_transmitter
+from lib import simulated_uhd
+from tests import test_instrumentation
+
+
+def test_waveforms_packed_in_aligned_regions():
+    replay_memory = replay_memory_manager.ReplayMemoryManager(mem_size=1024, word_size=64)
+
+    addr_lte = replay_memory.allocate("lte", 100)
+    addr_nr = replay_memory.allocate("nr", 300)
+    addr_radar = replay_memory.allocate("radar", 64)
+
+    assert (addr_lte, addr_nr, addr_radar) == (0, 128, 448)
+    # Switching between resident waveforms does not need an upload
+    # Region sizes are whole words
+    assert replay_memory.get_region("lte") == (0, 128)
+    assert replay_memory.get_region("nr") == (128, 320)
+    assert replay_memory.get_region("wifi") is None
+    assert replay_memory.has_free_space(512)
+    assert not replay_memory.has_free_space(600)
+
+
+def test_least_recently_used_waveform_evicted():
+    replay_memory = replay_memory_manager.ReplayMemoryManager(mem_size=1024, word_size=64)
+    replay_memory.allocate("lte", 512)
+    replay_memory.allocate("nr", 512)
+    # lte was played last, nr is evicted
+    replay_memory.get_region("lte")
+
+    addr_radar = replay_memory.allocate("radar", 256)
+
+    assert addr_radar == 512
+    assert replay_memory.get_region("nr") is None
+    assert replay_memory.get_region("lte") == (0, 512)
+    assert replay_memory.num_evictions == 1
+
+    # Waveform larger than replay memory
+    allocation_failed = False
+    try:
+        replay_memory.allocate("large", 2048)
+    except Exception:
+        allocation_failed = True
+    assert allocation_failed
+
+
+def test_resident_waveform_not_read():
+    graph = simulated_uhd.rfnoc.RfnocGraph("type=x4xx,addr=192.168.40.2")
+    args = SimpleNamespace(
+        radio_id=0, radio_chan=0, replay_id=0, replay_chan=0, duc_id=0, duc_chan=0
+    )
+    tx_graph_chain = run_rf_replay_data_transmitter.setup_tx_graph_chain(
+        graph, args, simulated_uhd, 1
+    )
+    replay_ctrl = tx_graph_chain.replay_ctrl
+    replay_memory = replay_memory_manager.ReplayMemoryManager(
+        replay_ctrl.get_mem_size(), replay_ctrl.get_word_size()
+    )
+    loaded_waveforms = []
+
+    def load_tx_waveform():
+        loaded_waveforms.append(True)
+        return np.ones((1, 1000), dtype=np.complex64)
+
+    def get_region(waveform_path):
+        waveform_key = run_rf_replay_data_transmitter.get_tx_waveform_key(
+            waveform_path, "tx_waveform", "matlab", 1
+        )
+        return run_rf_replay_data_transmitter.get_replay_memory_region(
+            replay_memory,
+            replay_ctrl,
+            tx_graph_chain.tx_streamer,
+            simulated_uhd.types.TXMetadata(),
+            waveform_key,
+            load_tx_waveform,
+            0,
+            4,
+        )
+
+    with tempfile.TemporaryDirectory() as waveform_path:
+        waveform_file = os.path.join(waveform_path, "tx_waveform.mat")
+        with open(waveform_file, "wb") as file:
+            file.write(b"waveform")
+        region = get_region(waveform_path)
+        assert get_region(waveform_path) == region
+        assert len(loaded_waveforms) == 1
+
+        # Changed waveform file is uploaded again
+        with open(waveform_file, "wb") as file:
+            file.write(b"changed waveform")
+        get_region(waveform_path)
+        assert len(loaded_waveforms) == 2
+
+
+def test_waveform_recorded_in_whole_words():
+    graph = simulated_uhd.rfnoc.RfnocGraph("type=x4xx,addr=192.168.40.2")
+    args = SimpleNamespace(
+        radio_id=0, radio_chan=0, replay_id=0, replay_chan=0, duc_id=0, duc_chan=0
+    )
+    tx_graph_chain = run_rf_replay_data_transmitter.setup_tx_graph_chain(
+        graph, args, simulated_uhd, 1
+    )
+    replay_ctrl = tx_graph_chain.replay_ctrl
+    word_size = replay_ctrl.get_word_size()
+    replay_memory = replay_memory_manager.ReplayMemoryManager(replay_ctrl.get_mem_size(), word_size)
+    # Waveform length is not a multiple of the word size: 4 bytes per sample
+    num_samples = 1001
+    assert num_samples * 4 % word_size != 0
+
+    replay_buff_addr, replay_buff_size = run_rf_replay_data_transmitter.get_replay_memory_region(
+        replay_memory,
+        replay_ctrl,
+        tx_graph_chain.tx_streamer,
+        simulated_uhd.types.TXMetadata(),
+        "odd_waveform",
+        lambda: np.ones((1, num_samples), dtype=np.complex64),
+        0,
+        4,
+    )
+
+    # Record and play a whole number of words holding all waveform samples
+    assert replay_buff_size % word_size == 0
+    assert replay_buff_size == replay_memory.align(num_samples * 4)
+    assert replay_memory.get_region("odd_waveform") == (replay_buff_addr, replay_buff_size)
+    assert replay_ctrl.get_record_size(0) == replay_buff_size
+    assert replay_ctrl.get_record_fullness(0) == replay_buff_size
+    # Waveform is padded with zero samples
+    recorded_samples = replay_ctrl.memory[replay_buff_addr]
+    assert len(recorded_samples) == replay_buff_size // 4
+    assert np.all(recorded_samples[:num_samples] != 0)
+    assert np.all(recorded_samples[num_samples:] == 0)
+
+
+def test_upload_skipped_for_same_waveform():
+    # Two variations with the same TX waveform: RX gain sweep
+    with tempfile.TemporaryDirectory() as campaign_path:
+        events, metrics_text = test_instrumentation.run_instrumented_campaign(
+            campaign_path, {}, {"gain": [10, 20]}
+        )
+    tx_upload_bytes = {}
+    for event in events:
+        if event["type"] == "counter" and event["name"] == "variations":
+            tx_upload_bytes.setdefault(event["variation"], 0)
+        if event["type"] == "counter" and event["name"] == "tx_upload_bytes":
+            tx_upload_bytes[event["variation"]] = (
+                tx_upload_bytes.get(event["variation"], 0) + event["value"]
+            )
+    # Waveform is uploaded by the first variation only
+    first_variation, second_variation = list(tx_upload_bytes)
+    assert tx_upload_bytes[first_variation] > 0
+    assert tx_upload_bytes[second_variation] == 0
+
+
+if __name__ == "__main__":
+    test_waveforms_packed_in_aligned_regions()
+    test_least_recently_used_waveform_evicted()
+    test_resident_waveform_not_read()
+    test_waveform_recorded_in_whole_words()
+    test_upload_skipped_for_same_waveform()
+    print("Replay memory manager tests passed")
@@ -0,0 +1,80 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Test - RFWS Waveform Config
+"""
+# Description:
+#   The RFWS waveform config is parsed once into an index of parameter names, the extracted
+#   waveform config is cached on disk and the IQ rate is read from the TDMS metadata only.
+#   The test uses the NR and LTE waveforms of the API, no USRP is required.
+#
+import os
+import sys
+import tempfile
+import xml.etree.cElementTree as ET
+
+dir_path = os.path.dirname(__file__)
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+from lib import read_waveform_config_interface
+from lib import read_waveform_data_interface
+from lib import waveform_cache
+
+waveforms = [
+    ("waveforms/nr", "NR_FR1_UL_All_SISO_BW-20MHz_CC-1_SCS-30kHz_Mod-64QAM_OFDM_enabled_PTRS"),
+    ("waveforms/lte", "LTE_FDD_DL_10MHz_CC-1_E-UTRA_E-TM2"),
+]
+
+
+def test_rfws_index_matches_xpath_search():
+    for waveform_path, waveform_file_name in waveforms:
+        waveform_file_path = os.path.join(src_path, waveform_path, waveform_file_name + ".rfws")
+        rfws_index = read_waveform_config_interface.create_rfws_index(waveform_file_path)
+
+        root = ET.parse(waveform_file_path).getroot()
+        for name in ["factory", "Modulation Type", "Bandwidth (Hz)", "Bandwidth", "CellID"]:
+            texts = [element.text for element in root.findall(".//*[@name='" + name + "']")]
+            assert rfws_index.get(name, []) == texts
+
+
+def test_waveform_config_extracted_once():
+    with tempfile.TemporaryDirectory() as cache_path:
+        for waveform_path, waveform_file_name in waveforms:
+            waveform_path = os.path.join(src_path, waveform_path)
+            waveform_config_src = read_waveform_config_interface.read_tdms_waveform_config(
+                waveform_path, waveform_file_name
+            )
+            for load in range(3):
+                assert (
+                    read_waveform_config_interface.read_tdms_waveform_config(
+                        waveform_path, waveform_file_name, cache_path
+                    )
+                    == waveform_config_src
+                )
+
+        cache = waveform_cache.get_waveform_cache(cache_path)
+        assert cache.num_waveform_config_extractions == len(waveforms)
+
+
+def test_tdms_waveform_info_from_metadata():
+    for waveform_path, waveform_file_name in waveforms:
+        waveform_path = os.path.join(src_path, waveform_path)
+        waveform_info = read_waveform_data_interface.read_waveform_info_tdms(
+            waveform_path, waveform_file_name
+        )
+        tx_data_complex, waveform_IQ_rate = read_waveform_data_interface.read_waveform_data_tdms(
+            waveform_path, waveform_file_name
+        )
+        assert waveform_info["waveform_IQ_rate"] == waveform_IQ_rate
+        assert waveform_info["num_samples"] == len(tx_data_complex)
+
+
+if __name__ == "__main__":
+    test_rfws_index_matches_xpath_search()
+    test_waveform_config_extracted_once()
+    test_tdms_waveform_info_from_metadata()
+    print("RFWS waveform config tests passed")
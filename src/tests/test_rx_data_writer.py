@@ -0,0 +1,99 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Test - RX Data Writer
+"""
+# Description:
+#   RX records are written in a writer thread while the next record is captured into a free buffer
+#   of the record buffer pool. The test checks buffer release, error handling and draining of the
+#   writer queue, no USRP is required.
+#
+import os
+import sys
+import time
+import threading
+import numpy as np
+
+dir_path = os.path.dirname(__file__)
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+from lib import rx_data_writer
+
+NUM_BUFFERS = 2
+RECORD_SHAPE = (1, 1000)
+
+
+## Capture records into the buffers of the writer: record number as samples
+def submit_records(rx_writer, num_records):
+    for record_idx in range(num_records):
+        buffer_idx, rx_data = rx_writer.acquire_buffer()
+        rx_data[:] = record_idx
+        rx_writer.submit(buffer_idx, record_idx, time.time(), 0.0)
+
+
+def test_close_drains_queue():
+    written_records = []
+
+    def write_function(rx_data, record_idx, capture_time, rx_record_status):
+        # Slow disk: the writer is behind the capture
+        time.sleep(0.01)
+        written_records.append((record_idx, rx_data[0, 0].real))
+
+    buffer_pool = rx_data_writer.RxRecordBufferPool(NUM_BUFFERS, RECORD_SHAPE, np.complex64)
+    rx_writer = rx_data_writer.RxDataWriter(buffer_pool, write_function)
+    submit_records(rx_writer, 5)
+    rx_writer.close()
+
+    # All records are written in order from their own buffer contents
+    assert written_records == [(record_idx, record_idx) for record_idx in range(5)]
+    assert buffer_pool.free_buffers.qsize() == NUM_BUFFERS
+    assert not rx_writer.thread.is_alive()
+    assert len(rx_writer.stage_timings["write"]) == 5
+
+
+def test_writer_error_releases_buffers():
+    records_submitted = threading.Event()
+    written_records = []
+
+    def write_function(rx_data, record_idx, capture_time, rx_record_status):
+        records_submitted.wait(timeout=5)
+        if record_idx == 0:
+            raise OSError("No space left on device")
+        written_records.append(record_idx)
+
+    buffer_pool = rx_data_writer.RxRecordBufferPool(NUM_BUFFERS, RECORD_SHAPE, np.complex64)
+    rx_writer = rx_data_writer.RxDataWriter(buffer_pool, write_function)
+    submit_records(rx_writer, NUM_BUFFERS)
+    records_submitted.set()
+
+    # Buffers are released by the writer thread, the record after the error is not written
+    start_time = time.time()
+    while buffer_pool.free_buffers.qsize() < NUM_BUFFERS and time.time() - start_time < 5:
+        time.sleep(0.001)
+    assert buffer_pool.free_buffers.qsize() == NUM_BUFFERS
+    assert written_records == []
+
+    # Error of the writer is raised on the next capture
+    try:
+        rx_writer.acquire_buffer()
+        assert False, "Writer error expected"
+    except Exception as error:
+        assert error.args == ("ERROR: Writing Rx recorded data failed",)
+        assert isinstance(error.__cause__, OSError)
+
+    try:
+        rx_writer.close()
+        assert False, "Writer error expected"
+    except Exception as error:
+        assert isinstance(error.__cause__, OSError)
+    assert not rx_writer.thread.is_alive()
+
+
+if __name__ == "__main__":
+    test_close_drains_queue()
+    test_writer_error_releases_buffers()
+    print("RX data writer tests passed")
@@ -0,0 +1,164 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Test - RX Stream Errors and Record Retry
+"""
+# Description:
+#   The RX metadata of each recv call is checked, overflows, sequence errors and timeouts are
+#   counted per record and device, a corrupted record is captured again within the retry budget.
+#   The test injects errors into simulated RX streams and checks the RX record status in the SigMF
+#   annotation of a campaign, no USRP is required.
+#
+import os
+import sys
+import glob
+import json
+import tempfile
+import numpy as np
+
+dir_path = os.path.dirname(__file__)
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+import main_rf_data_recording_api
+from lib import simulated_uhd
+from lib import rx_data_writer
+from lib import run_rf_data_recorder
+from tests import test_simulated_uhd
+
+NUM_RX_SAMPS = 5000
+
+
+class FaultyRxStreamer:
+    """Simulated RX streamer with an error in the first recv call of the first captures"""
+
+    # error: "overflow" drops the samples of the recv call, "late" is reported without data loss,
+    # "timeout" stops the stream before any sample is received
+    def __init__(self, rx_streamer, error, num_faulty_captures):
+        self.rx_streamer = rx_streamer
+        self.error = error
+        self.num_faulty_captures = num_faulty_captures
+        self.inject_error = False
+        # Stream modes of all stream commands
+        self.stream_modes = []
+
+    def get_max_num_samps(self):
+        return self.rx_streamer.get_max_num_samps()
+
+    def issue_stream_cmd(self, stream_cmd):
+        self.stream_modes.append(stream_cmd.stream_mode)
+        if stream_cmd.stream_mode == simulated_uhd.types.StreamMode.num_done:
+            self.inject_error = self.num_faulty_captures > 0
+            self.num_faulty_captures = self.num_faulty_captures - 1
+        self.rx_streamer.issue_stream_cmd(stream_cmd)
+
+    def recv(self, buffer, metadata, timeout=0.1):
+        if not self.inject_error:
+            return self.rx_streamer.recv(buffer, metadata, timeout)
+        self.inject_error = False
+        if self.error == "late":
+            metadata.error_code = simulated_uhd.types.RXMetadataErrorCode.late
+            return 0
+        if self.error == "timeout":
+            self.rx_streamer.issue_stream_cmd(
+                simulated_uhd.types.StreamCMD(simulated_uhd.types.StreamMode.stop_cont)
+            )
+            return self.rx_streamer.recv(buffer, metadata, timeout)
+        simulated_uhd.configure(overflow_probability=1.0)
+        try:
+            return self.rx_streamer.recv(buffer, metadata, timeout)
+        finally:
+            simulated_uhd.configure(overflow_probability=0.0)
+
+
+## Capture a record with injected errors, returns capture engine, RX record status and written data
+def capture_faulty_record(error, num_faulty_captures, max_retries):
+    usrp = simulated_uhd.usrp.MultiUSRP("type=x4xx,addr=192.168.100.2")
+    st_args = simulated_uhd.usrp.StreamArgs("fc32", "sc16")
+    st_args.channels = [0]
+    rx_streamer = FaultyRxStreamer(usrp.get_rx_stream(st_args), error, num_faulty_captures)
+    capture_engine = run_rf_data_recorder.RxCaptureEngine(simulated_uhd, usrp, rx_streamer, [0])
+    written_records = []
+    buffer_pool = rx_data_writer.RxRecordBufferPool(2, (1, NUM_RX_SAMPS), np.complex64)
+    rx_writer = rx_data_writer.RxDataWriter(
+        buffer_pool,
+        lambda rx_data, idx, capture_time, status: written_records.append((status, rx_data.copy())),
+    )
+    simulated_uhd.configure(realtime_factor=0.0)
+    try:
+        run_rf_data_recorder.capture_rx_record(capture_engine, rx_writer, 0, None, max_retries)
+    finally:
+        rx_writer.close()
+        simulated_uhd.reset()
+    return capture_engine, written_records[0][0], written_records[0][1]
+
+
+def test_record_captured_again_after_overflow():
+    capture_engine, rx_record_status, rx_data = capture_faulty_record("overflow", 1, 2)
+    # Samples of the overflow are dropped, the first capture ends with a timeout
+    assert rx_record_status == {
+        "errors": {"overflow": 1, "sequence_error": 0, "timeout": 1, "late": 0, "other": 0},
+        "retries": 1,
+        "corrupted": False,
+        "num_received_samps": NUM_RX_SAMPS,
+    }
+    assert capture_engine.stream_errors["overflow"] == 1
+    assert capture_engine.num_record_retries == 1
+
+
+def test_retry_budget_exhausted():
+    # Short record is written with zeros for the dropped samples and marked as corrupted
+    capture_engine, rx_record_status, rx_data = capture_faulty_record("overflow", 3, 2)
+    assert rx_record_status["errors"]["overflow"] == 3
+    assert rx_record_status["errors"]["timeout"] == 3
+    assert rx_record_status["retries"] == 2 and rx_record_status["corrupted"]
+    num_received_samps = rx_record_status["num_received_samps"]
+    assert 0 < num_received_samps < NUM_RX_SAMPS
+    assert not np.any(rx_data[:, num_received_samps:])
+
+    # Complete record with errors is written and marked as corrupted
+    capture_engine, rx_record_status, rx_data = capture_faulty_record("late", 1, 0)
+    assert rx_record_status["errors"]["late"] == 1
+    assert rx_record_status["retries"] == 0 and rx_record_status["corrupted"]
+    assert rx_record_status["num_received_samps"] == NUM_RX_SAMPS
+    # The stream is stopped, samples in flight do not leak into the next record
+    assert capture_engine.rx_streamer.stream_modes == [
+        simulated_uhd.types.StreamMode.num_done,
+        simulated_uhd.types.StreamMode.stop_cont,
+    ]
+
+    # No samples received at all
+    try:
+        capture_faulty_record("timeout", 1, 0)
+        assert False, "Error is not raised"
+    except Exception as error:
+        assert "Rx timeout" in str(error.args[0])
+
+
+def test_rx_record_status_in_sigmf_annotation():
+    with tempfile.TemporaryDirectory() as campaign_path:
+        config_file, rx_recorded_data_path = test_simulated_uhd.create_simulated_campaign_config(
+            os.path.join(src_path, "config", "config_rf_data_recording_api.yaml"), campaign_path
+        )
+        try:
+            main_rf_data_recording_api.main(config_file)
+        finally:
+            simulated_uhd.reset()
+        meta_files = sorted(glob.glob(os.path.join(rx_recorded_data_path, "*.sigmf-meta")))
+        assert len(meta_files) == 2
+        for meta_file in meta_files:
+            with open(meta_file, "r") as file:
+                annotation = json.load(file)["annotations"][0]
+            assert annotation["rx_record_status"]["retries"] == 0
+            assert not annotation["rx_record_status"]["corrupted"]
+            assert not any(annotation["rx_record_status"]["errors"].values())
+
+
+if __name__ == "__main__":
+    test_record_captured_again_after_overflow()
+    test_retry_budget_exhausted()
+    test_rx_record_status_in_sigmf_annotation()
+    print("RX record retry tests passed")
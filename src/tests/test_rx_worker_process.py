@@ -0,0 +1,173 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Test - RX Worker Process
+"""
+# Description:
+#   The RF data recorder of a RX station can run in its own process, record buffers are allocated
+#   in the worker. The test runs a fake recorder in the worker process and checks the sync, byte
+#   counts, reuse of the record buffers across variations and error handling. A campaign with
+#   simulated devices checks the samples recorded in the worker process, no USRP is required.
+#
+import os
+import sys
+import glob
+import tempfile
+from queue import Queue
+from types import SimpleNamespace
+import numpy as np
+import yaml
+
+dir_path = os.path.dirname(__file__)
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+import main_rf_data_recording_api
+from lib import rx_worker_process
+from lib import simulated_uhd
+from lib import rx_data_writer
+from lib import run_rf_data_recorder
+from lib import sync_settings
+from tests import test_simulated_uhd
+
+# General config of the fake recorder, no device is opened
+GENERAL_CONFIG = {"device_backend": "simulated"}
+
+
+def create_rx_args(fail=False):
+    return SimpleNamespace(
+        args="type=x4xx,addr=192.168.100.2",
+        channels=[0],
+        duration=0.001,
+        rate=1e6,
+        rx_recorded_data_type="cf32_le",
+        fail=fail,
+    )
+
+
+# Fake recorder: fill the record buffers with the record number, no USRP is used
+# The address of the record memory is sent before the byte count
+def record_in_worker_buffers(
+    rx_args,
+    txs_args,
+    general_config,
+    rx_data_nbytes_que,
+    variation_sync,
+    session_pool,
+    record_memory,
+):
+    shape, dtype = run_rf_data_recorder.get_rx_record_layout(rx_args)
+    buffer_pool = rx_data_writer.RxRecordBufferPool(
+        run_rf_data_recorder.NUM_RX_RECORD_BUFFERS, shape, dtype, record_memory
+    )
+    variation_sync.wait_for_rx_start()
+    rx_data_nbytes_que.put(record_memory.ctypes.data)
+    try:
+        for record_idx, rx_data in enumerate(buffer_pool.buffers):
+            rx_data[:] = record_idx + 1
+    finally:
+        variation_sync.rx_data_acquisition_done()
+    if rx_args.fail:
+        raise Exception("ERROR: Writing Rx recorded data failed")
+    rx_data_nbytes_que.put(sum(rx_data.nbytes for rx_data in buffer_pool.buffers))
+
+
+def test_recording_in_worker_process():
+    rx_worker = rx_worker_process.RxWorkerProcess(record_in_worker_buffers)
+    rx_data_nbytes_que = Queue()
+    try:
+        record_memory_addresses = []
+        for variation in range(2):
+            variation_sync = sync_settings.VariationSync(1, 1)
+            variation_sync.tx_signal_started()
+            rx_worker.record(
+                create_rx_args(), [], GENERAL_CONFIG, rx_data_nbytes_que, variation_sync
+            )
+
+            # TX is stopped by the RX station in the worker process
+            assert variation_sync.stop_tx_signal.is_set()
+            record_memory_addresses.append(rx_data_nbytes_que.get())
+            assert rx_data_nbytes_que.get() == 2 * 1000 * 8
+        # Record buffers of the worker are reused across variations
+        assert record_memory_addresses[0] == record_memory_addresses[1]
+    finally:
+        rx_worker.close()
+    assert not rx_worker.process.is_alive()
+
+
+def test_worker_errors_and_aborted_variation():
+    rx_worker = rx_worker_process.RxWorkerProcess(record_in_worker_buffers)
+    rx_data_nbytes_que = Queue()
+    try:
+        # Recorder fails in the worker process
+        variation_sync = sync_settings.VariationSync(0, 1)
+        try:
+            rx_worker.record(
+                create_rx_args(True), [], GENERAL_CONFIG, rx_data_nbytes_que, variation_sync
+            )
+            assert False, "Worker error is not raised"
+        except Exception as error:
+            assert "Writing Rx recorded data failed" in error.args[2]
+        rx_data_nbytes_que.get()
+
+        # TX station failed: the worker does not start the data acquisition
+        variation_sync = sync_settings.VariationSync(1, 1)
+        variation_sync.abort()
+        try:
+            rx_worker.record(
+                create_rx_args(), [], GENERAL_CONFIG, rx_data_nbytes_que, variation_sync
+            )
+            assert False, "Aborted variation is not raised"
+        except Exception as error:
+            assert "aborted" in error.args[0]
+        assert rx_data_nbytes_que.empty()
+
+        # The worker is still usable for the next variation
+        rx_worker.record(
+            create_rx_args(),
+            [],
+            GENERAL_CONFIG,
+            rx_data_nbytes_que,
+            sync_settings.VariationSync(0, 1),
+        )
+        rx_data_nbytes_que.get()
+        assert rx_data_nbytes_que.get() == 2 * 1000 * 8
+    finally:
+        rx_worker.close()
+
+
+def test_simulated_variation_in_worker_process():
+    noise_level = 0.1
+    with tempfile.TemporaryDirectory() as campaign_path:
+        config_file, rx_recorded_data_path = test_simulated_uhd.create_simulated_campaign_config(
+            os.path.join(src_path, "config", "config_rf_data_recording_api.yaml"), campaign_path
+        )
+        with open(config_file, "r") as file:
+            rf_data_acq_config = yaml.safe_load(file)
+        rf_data_acq_config["general_config"]["rx_worker_type"] = "process"
+        rf_data_acq_config["general_config"]["simulated_device_noise_level"] = noise_level
+        with open(config_file, "w") as file:
+            yaml.safe_dump(rf_data_acq_config, file, sort_keys=False)
+        try:
+            main_rf_data_recording_api.main(config_file)
+        finally:
+            simulated_uhd.reset()
+
+        rx_data_files = sorted(glob.glob(os.path.join(rx_recorded_data_path, "*.sigmf-data")))
+        assert len(rx_data_files) == 2
+        for rx_data_file in rx_data_files:
+            rx_data = np.fromfile(rx_data_file, dtype=np.complex64)
+            # The simulated air is not shared with the worker process, only noise is received
+            # at the noise level of the general config
+            rx_data_rms = np.sqrt(np.mean(np.abs(rx_data) ** 2))
+            assert 0.9 * noise_level < rx_data_rms < 1.1 * noise_level
+
+
+if __name__ == "__main__":
+    test_recording_in_worker_process()
+    test_worker_errors_and_aborted_variation()
+    test_simulated_variation_in_worker_process()
+    print("RX worker process tests passed")
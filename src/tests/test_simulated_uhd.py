@@ -0,0 +1,172 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Test - Simulated UHD Device Backend
+"""
+# Description:
+#   The simulated device backend replaces the USRPs, waveforms played by the simulated Replay block
+#   are received by the simulated RX streams. The test runs a full campaign and checks the recorded
+#   loopback signal in cf32 and ci16, coerced values and injected overflows, no USRP is required.
+#
+import os
+import sys
+import glob
+import json
+import tempfile
+from types import SimpleNamespace
+import numpy as np
+import yaml
+
+dir_path = os.path.dirname(__file__)
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+import main_rf_data_recording_api
+from lib import simulated_uhd
+from lib import waveform_cache
+from lib import run_rf_data_recorder
+
+
+## Create campaign config for simulated devices based on the given config file
+def create_simulated_campaign_config(config_file, campaign_path):
+    with open(config_file, "r") as file:
+        rf_data_acq_config = yaml.safe_load(file)
+    general_config = rf_data_acq_config["general_config"]
+    general_config["rx_recorded_data_path"] = os.path.join(campaign_path, "recorded-data")
+    general_config["waveform_cache_path"] = os.path.join(campaign_path, "waveform-cache")
+    general_config["device_backend"] = "simulated"
+    general_config["nrecords"] = 2
+    simulated_config_file = os.path.join(campaign_path, "config_simulated.yaml")
+    with open(simulated_config_file, "w") as file:
+        yaml.safe_dump(rf_data_acq_config, file, sort_keys=False)
+    return simulated_config_file, general_config["rx_recorded_data_path"]
+
+
+def test_campaign_with_simulated_devices():
+    with tempfile.TemporaryDirectory() as campaign_path:
+        config_file, rx_recorded_data_path = create_simulated_campaign_config(
+            os.path.join(src_path, "config", "config_rf_data_recording_api.yaml"), campaign_path
+        )
+        try:
+            main_rf_data_recording_api.main(config_file)
+        finally:
+            simulated_uhd.reset()
+
+        rx_data_files = sorted(glob.glob(os.path.join(rx_recorded_data_path, "*.sigmf-data")))
+        assert len(rx_data_files) == 2
+        assert len(glob.glob(os.path.join(rx_recorded_data_path, "*.sigmf-meta"))) == 2
+
+        # The RX station receives the TX waveform of the same frequency
+        rx_data = np.fromfile(rx_data_files[0], dtype=np.complex64)
+        tx_data, waveform_IQ_rate = waveform_cache.read_waveform_data(
+            os.path.join(src_path, "waveforms", "nr"),
+            "NR_FR1_DL_TDD_SISO_BW-20MHz_CC-1_SCS-30kHz_Mod-64QAM_OFDM_TM3.1",
+            "tdms",
+        )
+        tx_data = np.asarray(tx_data, dtype=np.complex64)[: len(rx_data)]
+        correlation = np.abs(np.vdot(tx_data, rx_data)) / (
+            np.linalg.norm(tx_data) * np.linalg.norm(rx_data)
+        )
+        assert correlation > 0.9
+
+
+def test_campaign_with_ci16_recording():
+    with tempfile.TemporaryDirectory() as campaign_path:
+        config_file, rx_recorded_data_path = create_simulated_campaign_config(
+            os.path.join(src_path, "config", "config_rf_data_recording_api.yaml"), campaign_path
+        )
+        with open(config_file, "r") as file:
+            rf_data_acq_config = yaml.safe_load(file)
+        rf_data_acq_config["general_config"]["rx_recorded_data_type"] = "ci16_le"
+        with open(config_file, "w") as file:
+            yaml.safe_dump(rf_data_acq_config, file, sort_keys=False)
+        try:
+            main_rf_data_recording_api.main(config_file)
+        finally:
+            simulated_uhd.reset()
+
+        rx_data_files = sorted(glob.glob(os.path.join(rx_recorded_data_path, "*.sigmf-data")))
+        meta_files = sorted(glob.glob(os.path.join(rx_recorded_data_path, "*.sigmf-meta")))
+        assert len(rx_data_files) == 2 and len(meta_files) == 2
+        with open(meta_files[0], "r") as file:
+            metadata = json.load(file)
+        assert metadata["global"]["core:datatype"] == "ci16_le"
+        # sc16 samples are written without conversion: 4 bytes per sample
+        num_rx_samps = metadata["annotations"][0]["core:sample_count"]
+        assert os.path.getsize(rx_data_files[0]) == num_rx_samps * 4
+
+        # Record buffers hold the sc16 samples, the received signal is not zero
+        rx_data = np.fromfile(rx_data_files[0], dtype=run_rf_data_recorder.SC16_DTYPE)
+        assert np.any(rx_data["re"]) and np.any(rx_data["im"])
+
+
+def test_ci16_record_buffers():
+    rx_args = SimpleNamespace(rx_recorded_data_type="ci16_le", channels=0, duration=1e-3, rate=1e6)
+    shape, dtype = run_rf_data_recorder.get_rx_record_layout(rx_args)
+    assert shape == (1, 1000) and dtype == run_rf_data_recorder.SC16_DTYPE
+
+    # sc16 samples are received directly into the record buffer
+    usrp = simulated_uhd.usrp.MultiUSRP("type=x4xx,addr=192.168.100.2")
+    st_args = simulated_uhd.usrp.StreamArgs("sc16", "sc16")
+    st_args.channels = [0]
+    capture_engine = run_rf_data_recorder.RxCaptureEngine(
+        simulated_uhd, usrp, usrp.get_rx_stream(st_args), [0], dtype
+    )
+    rx_data = np.zeros(shape, dtype=dtype)
+    try:
+        simulated_uhd.configure(realtime_factor=0.0, noise_level=0.1)
+        assert capture_engine.capture(rx_data) == 1000
+    finally:
+        simulated_uhd.reset()
+    assert rx_data.dtype == run_rf_data_recorder.SC16_DTYPE
+    assert np.abs(rx_data["re"].astype(np.float64)).max() > 0
+
+
+def test_coerced_values_and_overflows():
+    usrp = simulated_uhd.usrp.MultiUSRP("type=x4xx,addr=192.168.100.2,master_clock_rate=245.76e6")
+    assert usrp.get_usrp_rx_info()["mboard_id"] == "x410"
+
+    # Rate is coerced to the master clock rate divided by an even decimation
+    usrp.set_rx_rate(30e6, 0)
+    assert usrp.get_rx_rate(0) == 245.76e6 / 8
+    usrp.set_rx_gain(20.4, 0)
+    assert usrp.get_rx_gain(0) == 20.0
+
+    st_args = simulated_uhd.usrp.StreamArgs("fc32", "sc16")
+    st_args.channels = [0]
+    rx_streamer = usrp.get_rx_stream(st_args)
+    rx_metadata = simulated_uhd.types.RXMetadata()
+    stream_cmd = simulated_uhd.types.StreamCMD(simulated_uhd.types.StreamMode.num_done)
+    stream_cmd.num_samps = 3000
+    rx_data = np.zeros(1000, dtype=np.complex64)
+    try:
+        # Samples of an overflow are dropped, the stream ends with a timeout
+        simulated_uhd.configure(overflow_probability=1.0, realtime_factor=0.0)
+        rx_streamer.issue_stream_cmd(stream_cmd)
+        assert rx_streamer.recv(rx_data, rx_metadata, 0.1) == 0
+        assert rx_metadata.error_code == simulated_uhd.types.RXMetadataErrorCode.overflow
+        assert not rx_metadata.out_of_sequence
+
+        simulated_uhd.configure(overflow_probability=0.0, sequence_error_probability=1.0)
+        assert rx_streamer.recv(rx_data, rx_metadata, 0.1) == 0
+        assert rx_metadata.error_code == simulated_uhd.types.RXMetadataErrorCode.overflow
+        assert rx_metadata.out_of_sequence
+
+        simulated_uhd.configure(sequence_error_probability=0.0)
+        assert rx_streamer.recv(rx_data, rx_metadata, 0.1) == 1000
+        assert rx_metadata.error_code == simulated_uhd.types.RXMetadataErrorCode.none
+        assert rx_streamer.recv(rx_data, rx_metadata, 0.1) == 0
+        assert rx_metadata.error_code == simulated_uhd.types.RXMetadataErrorCode.timeout
+    finally:
+        simulated_uhd.reset()
+
+
+if __name__ == "__main__":
+    test_campaign_with_simulated_devices()
+    test_campaign_with_ci16_recording()
+    test_ci16_record_buffers()
+    test_coerced_values_and_overflows()
+    print("Simulated UHD tests passed")
@@ -0,0 +1,140 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Test - USRP Device Session Pool
+"""
+# Description:
+#   The session pool keeps one open USRP session per device address for the whole campaign.
+#   The test uses a fake uhd module that counts the session constructions, no USRP is required.
+#
+import os
+import sys
+from types import SimpleNamespace
+
+dir_path = os.path.dirname(__file__)
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+from lib import usrp_session_pool
+
+
+# Fake uhd module: count the constructed MultiUSRP and RFNoC graph sessions
+def create_fake_uhd():
+    constructions = []
+
+    class FakeMultiUSRP:
+        def __init__(self, args):
+            constructions.append(("multi_usrp", args))
+            self.args = args
+            self.num_rx_streams = 0
+
+        def get_master_clock_rate(self):
+            return 245.76e6
+
+        def get_rx_stream(self, st_args):
+            self.num_rx_streams = self.num_rx_streams + 1
+            return SimpleNamespace(st_args=st_args)
+
+    class FakeRfnocGraph:
+        def __init__(self, args):
+            constructions.append(("rfnoc_graph", args))
+            self.args = args
+
+    class FakeStreamArgs:
+        def __init__(self, cpu_format, wire_format):
+            self.cpu_format = cpu_format
+            self.wire_format = wire_format
+            self.channels = []
+
+    fake_uhd = SimpleNamespace(
+        usrp=SimpleNamespace(MultiUSRP=FakeMultiUSRP, StreamArgs=FakeStreamArgs),
+        rfnoc=SimpleNamespace(RfnocGraph=FakeRfnocGraph),
+    )
+    return fake_uhd, constructions
+
+
+def test_session_reused_across_variations():
+    fake_uhd, constructions = create_fake_uhd()
+    session_pool = usrp_session_pool.USRPSessionPool(fake_uhd)
+
+    # HW info is read without master clock rate
+    session_pool.get_multi_usrp("type=x4xx,addr=192.168.100.2")
+    # Variations with the default master clock rate reuse the same session
+    for variation in range(10):
+        session = session_pool.get_multi_usrp(
+            "type=x4xx,addr=192.168.100.2,master_clock_rate=245.76e6"
+        )
+        session_pool.get_rx_streamer(session, "fc32", "sc16", [0])
+
+    assert len(constructions) == 1
+    assert session_pool.num_session_constructions == 1
+    assert session.device.num_rx_streams == 1
+
+
+def test_session_reopened_on_master_clock_rate_change():
+    fake_uhd, constructions = create_fake_uhd()
+    session_pool = usrp_session_pool.USRPSessionPool(fake_uhd)
+
+    args_list = [
+        "type=x4xx,addr=192.168.40.2,master_clock_rate=245.76e6",
+        "type=x4xx,addr=192.168.40.2,master_clock_rate=245.76e6",
+        "type=x4xx,addr=192.168.40.2,master_clock_rate=250e6",
+        "type=x4xx,addr=192.168.40.2,master_clock_rate=250e6",
+    ]
+    for args in args_list:
+        session_pool.get_rfnoc_graph(args)
+
+    assert len(constructions) == 2
+
+
+def test_session_reopened_on_session_type_change():
+    fake_uhd, constructions = create_fake_uhd()
+    session_pool = usrp_session_pool.USRPSessionPool(fake_uhd)
+
+    # TX HW info is read using MultiUSRP, TX playback uses the RFNoC graph
+    session_pool.get_multi_usrp("type=x4xx,addr=192.168.40.2")
+    for variation in range(5):
+        session_pool.get_rfnoc_graph("type=x4xx,addr=192.168.40.2,master_clock_rate=245.76e6")
+    # A second device has its own session
+    session_pool.get_multi_usrp("type=x4xx,addr=192.168.100.2")
+    session_pool.close_all()
+
+    assert [session_type for session_type, args in constructions] == [
+        "multi_usrp",
+        "rfnoc_graph",
+        "multi_usrp",
+    ]
+    assert not session_pool.sessions
+
+
+def test_applied_settings_delta_only():
+    fake_uhd, constructions = create_fake_uhd()
+    session_pool = usrp_session_pool.USRPSessionPool(fake_uhd)
+    session = session_pool.get_multi_usrp("type=x4xx,addr=192.168.100.2")
+    applied_settings = session.applied_settings
+
+    # First variation pushes all settings
+    assert applied_settings.is_changed(("rx_freq", 0), 3.6e9)
+    applied_settings.update(("rx_freq", 0), 3.6e9)
+    applied_settings.update(("rx_gain", 0), 10)
+    # Next variation changes the gain only
+    assert not applied_settings.is_changed(("rx_freq", 0), 3.6e9)
+    assert applied_settings.is_changed(("rx_gain", 0), 20)
+    # Invalidated settings are pushed again
+    applied_settings.invalidate(("rx_freq", 0))
+    assert applied_settings.is_changed(("rx_freq", 0), 3.6e9)
+
+    # A reopened session does not know the device settings
+    session_pool.release_session(session)
+    assert applied_settings.is_changed(("rx_gain", 0), 10)
+
+
+if __name__ == "__main__":
+    test_session_reused_across_variations()
+    test_session_reopened_on_master_clock_rate_change()
+    test_session_reopened_on_session_type_change()
+    test_applied_settings_delta_only()
+    print("USRP session pool tests passed")
@@ -0,0 +1,130 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Test - Variation Prefetcher
+"""
+# Description:
+#   The next variation is prepared on a worker thread while the current variation is on air.
+#   The test checks the overlap of preparation and execution, no USRP is required.
+#
+import os
+import sys
+import time
+import threading
+
+dir_path = os.path.dirname(__file__)
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+import main_rf_data_recording_api
+from lib import variation_prefetcher
+
+# Host-side preparation time and on-air time of a variation
+preparation_time = 0.05
+on_air_time = 0.1
+variations = [(variation_idx, {"freq": 3.6e9 + variation_idx * 1e6}) for variation_idx in range(4)]
+
+
+# Prepare a variation, record the preparing thread
+def prepare_variation(variation_idx, iteration_config):
+    time.sleep(preparation_time)
+    return variation_idx, iteration_config["freq"], threading.current_thread()
+
+
+def run_variations(enable_prefetch):
+    prefetcher = variation_prefetcher.VariationPrefetcher(prepare_variation, enable_prefetch)
+    prepared_variations = []
+    start_time = time.time()
+    for step, (variation_idx, iteration_config) in enumerate(variations):
+        prepared_variations.append(prefetcher.get(variation_idx, iteration_config))
+        if step + 1 < len(variations):
+            prefetcher.prefetch(*variations[step + 1])
+        # Variation on air
+        time.sleep(on_air_time)
+    prefetcher.close()
+    return prepared_variations, time.time() - start_time, prefetcher
+
+
+def test_next_variation_prepared_while_on_air():
+    prepared_variations, campaign_time, prefetcher = run_variations(True)
+
+    # Same prepared variations in execution order
+    assert [x[:2] for x in prepared_variations] == [
+        (variation_idx, iteration_config["freq"]) for variation_idx, iteration_config in variations
+    ]
+    # Only the first variation is prepared in the main thread
+    assert prepared_variations[0][2] is threading.current_thread()
+    assert all(x[2] is not threading.current_thread() for x in prepared_variations[1:])
+    assert prefetcher.num_prefetched_variations == len(variations) - 1
+    assert prefetcher.num_prepared_variations == 1
+    # The hardware does not wait for the preparation of the prefetched variations
+    assert prefetcher.wait_time < preparation_time
+    assert campaign_time < len(variations) * (on_air_time + preparation_time)
+
+
+def test_prefetch_disabled_or_not_matching():
+    prepared_variations, campaign_time, prefetcher = run_variations(False)
+    assert all(x[2] is threading.current_thread() for x in prepared_variations)
+    assert prefetcher.num_prepared_variations == len(variations)
+
+    # A different variation is requested: prefetched variation is dropped, requested one is prepared
+    prefetcher = variation_prefetcher.VariationPrefetcher(prepare_variation)
+    prefetcher.prefetch(*variations[1])
+    assert prefetcher.get(*variations[2])[:2] == (2, variations[2][1]["freq"])
+    assert prefetcher.num_prefetched_variations == 0
+    prefetcher.close()
+
+
+def test_preparation_error_raised_in_execution_order():
+    def prepare_failing_variation(variation_idx, iteration_config):
+        raise Exception("ERROR: Waveform not found", variation_idx)
+
+    prefetcher = variation_prefetcher.VariationPrefetcher(prepare_failing_variation)
+    prefetcher.prefetch(*variations[1])
+    try:
+        prefetcher.get(*variations[1])
+        assert False, "Preparation error is not raised"
+    except Exception as error:
+        assert error.args == ("ERROR: Waveform not found", 1)
+    prefetcher.close()
+
+
+def test_next_recorded_variation_read_ahead():
+    read_variations = []
+
+    # Schedule as generator: the variations are read one recorded variation ahead only
+    def variations_schedule():
+        for variation_idx in range(6):
+            read_variations.append(variation_idx)
+            yield variation_idx, {"freq": 3.6e9 + variation_idx * 1e6}
+
+    skipped_variations = {0, 2, 3, 5}
+    iterated_variations = []
+    for variation_idx, iteration_config, next_variation in (
+        main_rf_data_recording_api.iterate_variations_with_next_recorded(
+            variations_schedule(), lambda variation_idx: variation_idx in skipped_variations
+        )
+    ):
+        if variation_idx == 1:
+            assert read_variations == [0, 1, 2, 3, 4]
+        next_variation_idx = None if next_variation is None else next_variation[0]
+        iterated_variations.append((variation_idx, iteration_config is None, next_variation_idx))
+    assert iterated_variations == [
+        (0, True, None),
+        (1, False, 4),
+        (2, True, None),
+        (3, True, None),
+        (4, False, None),
+        (5, True, None),
+    ]
+
+
+if __name__ == "__main__":
+    test_next_variation_prepared_while_on_air()
+    test_prefetch_disabled_or_not_matching()
+    test_preparation_error_raised_in_execution_order()
+    test_next_recorded_variation_read_ahead()
+    print("Variation prefetcher tests passed")
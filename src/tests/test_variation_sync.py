@@ -0,0 +1,130 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Test - TX and RX Variation Sync
+"""
+# Description:
+#   RX data acquisition starts when all TX signals are on the air, TX stops when the last RX is done.
+#   The test runs TX and RX stations as threads without USRP.
+#
+import os
+import sys
+import time
+import threading
+from types import SimpleNamespace
+
+dir_path = os.path.dirname(__file__)
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+from lib import sync_settings
+from lib import simulated_uhd
+from lib import run_rf_replay_data_transmitter
+
+
+def test_rx_starts_when_all_txs_on_air():
+    num_txs = 3
+    num_rxs = 2
+    variation_sync = sync_settings.VariationSync(num_txs, num_rxs)
+    events = []
+    events_lock = threading.Lock()
+
+    def log_event(event):
+        with events_lock:
+            events.append(event)
+
+    def tx_station(tx_idx):
+        # TX stations need different setup times
+        time.sleep(0.01 * tx_idx)
+        log_event("tx_started")
+        variation_sync.tx_signal_started()
+        variation_sync.wait_for_tx_stop()
+        log_event("tx_stopped")
+
+    def rx_station(rx_idx):
+        variation_sync.wait_for_rx_start()
+        log_event("rx_started")
+        time.sleep(0.01 * rx_idx)
+        log_event("rx_done")
+        variation_sync.rx_data_acquisition_done()
+
+    threads = [threading.Thread(target=tx_station, args=(idx,)) for idx in range(num_txs)]
+    threads = threads + [threading.Thread(target=rx_station, args=(idx,)) for idx in range(num_rxs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    # RX stations are not synchronized among each other, only against the TX stations
+    assert events[:num_txs] == ["tx_started"] * num_txs
+    assert sorted(events[num_txs : num_txs + 2 * num_rxs]) == sorted(
+        ["rx_started", "rx_done"] * num_rxs
+    )
+    assert events[-num_txs:] == ["tx_stopped"] * num_txs
+
+
+def test_failed_tx_aborts_variation():
+    variation_sync = sync_settings.VariationSync(1, 1)
+    rx_failed = []
+
+    def failed_tx_station():
+        raise Exception("ERROR: TX setup failed")
+
+    def rx_station():
+        try:
+            variation_sync.wait_for_rx_start()
+        except Exception:
+            rx_failed.append(True)
+
+    rx_thread = threading.Thread(target=rx_station)
+    rx_thread.start()
+    tx_failed = False
+    try:
+        variation_sync.run_station(failed_tx_station)
+    except Exception:
+        tx_failed = True
+    rx_thread.join(timeout=5)
+
+    assert tx_failed
+    assert rx_failed == [True]
+    assert variation_sync.stop_tx_signal.is_set()
+
+
+def test_missing_replay_block_aborts_variation():
+    variation_sync = sync_settings.VariationSync(1, 1)
+    graph = simulated_uhd.rfnoc.RfnocGraph("type=x4xx,addr=192.168.100.2")
+    del graph.blocks["0/Replay#0"]
+    args = SimpleNamespace(radio_id=0, replay_id=0, duc_id=0)
+    rx_failed = []
+
+    def tx_station():
+        run_rf_replay_data_transmitter.setup_tx_graph_chain(graph, args, simulated_uhd, 1)
+        variation_sync.tx_signal_started()
+
+    def rx_station():
+        try:
+            variation_sync.wait_for_rx_start()
+        except Exception:
+            rx_failed.append(True)
+
+    rx_thread = threading.Thread(target=rx_station)
+    rx_thread.start()
+    try:
+        variation_sync.run_station(tx_station)
+        assert False, "Replay block error expected"
+    except Exception as error:
+        assert "Replay block not found" in str(error.args[0])
+    rx_thread.join(timeout=5)
+
+    assert not rx_thread.is_alive()
+    assert rx_failed == [True]
+
+
+if __name__ == "__main__":
+    test_rx_starts_when_all_txs_on_air()
+    test_failed_tx_aborts_variation()
+    test_missing_replay_block_aborts_variation()
+    print("Variation sync tests passed")
@@ -0,0 +1,87 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Test - Variations Normalizer
+"""
+# Description:
+#   Variations with different user-defined rates are duplicates if the rate is read from the waveform config.
+#   The test checks the duplicate variations after rate resolution, no USRP is required.
+#
+import os
+import sys
+from types import SimpleNamespace
+
+dir_path = os.path.dirname(__file__)
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+from lib import rf_data_recording_api_def
+from lib import variations_normalizer
+
+# Variations: user-defined rate x frequency
+variations = [
+    {"rate": rate, "freq": freq} for rate in [15.36e6, 30.72e6, 61.44e6] for freq in [3.6e9, 3.7e9]
+]
+
+
+# Create TX config of a variation and resolve the rate
+def create_tx_config(variation, rate_source):
+    tx_config = SimpleNamespace(
+        args="type=x4xx,addr=192.168.40.2",
+        freq=variation["freq"],
+        rate=variation["rate"],
+        bandwidth=variation["rate"] / 1.5,
+        rate_source=rate_source,
+        waveform_config={"sample_rate": 30.72e6, "bandwidth": 20e6},
+        campaign_waveforms=[],
+    )
+    return rf_data_recording_api_def.RFDataRecorderAPI.update_tx_rate([tx_config])
+
+
+def test_waveform_rate_duplicates_skipped():
+    duplicates_map = variations_normalizer.VariationsNormalizer("skip")
+    for variation_idx, variation in enumerate(variations):
+        duplicates_map.add_variation(
+            variation_idx, create_tx_config(variation, "waveform_config"), []
+        )
+
+    # Only the frequency changes the effective config, it is kept as hash only
+    assert len(duplicates_map.effective_variations) == 2
+    assert all(len(key) == 20 for key in duplicates_map.effective_variations)
+    assert duplicates_map.duplicates == {2: 0, 3: 1, 4: 0, 5: 1}
+    assert not duplicates_map.is_skipped(0)
+    assert duplicates_map.is_skipped(4)
+    assert duplicates_map.get_linked_variations(0) == []
+
+    duplicates_map.add_recorded_variation_time(3600.0)
+    assert duplicates_map.get_saved_hardware_hours() == 4.0
+
+
+def test_duplicates_linked_or_recorded():
+    link_map = variations_normalizer.VariationsNormalizer("link")
+    record_map = variations_normalizer.VariationsNormalizer("record")
+    user_defined_map = variations_normalizer.VariationsNormalizer("skip")
+    for variation_idx, variation in enumerate(variations):
+        link_map.add_variation(variation_idx, create_tx_config(variation, "waveform_config"), [])
+        record_map.add_variation(variation_idx, create_tx_config(variation, "waveform_config"), [])
+        user_defined_map.add_variation(
+            variation_idx, create_tx_config(variation, "user_defined"), []
+        )
+
+    assert link_map.is_skipped(2)
+    assert link_map.get_linked_variations(0) == [2, 4]
+    assert not record_map.is_skipped(2)
+    assert record_map.get_num_skipped_variations() == 0
+    # User-defined rates are not replaced, all variations are recorded
+    assert user_defined_map.duplicates == {}
+    # All variations are recorded by default
+    assert variations_normalizer.VariationsNormalizer().duplicate_variations == "record"
+
+
+if __name__ == "__main__":
+    test_waveform_rate_duplicates_skipped()
+    test_duplicates_linked_or_recorded()
+    print("Variations normalizer tests passed")
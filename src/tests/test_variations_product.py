@@ -0,0 +1,73 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Test - Lazy Variations Product
+"""
+# Description:
+#   The variations product creates the variations on access only. The test compares it with the
+#   cross product created by pandas cross-merge.
+#
+import os
+import sys
+import pandas as pd
+
+dir_path = os.path.dirname(__file__)
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+from lib import rf_data_recording_config_interface
+
+variations_dict = {
+    "Tx1_args": ["type=x4xx,addr=192.168.40.2"],
+    "Tx1_freq": [3.6e9, 3.62e9, 3.64e9],
+    "Tx1_gain": [10, 20],
+    "Tx1_waveform_file_name": ["LTE_FDD_DL_10MHz", "NR_FR1_DL_FDD_20MHz", "RadarWaveform"],
+    "Rx1_freq": [3.61e9, 3.63e9],
+}
+
+
+def test_variations_match_pandas_cross_product():
+    variations_product = rf_data_recording_config_interface.VariationsProduct(variations_dict)
+
+    # Cross product as created by pandas cross-merge
+    pandas_product = None
+    for parameter, values in variations_dict.items():
+        data_frame_i = pd.DataFrame({parameter: values})
+        if pandas_product is None:
+            pandas_product = data_frame_i
+        else:
+            pandas_product = pandas_product.merge(data_frame_i, how="cross")
+
+    assert len(variations_product) == len(pandas_product)
+    for i, variation in enumerate(variations_product):
+        assert variation == pandas_product.iloc[i].to_dict()
+        assert variations_product[i] == variation
+    assert variations_product[-1] == pandas_product.iloc[-1].to_dict()
+
+
+def test_large_campaign_not_materialized():
+    large_variations_dict = {"param_" + str(n): list(range(10)) for n in range(12)}
+    variations_product = rf_data_recording_config_interface.VariationsProduct(
+        large_variations_dict
+    )
+    assert len(variations_product) == 10**12
+    assert variations_product[123456789012] == {
+        "param_" + str(n): int(digit) for n, digit in enumerate("000123456789012"[3:])
+    }
+
+    variations_product.add_parameter("Tx1_hw_type", ["USRP x410"])
+    assert len(variations_product) == 10**12
+    assert variations_product[5]["Tx1_hw_type"] == "USRP x410"
+    assert variations_product.column_combinations(["param_0", "Tx1_hw_type"])[-1] == (
+        9,
+        "USRP x410",
+    )
+
+
+if __name__ == "__main__":
+    test_variations_match_pandas_cross_product()
+    test_large_campaign_not_materialized()
+    print("Variations product tests passed")
@@ -0,0 +1,74 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Test - Variations Scheduler
+"""
+# Description:
+#   The variations scheduler reorders the variations to minimize the reconfiguration cost.
+#   The test checks the execution order and the estimated reconfigurations, no USRP is required.
+#
+import os
+import sys
+
+dir_path = os.path.dirname(__file__)
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+from lib import rf_data_recording_config_interface
+from lib import variations_scheduler
+
+# Worst case config order: gain changes slowest, rate changes fastest
+variations_dict = {
+    "Tx1_gain": [10, 20, 30, 40],
+    "Tx1_freq": [3.6e9, 3.62e9, 3.64e9, 3.66e9, 3.68e9],
+    "Tx1_waveform_file_name": ["LTE_FDD_DL_10MHz", "NR_FR1_DL_FDD_20MHz", "RadarWaveform"],
+    "Tx1_rate": [15.36e6, 30.72e6],
+    "Rx1_duration": [0.01],
+}
+
+
+# Count reconfigurations per cost class by running through the variations
+def count_reconfigurations(variations):
+    reconfigurations = {cost_class: 0 for cost_class in variations_scheduler.COST_CLASSES}
+    for previous, current in zip(variations, variations[1:]):
+        changed_parameters = [key for key in current if current[key] != previous[key]]
+        cost_classes = set(variations_scheduler.get_cost_class(key) for key in changed_parameters)
+        for cost_class in cost_classes:
+            reconfigurations[cost_class] = reconfigurations[cost_class] + 1
+    return reconfigurations
+
+
+def test_scheduled_order_covers_all_variations():
+    variations_product = rf_data_recording_config_interface.VariationsProduct(variations_dict)
+    scheduler = variations_scheduler.VariationsScheduler(variations_product)
+
+    variation_indices = [variation_idx for variation_idx, variation in scheduler]
+    variations = [variation for variation_idx, variation in scheduler]
+
+    # Same variations, different order
+    assert sorted(variation_indices) == list(range(len(variations_product)))
+    # Snake order: a single parameter changes between consecutive variations
+    for previous, current in zip(variations, variations[1:]):
+        assert len([key for key in current if current[key] != previous[key]]) == 1
+    # Master clock rate is changed only once
+    assert count_reconfigurations(variations) == scheduler.count_scheduled_reconfigurations()
+    assert scheduler.count_scheduled_reconfigurations()["master_clock_rate"] == 1
+
+
+def test_estimated_naive_reconfigurations():
+    variations_product = rf_data_recording_config_interface.VariationsProduct(variations_dict)
+    scheduler = variations_scheduler.VariationsScheduler(variations_product, False)
+
+    variations = [variation for variation_idx, variation in scheduler]
+    assert variations == list(variations_product)
+    assert count_reconfigurations(variations) == scheduler.count_naive_reconfigurations()
+    assert scheduler.count_naive_reconfigurations()["master_clock_rate"] == 119
+
+
+if __name__ == "__main__":
+    test_scheduled_order_covers_all_variations()
+    test_estimated_naive_reconfigurations()
+    print("Variations scheduler tests passed")
@@ -0,0 +1,82 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Test - Waveform Cache
+"""
+# Description:
+#   The waveform cache converts a waveform only once, further loads memory-map the cached samples.
+#   The test writes a MATLAB waveform to a temporary folder, no USRP is required.
+#
+import os
+import sys
+import tempfile
+import numpy as np
+import scipy.io
+
+dir_path = os.path.dirname(__file__)
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+from lib import waveform_cache
+
+
+# Write a MATLAB waveform in arbitrary mode format
+def write_matlab_waveform(waveform_path, waveform_file_name, num_samples):
+    waveform = np.random.uniform(-0.5, 0.5, num_samples) + 1j * np.random.uniform(
+        -0.5, 0.5, num_samples
+    )
+    waveform_file_path = os.path.join(waveform_path, waveform_file_name + ".mat")
+    scipy.io.savemat(waveform_file_path, {"waveform": waveform})
+    return waveform
+
+
+def test_waveform_converted_once():
+    with tempfile.TemporaryDirectory() as temp_path:
+        waveform = write_matlab_waveform(temp_path, "tx_waveform", 1000)
+        cache_path = os.path.join(temp_path, "waveform-cache")
+
+        cache = waveform_cache.WaveformCache(cache_path)
+        for variation in range(5):
+            tx_data, waveform_IQ_rate = cache.load(temp_path, "tx_waveform", "matlab")
+        assert cache.num_waveform_conversions == 1
+        assert tx_data.dtype == np.complex64
+        assert isinstance(tx_data, np.memmap)
+        assert waveform_IQ_rate is None
+        assert np.allclose(tx_data, waveform.astype(np.complex64))
+        # sc16 samples are not written until they are requested
+        cache_key = cache.get_cache_key(os.path.join(temp_path, "tx_waveform.mat"))
+        sc16_file = cache.get_entry_file(cache_key, ".sc16.npy")
+        assert not os.path.exists(sc16_file)
+
+        # A new cache instance (next campaign run) uses the cached files
+        cache = waveform_cache.WaveformCache(cache_path)
+        tx_data_sc16, waveform_IQ_rate = cache.load(
+            temp_path, "tx_waveform", "matlab", waveform_cache.SC16
+        )
+        assert cache.num_waveform_conversions == 0
+        assert os.path.exists(sc16_file)
+        assert tx_data_sc16.shape == (1000, 2)
+        tx_data_real = tx_data_sc16[:, 0] / waveform_cache.SC16_FULL_SCALE
+        assert np.allclose(tx_data_real, waveform.real, atol=1e-4)
+
+
+def test_changed_waveform_converted_again():
+    with tempfile.TemporaryDirectory() as temp_path:
+        write_matlab_waveform(temp_path, "tx_waveform", 1000)
+        cache = waveform_cache.WaveformCache(os.path.join(temp_path, "waveform-cache"))
+        cache.load(temp_path, "tx_waveform", "matlab")
+
+        # Overwrite waveform with a different length
+        waveform = write_matlab_waveform(temp_path, "tx_waveform", 2000)
+        tx_data, waveform_IQ_rate = cache.load(temp_path, "tx_waveform", "matlab")
+        assert cache.num_waveform_conversions == 2
+        assert np.allclose(tx_data, waveform.astype(np.complex64))
+
+
+if __name__ == "__main__":
+    test_waveform_converted_once()
+    test_changed_waveform_converted_again()
+    print("Waveform cache tests passed")
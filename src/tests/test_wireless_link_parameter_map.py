@@ -0,0 +1,123 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Test - Wireless Link Parameter Map
+"""
+# Description:
+#   The wireless link parameter map is loaded once and compiled per waveform generator.
+#   The test maps the waveform config of the NR waveforms of the API, no USRP is required.
+#   Parameter map and mapped waveform configs are cached per file modification time and size.
+#
+import os
+import sys
+import shutil
+import tempfile
+import types
+
+dir_path = os.path.dirname(__file__)
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+from lib import read_waveform_config_interface
+
+wireless_link_parameter_map_file = "wireless_link_parameter_map.yaml"
+
+
+def test_parameter_map_shared_and_compiled_once():
+    wireless_link_parameter_map = read_waveform_config_interface.get_wireless_link_parameter_map(
+        wireless_link_parameter_map_file
+    )
+    assert wireless_link_parameter_map is (
+        read_waveform_config_interface.get_wireless_link_parameter_map(
+            wireless_link_parameter_map_file
+        )
+    )
+    parameter_table = wireless_link_parameter_map.get_parameter_table("5gnr_ni_rfmx_rfws")
+    assert parameter_table is wireless_link_parameter_map.get_parameter_table("5gnr_ni_rfmx_rfws")
+    assert ("Bandwidth (Hz)", "bandwidth", None) in parameter_table
+
+
+def test_nr_waveform_config_mapped():
+    waveform_config_src = read_waveform_config_interface.read_tdms_waveform_config(
+        os.path.join(src_path, "waveforms/nr"),
+        "NR_FR1_DL_FDD_SISO_BW-20MHz_CC-1_SCS-30kHz_Mod-64QAM_OFDM_TM3.1",
+    )
+    waveform_config = read_waveform_config_interface.map_metadata_to_sigmf_format(
+        waveform_config_src, wireless_link_parameter_map_file, "5gnr_ni_rfmx_rfws"
+    )
+    # Value map: "Range 1" -> "fr1"
+    assert waveform_config["frequency_range"] == "fr1"
+    assert waveform_config["bandwidth"] == 20e6
+    assert waveform_config["standard"] == "5gnr"
+
+    # Unknown waveform generator
+    mapping_failed = False
+    try:
+        read_waveform_config_interface.map_metadata_to_sigmf_format(
+            waveform_config_src, wireless_link_parameter_map_file, "unknown_generator"
+        )
+    except Exception:
+        mapping_failed = True
+    assert mapping_failed
+
+
+def test_parameter_map_reloaded_after_change():
+    wireless_link_parameter_map = read_waveform_config_interface.get_wireless_link_parameter_map(
+        wireless_link_parameter_map_file
+    )
+    path_to_file = read_waveform_config_interface.get_wireless_link_parameter_map_path(
+        wireless_link_parameter_map_file
+    )
+    file_stat = os.stat(path_to_file)
+    try:
+        os.utime(path_to_file, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 10**9))
+        assert wireless_link_parameter_map is not (
+            read_waveform_config_interface.get_wireless_link_parameter_map(
+                wireless_link_parameter_map_file
+            )
+        )
+    finally:
+        os.utime(path_to_file, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns))
+
+
+def test_waveform_config_read_again_after_regeneration():
+    with tempfile.TemporaryDirectory() as waveform_path:
+        waveform_file_name = "RadarWaveform_BW_2M"
+        shutil.copy(
+            os.path.join(src_path, "waveforms/radar", waveform_file_name + ".yaml"), waveform_path
+        )
+        tx_data_recording_api_config = types.SimpleNamespace(
+            waveform_path=waveform_path,
+            waveform_file_name=waveform_file_name,
+            waveform_format="matlab",
+            waveform_generator="radar_nist",
+            waveform_cache_path=None,
+        )
+        read_waveform_config_interface.read_tx_waveform_config(
+            tx_data_recording_api_config, wireless_link_parameter_map_file
+        )
+        assert tx_data_recording_api_config.waveform_config["bandwidth"] == 2e6
+
+        # Waveform regenerated under the same name, i.e. between two campaigns in the same process
+        waveform_config_file = os.path.join(waveform_path, waveform_file_name + ".yaml")
+        with open(waveform_config_file, "r") as file:
+            waveform_config_text = file.read()
+        with open(waveform_config_file, "w") as file:
+            file.write(waveform_config_text.replace("bandwidth: 2.0e+6", "bandwidth: 4.0e+6"))
+        file_stat = os.stat(waveform_config_file)
+        os.utime(waveform_config_file, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 10**9))
+        read_waveform_config_interface.read_tx_waveform_config(
+            tx_data_recording_api_config, wireless_link_parameter_map_file
+        )
+        assert tx_data_recording_api_config.waveform_config["bandwidth"] == 4e6
+
+
+if __name__ == "__main__":
+    test_parameter_map_shared_and_compiled_once()
+    test_nr_waveform_config_mapped()
+    test_parameter_map_reloaded_after_change()
+    test_waveform_config_read_again_after_regeneration()
+    print("Wireless link parameter map tests passed")
@@ -0,0 +1,228 @@
+#
+# Copyright 2022 National Instruments Corporation
+#
+# SPDX-License-Identifier: MIT
+#
+"""
+Test - Write RX Recorded Data in SigMF Format
+"""
+# Description:
+#   RX records are written to single-record or multi-record SigMF datasets. The SigMF metadata is
+#   created once per variation as template, records only patch their fields. The test compares the
+#   template with SigMF metadata created per record and checks the file names of a campaign on
+#   simulated USRPs, no USRP is required.
+#
+import os
+import sys
+import io
+import copy
+import glob
+import json
+import hashlib
+import tempfile
+import warnings
+import numpy as np
+import yaml
+from sigmf import SigMFFile
+
+dir_path = os.path.dirname(__file__)
+src_path = os.path.split(dir_path)[0]
+sys.path.insert(0, src_path)
+
+import main_rf_data_recording_api
+from lib import simulated_uhd
+from lib import write_rx_recorded_data_in_sigmf
+from benchmarks import benchmark_file_formats
+from tests import test_simulated_uhd
+
+NUM_RX_SAMPS = 1000
+RX_RECORD_STATUS = {
+    "errors": {"overflow": 1, "sequence_error": 0, "timeout": 1, "late": 0, "other": 0},
+    "retries": 1,
+    "corrupted": False,
+    "num_received_samps": NUM_RX_SAMPS,
+}
+
+
+## Create SigMF metadata per record as written before the template, returns validated SigMFFile
+# records: list of (sample start, sample count, capture time, RX record status)
+def create_sigmf_metadata(rx_args, txs_args, general_config, records, sha512):
+    meta = write_rx_recorded_data_in_sigmf.create_sigmf_file(rx_args, general_config)
+    meta.set_global_field(SigMFFile.HASH_KEY, sha512)
+    for sample_start, sample_count, capture_time, rx_record_status in records:
+        meta.add_capture(
+            sample_start,
+            metadata=write_rx_recorded_data_in_sigmf.get_capture_metadata(rx_args, capture_time),
+        )
+        annotation_metadata = write_rx_recorded_data_in_sigmf.get_annotation_metadata(
+            rx_args, txs_args, general_config
+        )
+        annotation_metadata["rx_record_status"] = rx_record_status
+        meta.add_annotation(sample_start, sample_count, metadata=annotation_metadata)
+    assert meta.validate()
+    return meta
+
+
+def test_capture_datetime_in_utc():
+    with warnings.catch_warnings():
+        # No deprecated UTC conversion
+        warnings.simplefilter("error", DeprecationWarning)
+        capture_datetime = write_rx_recorded_data_in_sigmf.get_capture_datetime(1.6e9 + 0.25)
+    assert capture_datetime == "2020-09-13T12:26:40.250000Z"
+
+
+def test_record_metadata_of_template():
+    rx_args, txs_args, general_config = benchmark_file_formats.create_recording_args(
+        "recorded-data", NUM_RX_SAMPS
+    )
+    metadata_template = write_rx_recorded_data_in_sigmf.SigMFMetadataTemplate(
+        rx_args, txs_args, general_config
+    )
+    for rx_record_status in [RX_RECORD_STATUS, None]:
+        record_metadata_text = metadata_template.get_record_metadata(
+            1.6e9, "sha512", rx_record_status
+        )
+        records = [(0, NUM_RX_SAMPS, 1.6e9, rx_record_status)]
+        meta = create_sigmf_metadata(rx_args, txs_args, general_config, records, "sha512")
+        # Same text as written by SigMFFile
+        meta_file = io.StringIO()
+        meta.dump(meta_file, pretty=True)
+        assert record_metadata_text == meta_file.getvalue()
+        # All placeholders are patched
+        for placeholder in [
+            write_rx_recorded_data_in_sigmf.DATETIME_PLACEHOLDER,
+            write_rx_recorded_data_in_sigmf.SHA512_PLACEHOLDER,
+            write_rx_recorded_data_in_sigmf.RX_RECORD_STATUS_PLACEHOLDER,
+        ]:
+            assert placeholder not in record_metadata_text
+        metadata = json.loads(record_metadata_text)
+        assert metadata["global"][SigMFFile.HASH_KEY] == "sha512"
+        assert metadata["captures"][0][SigMFFile.DATETIME_KEY] == "2020-09-13T12:26:40Z"
+        assert metadata["annotations"][0]["rx_record_status"] == rx_record_status
+
+
+def test_multi_record_metadata_of_template():
+    rx_args, txs_args, general_config = benchmark_file_formats.create_recording_args(
+        "recorded-data", NUM_RX_SAMPS
+    )
+    metadata_template = write_rx_recorded_data_in_sigmf.SigMFMetadataTemplate(
+        rx_args, txs_args, general_config
+    )
+    records = [
+        (0, NUM_RX_SAMPS, 1.6e9, None),
+        (NUM_RX_SAMPS, NUM_RX_SAMPS, 1.6e9 + 0.5, RX_RECORD_STATUS),
+    ]
+    multi_record_metadata_text = metadata_template.get_multi_record_metadata(records, "sha512")
+    meta = create_sigmf_metadata(rx_args, txs_args, general_config, records, "sha512")
+    # Same text as written by SigMFFile
+    meta_file = io.StringIO()
+    meta.dump(meta_file, pretty=True)
+    assert multi_record_metadata_text == meta_file.getvalue()
+    metadata = json.loads(multi_record_metadata_text)
+    assert [annotation["rx_record_status"] for annotation in metadata["annotations"]] == [
+        None,
+        RX_RECORD_STATUS,
+    ]
+
+
+def test_multi_record_writer():
+    with tempfile.TemporaryDirectory() as rx_recorded_data_path:
+        rx_args, txs_args, general_config = benchmark_file_formats.create_recording_args(
+            rx_recorded_data_path, NUM_RX_SAMPS
+        )
+        multi_record_writer = write_rx_recorded_data_in_sigmf.SigMFMultiRecordWriter(
+            rx_args, txs_args, general_config, 1.6e9
+        )
+        rx_data = [
+            np.full((1, NUM_RX_SAMPS), record_idx + 1j, dtype=np.complex64)
+            for record_idx in range(3)
+        ]
+        for record_idx, record in enumerate(rx_data):
+            multi_record_writer.append(record, record_idx, 1.6e9 + record_idx, RX_RECORD_STATUS)
+        # Metadata is written once at the end of the variation
+        assert glob.glob(os.path.join(rx_recorded_data_path, "*.sigmf-meta")) == []
+        multi_record_writer.close()
+
+        rx_data_files = glob.glob(os.path.join(rx_recorded_data_path, "*.sigmf-data"))
+        meta_files = glob.glob(os.path.join(rx_recorded_data_path, "*.sigmf-meta"))
+        assert len(rx_data_files) == 1 and len(meta_files) == 1
+        with open(rx_data_files[0], "rb") as file:
+            data = file.read()
+        with open(meta_files[0], "r") as file:
+            metadata = json.load(file)
+
+    assert data == b"".join(record.tobytes() for record in rx_data)
+    assert metadata["global"][SigMFFile.HASH_KEY] == hashlib.sha512(data).hexdigest()
+    sample_starts = [record_idx * NUM_RX_SAMPS for record_idx in range(3)]
+    assert [capture[SigMFFile.START_INDEX_KEY] for capture in metadata["captures"]] == sample_starts
+    assert [
+        annotation[SigMFFile.START_INDEX_KEY] for annotation in metadata["annotations"]
+    ] == sample_starts
+    assert [
+        annotation[SigMFFile.LENGTH_INDEX_KEY] for annotation in metadata["annotations"]
+    ] == [NUM_RX_SAMPS] * 3
+
+
+def test_multi_record_file_per_variation_and_station():
+    with tempfile.TemporaryDirectory() as campaign_path:
+        config_file, rx_recorded_data_path = test_simulated_uhd.create_simulated_campaign_config(
+            os.path.join(src_path, "config", "config_rf_data_recording_api.yaml"), campaign_path
+        )
+        with open(config_file, "r") as file:
+            rf_data_acq_config = yaml.safe_load(file)
+        # All variations share the time stamp of the TX waveform file
+        rf_data_acq_config["general_config"]["enable_multi_record_file"] = "True"
+        rf_data_acq_config["general_config"]["use_tx_timestamp"] = "True"
+        rf_data_acq_config["receivers_config"][0]["Parameters"]["gain"]["Values"] = [10, 20, 30]
+        with open(config_file, "w") as file:
+            yaml.safe_dump(rf_data_acq_config, file, sort_keys=False)
+        try:
+            main_rf_data_recording_api.main(config_file)
+        finally:
+            simulated_uhd.reset()
+
+        rx_data_files = sorted(glob.glob(os.path.join(rx_recorded_data_path, "*.sigmf-data")))
+        assert len(rx_data_files) == 3
+        assert len(glob.glob(os.path.join(rx_recorded_data_path, "*.sigmf-meta"))) == 3
+        assert all("-Rx1-var" in os.path.basename(file) for file in rx_data_files)
+
+
+def test_single_record_files_per_variation_and_station():
+    with tempfile.TemporaryDirectory() as campaign_path:
+        config_file, rx_recorded_data_path = test_simulated_uhd.create_simulated_campaign_config(
+            os.path.join(src_path, "config", "config_rf_data_recording_api.yaml"), campaign_path
+        )
+        with open(config_file, "r") as file:
+            rf_data_acq_config = yaml.safe_load(file)
+        # All records share the time stamp of the TX waveform file
+        rf_data_acq_config["general_config"]["use_tx_timestamp"] = "True"
+        receiver_config = rf_data_acq_config["receivers_config"][0]
+        receiver_config["Parameters"]["gain"]["Values"] = [10, 20]
+        second_receiver_config = copy.deepcopy(receiver_config)
+        second_receiver_config["IPaddress"] = "192.168.100.3"
+        second_receiver_config["Parameters"]["gain"]["Values"] = [20]
+        rf_data_acq_config["receivers_config"].append(second_receiver_config)
+        with open(config_file, "w") as file:
+            yaml.safe_dump(rf_data_acq_config, file, sort_keys=False)
+        try:
+            main_rf_data_recording_api.main(config_file)
+        finally:
+            simulated_uhd.reset()
+
+        # 2 RX stations x 2 variations x 2 records
+        rx_data_files = glob.glob(os.path.join(rx_recorded_data_path, "*.sigmf-data"))
+        assert len(rx_data_files) == 8
+        assert len(glob.glob(os.path.join(rx_recorded_data_path, "*.sigmf-meta"))) == 8
+        for station_id in ["Rx1", "Rx2"]:
+            station_files = [file for file in rx_data_files if "-" + station_id + "-var" in file]
+            assert len(station_files) == 4
+
+
+if __name__ == "__main__":
+    test_capture_datetime_in_utc()
+    test_record_metadata_of_template()
+    test_multi_record_metadata_of_template()
+    test_multi_record_writer()
+    test_multi_record_file_per_variation_and_station()
+    test_single_record_files_per_variation_and_station()
+    print("Write RX recorded data in SigMF tests passed")